@@ -1,10 +1,12 @@
 from django.contrib import admin
 
-from .models import Recebivel
+from core.admin import ModelAdminArquivo, ModelAdminGrandeVolume
+
+from .models import Recebivel, RecebivelArquivo
 
 
 @admin.register(Recebivel)
-class RecebivelAdmin(admin.ModelAdmin):
+class RecebivelAdmin(ModelAdminGrandeVolume):
     list_display = (
         "venda",
         "data_vencimento",
@@ -13,10 +15,31 @@ class RecebivelAdmin(admin.ModelAdmin):
         "data_pagamento",
         "valor_pago",
     )
+    # ``Venda.__str__`` exibe o empreendimento.
+    list_select_related = ("venda__empreendimento",)
     list_filter = ("status", "data_vencimento")
+    date_hierarchy = "data_vencimento"
     search_fields = (
         "venda__cliente_nome",
         "venda__empreendimento__nome",
         "venda__corretor__nome",
     )
     autocomplete_fields = ("venda",)
+
+
+@admin.register(RecebivelArquivo)
+class RecebivelArquivoAdmin(ModelAdminArquivo):
+    list_display = (
+        "id",
+        "cliente_nome",
+        "empreendimento",
+        "data_vencimento",
+        "valor",
+        "data_pagamento",
+        "valor_pago",
+        "arquivado_em",
+    )
+    list_select_related = ("empreendimento",)
+    list_filter = ("data_vencimento",)
+    date_hierarchy = "data_vencimento"
+    search_fields = ("=id", "=venda_id", "=codigo_origem", "cliente_nome")
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("carteira", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="recebivel",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("carteira", "0002_alter_recebivel_updated_at"),
+        ("comercial", "0003_venda_venda_data_empreend_idx"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="recebivel",
+            index=models.Index(
+                fields=["status", "data_vencimento"], name="recebivel_status_venc_idx"
+            ),
+        ),
+    ]
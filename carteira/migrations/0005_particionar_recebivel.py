@@ -0,0 +1,16 @@
+from django.db import migrations
+
+from core.particionamento import converter_em_particionada
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("carteira", "0004_recebivel_codigo_origem"),
+        # Particionada a venda, a chave estrangeira para ela vira um gatilho.
+        ("comercial", "0006_particionar_venda"),
+    ]
+
+    operations = [
+        converter_em_particionada("carteira.Recebivel"),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:27
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+from core.postgres import indices_trigrama
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("carteira", "0005_particionar_recebivel"),
+        ("comercial", "0007_vendaarquivo"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecebivelArquivo",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                (
+                    "venda_id",
+                    models.BigIntegerField(db_index=True, verbose_name="ID da venda"),
+                ),
+                ("cliente_nome", models.CharField(max_length=120)),
+                ("data_vencimento", models.DateField()),
+                ("valor", models.DecimalField(decimal_places=2, max_digits=12)),
+                ("data_pagamento", models.DateField(blank=True, null=True)),
+                (
+                    "valor_pago",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("aberto", "Em aberto"),
+                            ("pago", "Pago"),
+                            ("atrasado", "Atrasado"),
+                            ("renegociado", "Renegociado"),
+                        ],
+                        max_length=15,
+                    ),
+                ),
+                (
+                    "codigo_origem",
+                    models.CharField(
+                        blank=True,
+                        db_index=True,
+                        max_length=60,
+                        null=True,
+                        verbose_name="Código na planilha de origem",
+                    ),
+                ),
+                ("created_at", models.DateTimeField()),
+                ("updated_at", models.DateTimeField()),
+                (
+                    "arquivado_em",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                (
+                    "corretor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="+",
+                        to="comercial.corretor",
+                    ),
+                ),
+                (
+                    "empreendimento",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="+",
+                        to="comercial.empreendimento",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Recebível arquivado",
+                "verbose_name_plural": "Recebíveis arquivados",
+                "ordering": ("-data_vencimento",),
+            },
+        ),
+        indices_trigrama(("carteira.RecebivelArquivo", "cliente_nome")),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("carteira", "0006_recebivelarquivo"),
+        ("comercial", "0007_vendaarquivo"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="recebivel",
+            index=models.Index(fields=["data_vencimento"], name="recebivel_venc_idx"),
+        ),
+    ]
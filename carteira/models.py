@@ -1,11 +1,94 @@
+from datetime import timedelta
 from decimal import Decimal
 
 from django.db import models
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
-from core.models import TimeStampedModel
+from core.models import AtomicSaveModel, TimeStampedModel
 
+LIMITES_FAIXAS_ATRASO = (30, 60, 120)
 
-class Recebivel(TimeStampedModel):
+
+def rotulos_faixas_atraso(limites=LIMITES_FAIXAS_ATRASO):
+    """Gera os rótulos ("0-30", "31-60", ..., "120+") a partir dos limites em dias."""
+
+    rotulos = []
+    inicio = 0
+    for limite in limites:
+        rotulos.append(f"{inicio}-{limite}")
+        inicio = limite + 1
+    rotulos.append(f"{limites[-1]}+")
+    return rotulos
+
+
+def condicoes_faixas_atraso(data_referencia, limites=LIMITES_FAIXAS_ATRASO):
+    """Pares ``(rotulo, condicao)`` com os filtros de ``data_vencimento`` de cada faixa.
+
+    Cada faixa termina em um dos ``limites`` (inclusive) e a última é aberta.
+    Parcelas ainda a vencer entram na primeira faixa.
+    """
+
+    limites = sorted(limites)
+    condicoes = []
+    limite_anterior = None
+    for rotulo, limite in zip(rotulos_faixas_atraso(limites), limites + [None]):
+        condicao = {}
+        if limite is not None:
+            condicao["data_vencimento__gte"] = data_referencia - timedelta(days=limite)
+        if limite_anterior is not None:
+            condicao["data_vencimento__lt"] = data_referencia - timedelta(days=limite_anterior)
+        condicoes.append((rotulo, condicao))
+        limite_anterior = limite
+    return condicoes
+
+
+class RecebivelQuerySet(models.QuerySet):
+    def em_aberto(self):
+        return self.exclude(status=Recebivel.Status.PAGO)
+
+    def na_faixa(self, rotulo, data_referencia=None, limites=LIMITES_FAIXAS_ATRASO):
+        """Parcelas cujo vencimento cai na faixa de atraso ``rotulo`` (ex.: "31-60")."""
+
+        data_referencia = data_referencia or timezone.localdate()
+        condicoes = dict(condicoes_faixas_atraso(data_referencia, limites))
+        if rotulo not in condicoes:
+            raise ValueError(f"Faixa de atraso inválida: {rotulo!r}")
+        return self.filter(**condicoes[rotulo])
+
+    def faixas_de_atraso(self, data_referencia=None, limites=LIMITES_FAIXAS_ATRASO):
+        """Soma o saldo devedor por faixa de dias de atraso em uma única consulta.
+
+        As faixas seguem ``condicoes_faixas_atraso``. Retorna um dicionário
+        ordenado ``{rotulo: saldo}`` com todas as faixas, inclusive as zeradas.
+        """
+
+        data_referencia = data_referencia or timezone.localdate()
+        saldo = ExpressionWrapper(
+            F("valor") - F("valor_pago"),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        )
+
+        condicoes = condicoes_faixas_atraso(data_referencia, limites)
+        faixas = {
+            f"faixa_{indice}": Coalesce(
+                Sum(
+                    Case(
+                        When(then=saldo, **condicao),
+                        default=Value(Decimal("0")),
+                        output_field=saldo.output_field,
+                    )
+                ),
+                Decimal("0"),
+            )
+            for indice, (_, condicao) in enumerate(condicoes)
+        }
+        totais = self.aggregate(**faixas)
+        return {rotulo: totais[f"faixa_{indice}"] for indice, (rotulo, _) in enumerate(condicoes)}
+
+
+class Recebivel(AtomicSaveModel):
     class Status(models.TextChoices):
         ABERTO = "aberto", "Em aberto"
         PAGO = "pago", "Pago"
@@ -20,11 +103,23 @@ class Recebivel(TimeStampedModel):
     data_pagamento = models.DateField(null=True, blank=True)
     valor_pago = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     status = models.CharField(max_length=15, choices=Status.choices, default=Status.ABERTO)
+    codigo_origem = models.CharField(
+        "Código na planilha de origem", max_length=60, unique=True, null=True, blank=True
+    )
+
+    objects = RecebivelQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Recebível"
         verbose_name_plural = "Recebíveis"
         ordering = ("data_vencimento",)
+        indexes = [
+            models.Index(
+                fields=("status", "data_vencimento"), name="recebivel_status_venc_idx"
+            ),
+            # O filtro de período do dashboard não restringe o status.
+            models.Index(fields=("data_vencimento",), name="recebivel_venc_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"Parcela {self.id} - {self.venda}"
@@ -50,3 +145,41 @@ class Recebivel(TimeStampedModel):
         hoje = timezone.localdate()
         delta = hoje - self.data_vencimento
         return max(delta.days, 0)
+
+
+class RecebivelArquivo(models.Model):
+    """Parcela paga movida para o arquivo por ``manage.py arquivar``.
+
+    Guarda o ID e os campos da parcela original. A venda pode ser arquivada
+    depois da parcela, por isso ``venda_id`` não é chave estrangeira; corretor,
+    empreendimento e cliente são copiados da venda para a busca no admin.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    venda_id = models.BigIntegerField("ID da venda", db_index=True)
+    corretor = models.ForeignKey(
+        "comercial.Corretor", on_delete=models.PROTECT, related_name="+"
+    )
+    empreendimento = models.ForeignKey(
+        "comercial.Empreendimento", on_delete=models.PROTECT, related_name="+"
+    )
+    cliente_nome = models.CharField(max_length=120)
+    data_vencimento = models.DateField()
+    valor = models.DecimalField(max_digits=12, decimal_places=2)
+    data_pagamento = models.DateField(null=True, blank=True)
+    valor_pago = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    status = models.CharField(max_length=15, choices=Recebivel.Status.choices)
+    codigo_origem = models.CharField(
+        "Código na planilha de origem", max_length=60, null=True, blank=True, db_index=True
+    )
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    arquivado_em = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Recebível arquivado"
+        verbose_name_plural = "Recebíveis arquivados"
+        ordering = ("-data_vencimento",)
+
+    def __str__(self) -> str:
+        return f"Parcela {self.id} - {self.cliente_nome}"
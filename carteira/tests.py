@@ -1,3 +1,80 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import connection
 from django.test import TestCase
 
-# Create your tests here.
+from carteira.models import Recebivel
+from comercial.models import Corretor, Empreendimento, Venda
+from dashboards.filtros import Filtros
+
+
+class FaixasDeAtrasoTests(TestCase):
+    def setUp(self) -> None:
+        self.referencia = date(2024, 6, 30)
+        venda = Venda.objects.create(
+            corretor=Corretor.objects.create(nome="Carla Dias"),
+            empreendimento=Empreendimento.objects.create(nome="Vista Mar", cidade="Recife"),
+            cliente_nome="Pedro Alves",
+            data_venda=date(2023, 1, 10),
+            valor_contrato=Decimal("900000.00"),
+        )
+        parcelas = (
+            (-10, "5"),
+            (30, "10"),
+            (31, "20"),
+            (60, "40"),
+            (61, "80"),
+            (120, "160"),
+            (121, "320"),
+        )
+        for dias, valor in parcelas:
+            Recebivel.objects.create(
+                venda=venda,
+                data_vencimento=self.referencia - timedelta(days=dias),
+                valor=Decimal(valor),
+                valor_pago=Decimal("1"),
+                status=Recebivel.Status.ATRASADO,
+            )
+        Recebivel.objects.create(
+            venda=venda,
+            data_vencimento=self.referencia - timedelta(days=200),
+            valor=Decimal("1000"),
+            valor_pago=Decimal("1000"),
+            status=Recebivel.Status.PAGO,
+        )
+
+    def test_default_buckets_match_dashboard_boundaries(self) -> None:
+        with self.assertNumQueries(1):
+            faixas = Recebivel.objects.em_aberto().faixas_de_atraso(self.referencia)
+
+        self.assertEqual(
+            faixas,
+            {
+                "0-30": Decimal("13"),
+                "31-60": Decimal("58"),
+                "61-120": Decimal("238"),
+                "120+": Decimal("319"),
+            },
+        )
+        self.assertEqual(list(faixas), ["0-30", "31-60", "61-120", "120+"])
+
+    def test_custom_limits(self) -> None:
+        faixas = Recebivel.objects.em_aberto().faixas_de_atraso(
+            self.referencia, limites=(90, 30)
+        )
+        self.assertEqual(
+            faixas,
+            {"0-30": Decimal("13"), "31-90": Decimal("137"), "90+": Decimal("478")},
+        )
+
+    def test_dashboard_period_filter_uses_the_due_date_index(self) -> None:
+        filtros = Filtros(data_inicio=date(2024, 1, 1), data_fim=date(2024, 3, 31))
+        if connection.vendor == "postgresql":
+            # Tabela pequena: sem isso o PostgreSQL prefere a varredura sequencial.
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+        plano = filtros.recebiveis(Recebivel.objects.all()).explain()
+
+        self.assertIn("recebivel_venc_idx", plano)
@@ -1,6 +1,8 @@
 from django.contrib import admin
 
-from .models import Corretor, Empreendimento, Venda
+from core.admin import ModelAdminArquivo, ModelAdminGrandeVolume
+
+from .models import Corretor, Empreendimento, Venda, VendaArquivo
 
 
 @admin.register(Corretor)
@@ -17,7 +19,7 @@ class EmpreendimentoAdmin(admin.ModelAdmin):
 
 
 @admin.register(Venda)
-class VendaAdmin(admin.ModelAdmin):
+class VendaAdmin(ModelAdminGrandeVolume):
     list_display = (
         "cliente_nome",
         "empreendimento",
@@ -27,6 +29,26 @@ class VendaAdmin(admin.ModelAdmin):
         "valor_contrato",
         "status",
     )
+    list_select_related = ("empreendimento", "corretor")
     list_filter = ("status", "data_venda")
+    date_hierarchy = "data_venda"
     search_fields = ("cliente_nome", "empreendimento__nome", "corretor__nome")
     autocomplete_fields = ("corretor", "empreendimento")
+
+
+@admin.register(VendaArquivo)
+class VendaArquivoAdmin(ModelAdminArquivo):
+    list_display = (
+        "id",
+        "cliente_nome",
+        "empreendimento",
+        "corretor",
+        "data_venda",
+        "valor_contrato",
+        "status",
+        "arquivado_em",
+    )
+    list_select_related = ("empreendimento", "corretor")
+    list_filter = ("data_venda",)
+    date_hierarchy = "data_venda"
+    search_fields = ("=id", "=codigo_origem", "cliente_nome")
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("comercial", "0002_alter_corretor_updated_at_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="venda",
+            index=models.Index(
+                fields=["data_venda", "empreendimento"], name="venda_data_empreend_idx"
+            ),
+        ),
+    ]
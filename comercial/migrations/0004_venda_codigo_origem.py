@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("comercial", "0003_venda_venda_data_empreend_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="venda",
+            name="codigo_origem",
+            field=models.CharField(
+                blank=True,
+                max_length=60,
+                null=True,
+                unique=True,
+                verbose_name="Código na planilha de origem",
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+from django.db import migrations
+
+from core.postgres import indices_trigrama
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("comercial", "0004_venda_codigo_origem"),
+    ]
+
+    operations = [
+        indices_trigrama(
+            ("comercial.Corretor", "nome"),
+            ("comercial.Empreendimento", "nome"),
+            ("comercial.Venda", "cliente_nome"),
+        ),
+    ]
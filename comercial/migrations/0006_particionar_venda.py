@@ -0,0 +1,14 @@
+from django.db import migrations
+
+from core.particionamento import converter_em_particionada
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("comercial", "0005_indices_trigrama"),
+    ]
+
+    operations = [
+        converter_em_particionada("comercial.Venda"),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:27
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+from core.postgres import indices_trigrama
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("comercial", "0006_particionar_venda"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VendaArquivo",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("cliente_nome", models.CharField(max_length=120)),
+                ("data_venda", models.DateField()),
+                ("unidades_vendidas", models.PositiveIntegerField(default=1)),
+                (
+                    "valor_contrato",
+                    models.DecimalField(decimal_places=2, max_digits=12),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("ativa", "Ativa"),
+                            ("cancelada", "Cancelada"),
+                            ("concluida", "Concluída"),
+                        ],
+                        max_length=15,
+                    ),
+                ),
+                (
+                    "codigo_origem",
+                    models.CharField(
+                        blank=True,
+                        db_index=True,
+                        max_length=60,
+                        null=True,
+                        verbose_name="Código na planilha de origem",
+                    ),
+                ),
+                ("created_at", models.DateTimeField()),
+                ("updated_at", models.DateTimeField()),
+                (
+                    "arquivado_em",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                (
+                    "corretor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="+",
+                        to="comercial.corretor",
+                    ),
+                ),
+                (
+                    "empreendimento",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="+",
+                        to="comercial.empreendimento",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Venda arquivada",
+                "verbose_name_plural": "Vendas arquivadas",
+                "ordering": ("-data_venda",),
+            },
+        ),
+        indices_trigrama(("comercial.VendaArquivo", "cliente_nome")),
+    ]
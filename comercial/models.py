@@ -1,8 +1,9 @@
 from decimal import Decimal
 
 from django.db import models
+from django.utils import timezone
 
-from core.models import TimeStampedModel
+from core.models import AtomicSaveModel, TimeStampedModel
 
 
 class Corretor(TimeStampedModel):
@@ -34,7 +35,7 @@ class Empreendimento(TimeStampedModel):
         return self.nome
 
 
-class Venda(TimeStampedModel):
+class Venda(AtomicSaveModel):
     class Status(models.TextChoices):
         ATIVA = "ativa", "Ativa"
         CANCELADA = "cancelada", "Cancelada"
@@ -49,11 +50,19 @@ class Venda(TimeStampedModel):
     unidades_vendidas = models.PositiveIntegerField(default=1)
     valor_contrato = models.DecimalField(max_digits=12, decimal_places=2)
     status = models.CharField(max_length=15, choices=Status.choices, default=Status.ATIVA)
+    codigo_origem = models.CharField(
+        "Código na planilha de origem", max_length=60, unique=True, null=True, blank=True
+    )
 
     class Meta:
         verbose_name = "Venda"
         verbose_name_plural = "Vendas"
         ordering = ("-data_venda",)
+        indexes = [
+            models.Index(
+                fields=("data_venda", "empreendimento"), name="venda_data_empreend_idx"
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"{self.cliente_nome} - {self.empreendimento}"
@@ -65,3 +74,36 @@ class Venda(TimeStampedModel):
         return (self.valor_contrato or Decimal("0")) / Decimal(
             self.unidades_vendidas
         )
+
+
+class VendaArquivo(models.Model):
+    """Venda cancelada movida para o arquivo por ``manage.py arquivar``.
+
+    Guarda o ID e os campos da venda original. Os valores seguem nos KPIs
+    pelos totais pré-agregados de ``dashboards.TotalArquivado``.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    corretor = models.ForeignKey(Corretor, on_delete=models.PROTECT, related_name="+")
+    empreendimento = models.ForeignKey(
+        Empreendimento, on_delete=models.PROTECT, related_name="+"
+    )
+    cliente_nome = models.CharField(max_length=120)
+    data_venda = models.DateField()
+    unidades_vendidas = models.PositiveIntegerField(default=1)
+    valor_contrato = models.DecimalField(max_digits=12, decimal_places=2)
+    status = models.CharField(max_length=15, choices=Venda.Status.choices)
+    codigo_origem = models.CharField(
+        "Código na planilha de origem", max_length=60, null=True, blank=True, db_index=True
+    )
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    arquivado_em = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Venda arquivada"
+        verbose_name_plural = "Vendas arquivadas"
+        ordering = ("-data_venda",)
+
+    def __str__(self) -> str:
+        return f"{self.cliente_nome} - {self.empreendimento}"
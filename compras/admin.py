@@ -1,5 +1,7 @@
 from django.contrib import admin
 
+from core.admin import ModelAdminGrandeVolume
+
 from .models import Fornecedor, ItemCompra, PedidoCompra
 
 
@@ -15,7 +17,7 @@ class FornecedorAdmin(admin.ModelAdmin):
 
 
 @admin.register(PedidoCompra)
-class PedidoCompraAdmin(admin.ModelAdmin):
+class PedidoCompraAdmin(ModelAdminGrandeVolume):
     list_display = (
         "empreendimento",
         "fornecedor",
@@ -23,7 +25,9 @@ class PedidoCompraAdmin(admin.ModelAdmin):
         "categoria",
         "valor_total",
     )
+    list_select_related = ("empreendimento", "fornecedor")
     list_filter = ("categoria", "data_pedido")
+    date_hierarchy = "data_pedido"
     search_fields = (
         "empreendimento__nome",
         "fornecedor__nome",
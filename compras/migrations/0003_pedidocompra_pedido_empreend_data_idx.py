@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("comercial", "0003_venda_venda_data_empreend_idx"),
+        ("compras", "0002_alter_fornecedor_updated_at_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="pedidocompra",
+            index=models.Index(
+                fields=["empreendimento", "data_pedido"],
+                name="pedido_empreend_data_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,14 @@
+from django.db import migrations
+
+from core.postgres import indices_trigrama
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("compras", "0004_pedidocompra_codigo_origem"),
+    ]
+
+    operations = [
+        indices_trigrama(("compras.Fornecedor", "nome")),
+    ]
@@ -39,11 +39,19 @@ class PedidoCompra(TimeStampedModel):
     data_pedido = models.DateField()
     categoria = models.CharField(max_length=20, choices=CATEGORIAS)
     valor_total = models.DecimalField(max_digits=12, decimal_places=2)
+    codigo_origem = models.CharField(
+        "Código na planilha de origem", max_length=60, unique=True, null=True, blank=True
+    )
 
     class Meta:
         verbose_name = "Pedido de Compra"
         verbose_name_plural = "Pedidos de Compra"
         ordering = ("-data_pedido",)
+        indexes = [
+            models.Index(
+                fields=("empreendimento", "data_pedido"), name="pedido_empreend_data_idx"
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"{self.fornecedor} - {self.empreendimento}"
@@ -1,3 +1,65 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
 
-# Register your models here.
+from .postgres import contagem_estimada
+
+# Abaixo deste número de linhas a contagem exata é barata e continua sendo usada.
+LIMITE_CONTAGEM_EXATA = 10_000
+
+
+class PaginadorContagemEstimada(Paginator):
+    """Paginador que, sem filtros, usa a contagem estimada do PostgreSQL.
+
+    Com busca ou filtros aplicados a contagem continua exata, pois a
+    estimativa da tabela não vale para um subconjunto.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet) and not queryset.query.where:
+            estimativa = contagem_estimada(queryset.model, connections[queryset.db])
+            if estimativa is not None and estimativa >= LIMITE_CONTAGEM_EXATA:
+                return estimativa
+        return super().count
+
+
+class ModelAdminGrandeVolume(admin.ModelAdmin):
+    """Base dos admins de tabelas transacionais grandes (vendas, recebíveis, pedidos).
+
+    As subclasses informam ``list_select_related`` com as relações usadas em
+    ``list_display`` (inclusive as de ``__str__``) e ``date_hierarchy``; os
+    campos de ``search_fields`` devem ter índice de trigramas no PostgreSQL
+    (ver ``core.postgres.indices_trigrama``).
+    """
+
+    paginator = PaginadorContagemEstimada
+    show_full_result_count = False
+    list_per_page = 50
+
+
+class ModelAdminArquivo(ModelAdminGrandeVolume):
+    """Base dos admins, somente leitura, das tabelas de arquivo.
+
+    A lista só consulta o arquivo quando há um termo de busca: sem ele, abrir
+    a página não varre uma tabela que tende a ser a maior do banco.
+    """
+
+    search_help_text = "Informe um termo de busca para consultar o arquivo."
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset.none(), False
+        return super().get_search_results(request, queryset, search_term)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,119 @@
+"""Teste de carga das conexões com o banco, pelo handler WSGI do próprio Django.
+
+Cada trabalhador é uma thread de vida longa, como as de um servidor WSGI com
+threads (``gunicorn --threads``), que repete requisições completas: os sinais
+``request_started`` e ``request_finished`` aplicam ``CONN_MAX_AGE``,
+``CONN_HEALTH_CHECKS`` e o pool exatamente como em produção. Quando as
+conexões não são reaproveitadas, o custo de abri-las (TCP e autenticação)
+aparece nas latências. O cliente de testes do Django não serve aqui, pois
+desliga o fechamento de conexões ao fim de cada requisição.
+
+Para comparar configurações, rode o teste contra o mesmo banco com o pool
+(padrão), com ``DB_POOL=False`` (conexões persistentes) e com ``DB_POOL=False
+DB_CONN_MAX_AGE=0`` (uma conexão por requisição).
+"""
+
+import math
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection, connections
+from django.test import Client, RequestFactory
+from django.utils import timezone
+
+CAMINHO_PADRAO = "/dashboards/api/carteira/inadimplencia-corretor/"
+
+
+def cookie_sessao(usuario):
+    """Cabeçalho ``Cookie`` de uma sessão autenticada de ``usuario``."""
+
+    cliente = Client()
+    cliente.force_login(usuario)
+    nome = settings.SESSION_COOKIE_NAME
+    return f"{nome}={cliente.cookies[nome].value}"
+
+
+def _requisitar(handler, caminho, cookie):
+    cabecalhos = {"HTTP_COOKIE": cookie} if cookie else {}
+    ambiente = RequestFactory().get(caminho, **cabecalhos).environ
+    estado = []
+    inicio = time.perf_counter()
+    resposta = handler(ambiente, lambda status, headers, exc_info=None: estado.append(status))
+    try:
+        for _ in resposta:
+            pass
+    finally:
+        # Como um servidor WSGI: dispara ``request_finished`` e a gestão das conexões.
+        resposta.close()
+    return time.perf_counter() - inicio, int(estado[0].split()[0])
+
+
+def _trabalhador(handler, caminho, cookie, quantidade):
+    medidas = []
+    try:
+        for _ in range(quantidade):
+            medidas.append(_requisitar(handler, caminho, cookie))
+    finally:
+        connections.close_all()
+    return medidas
+
+
+def percentil(valores, p):
+    """Percentil ``p`` (0 a 100) de ``valores`` pelo método do posto mais próximo."""
+
+    ordenados = sorted(valores)
+    return ordenados[max(1, math.ceil(len(ordenados) * p / 100)) - 1]
+
+
+def configuracao_conexoes(alias="default"):
+    banco = settings.DATABASES[alias]
+    return {
+        "banco": connections[alias].vendor,
+        "conn_max_age": banco.get("CONN_MAX_AGE", 0),
+        "conn_health_checks": banco.get("CONN_HEALTH_CHECKS", False),
+        "pool": banco.get("OPTIONS", {}).get("pool"),
+    }
+
+
+def executar(caminho=CAMINHO_PADRAO, requisicoes=500, concorrencia=8, cookie=None):
+    """Dispara ``requisicoes`` GETs em ``caminho`` por ``concorrencia`` threads.
+
+    Retorna a configuração de conexões em uso e as latências em milissegundos.
+    """
+
+    handler = WSGIHandler()
+    cotas = [
+        requisicoes // concorrencia + (1 if indice < requisicoes % concorrencia else 0)
+        for indice in range(concorrencia)
+    ]
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concorrencia, thread_name_prefix="carga") as pool:
+        tarefas = [
+            pool.submit(_trabalhador, handler, caminho, cookie, cota) for cota in cotas if cota
+        ]
+        medidas = [medida for tarefa in tarefas for medida in tarefa.result()]
+    duracao = time.perf_counter() - inicio
+
+    tempos = [segundos * 1000 for segundos, _ in medidas]
+    status = {}
+    for _, codigo in medidas:
+        status[codigo] = status.get(codigo, 0) + 1
+    return {
+        "executado_em": timezone.now().isoformat(),
+        **configuracao_conexoes(connection.alias),
+        "caminho": caminho,
+        "requisicoes": len(medidas),
+        "concorrencia": concorrencia,
+        "status": {str(codigo): total for codigo, total in sorted(status.items())},
+        "requisicoes_por_segundo": round(len(medidas) / duracao, 1) if duracao else None,
+        "ms": {
+            "media": round(statistics.fmean(tempos), 2),
+            "p50": round(percentil(tempos, 50), 2),
+            "p95": round(percentil(tempos, 95), 2),
+            "p99": round(percentil(tempos, 99), 2),
+            "max": round(max(tempos), 2),
+        },
+    }
@@ -0,0 +1,445 @@
+"""Importação em lote das planilhas de Comercial, Carteira, Compras e Planejamento.
+
+As linhas são lidas em fluxo (CSV ou XLSX), convertidas e validadas em lotes
+e gravadas com ``bulk_create(update_conflicts=True)`` sobre ``codigo_origem``,
+de modo que reimportar a mesma planilha atualiza os registros em vez de
+duplicá-los; linhas de vendas e parcelas já arquivadas são recusadas.
+Corretores, empreendimentos, fornecedores e categorias são resolvidos pelo
+nome através de um cache em memória e criados quando ainda não existem. Antes
+de gravar, cada registro passa pelas validações de tamanho, dígitos e opções
+dos campos: o que o banco recusaria derrubaria o lote inteiro, e assim só a
+linha é reportada.
+
+Gravações em lote não disparam ``post_save``; ao final de cada lote é enviado
+o sinal ``lote_importado`` com o modelo gravado como ``sender``, os objetos
+gravados em ``objetos`` e, em ``anteriores``, os valores
+(``campos_anteriores``) que os registros já existentes tinham antes do lote,
+lidos com bloqueio.
+"""
+
+import csv
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from pathlib import Path
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.dispatch import Signal
+
+from carteira.models import Recebivel, RecebivelArquivo
+from comercial.models import Corretor, Empreendimento, Venda, VendaArquivo
+from compras.models import Fornecedor, PedidoCompra
+from planejamento.models import CategoriaPlanejamento, TarefaPlanejada
+
+from . import particionamento
+
+TAMANHO_LOTE = 5000
+
+lote_importado = Signal()
+
+
+class ErroImportacao(Exception):
+    pass
+
+
+@dataclass
+class ResultadoImportacao:
+    processados: int = 0
+    erros: list = field(default_factory=list)
+
+
+def ler_planilha(caminho, planilha=None, delimitador=";"):
+    """Gera dicionários ``{cabeçalho: valor}`` de um arquivo CSV ou XLSX."""
+
+    caminho = Path(caminho)
+    if caminho.suffix.lower() == ".xlsx":
+        try:
+            from openpyxl import load_workbook
+        except ImportError as exc:  # pragma: no cover - dependência opcional
+            raise ErroImportacao("Instale o openpyxl para importar arquivos .xlsx.") from exc
+
+        livro = load_workbook(caminho, read_only=True, data_only=True)
+        try:
+            folha = livro[planilha] if planilha else livro.active
+            linhas = folha.iter_rows(values_only=True)
+            cabecalho = [str(valor).strip() for valor in next(linhas, ())]
+            for valores in linhas:
+                yield dict(zip(cabecalho, valores))
+        finally:
+            livro.close()
+    else:
+        with caminho.open(encoding="utf-8-sig", newline="") as arquivo:
+            yield from csv.DictReader(arquivo, delimiter=delimitador)
+
+
+def _texto(valor, obrigatorio=True):
+    texto = "" if valor is None else str(valor).strip()
+    if obrigatorio and not texto:
+        raise ValueError("valor obrigatório ausente")
+    return texto
+
+
+def _data(valor, obrigatorio=True):
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    texto = _texto(valor, obrigatorio)
+    if not texto:
+        return None
+    try:
+        return date.fromisoformat(texto)
+    except ValueError:
+        return datetime.strptime(texto, "%d/%m/%Y").date()
+
+
+def _decimal(valor, obrigatorio=True):
+    if isinstance(valor, (int, float, Decimal)):
+        return Decimal(str(valor))
+    texto = _texto(valor, obrigatorio)
+    if not texto:
+        return Decimal("0")
+    if "," in texto:
+        texto = texto.replace(".", "").replace(",", ".")
+    try:
+        return Decimal(texto)
+    except InvalidOperation as exc:
+        raise ValueError(f"valor numérico inválido: {valor!r}") from exc
+
+
+def _inteiro(valor, padrao):
+    if _texto(valor, obrigatorio=False) == "":
+        return padrao
+    numero = _decimal(valor)
+    if numero != numero.to_integral_value() or numero < 0:
+        raise ValueError(f"quantidade inválida: {valor!r}")
+    return int(numero)
+
+
+def _validar(objeto, exclude=()):
+    """Converte em ``ValueError`` as falhas de ``clean_fields`` de ``objeto``."""
+
+    try:
+        objeto.clean_fields(exclude=exclude)
+    except ValidationError as exc:
+        raise ValueError(
+            "; ".join(
+                f"{campo}: {' '.join(mensagens)}"
+                for campo, mensagens in exc.message_dict.items()
+            )
+        ) from exc
+
+
+def _escolha(valor, choices, padrao):
+    texto = _texto(valor, obrigatorio=False).lower()
+    if not texto:
+        return padrao
+    for chave, rotulo in choices:
+        if texto in (chave, str(rotulo).lower()):
+            return chave
+    raise ValueError(f"opção inválida: {valor!r}")
+
+
+class CacheChavesNaturais:
+    """Mapeia nomes para IDs, criando em lote os registros que faltarem."""
+
+    def __init__(self, modelo, campo="nome"):
+        self.modelo = modelo
+        self.campo = campo
+        self.ids = dict(modelo.objects.values_list(campo, "id"))
+        self.invalidos = {}
+
+    def garantir(self, valores):
+        """Garante que todos os ``valores`` (nome -> campos extras) existam.
+
+        Nomes que o banco recusaria não são criados; as linhas que os usam são
+        reportadas com o motivo.
+        """
+
+        faltantes = {}
+        for nome, extras in valores.items():
+            if nome in self.ids or nome in self.invalidos:
+                continue
+            try:
+                for campo, valor in {self.campo: nome, **extras}.items():
+                    self.modelo._meta.get_field(campo).run_validators(valor)
+            except ValidationError as exc:
+                self.invalidos[nome] = " ".join(exc.messages)
+            else:
+                faltantes[nome] = extras
+        if not faltantes:
+            return
+        self.modelo.objects.bulk_create(
+            [self.modelo(**{self.campo: nome}, **extras) for nome, extras in faltantes.items()]
+        )
+        self.ids.update(
+            self.modelo.objects.filter(**{f"{self.campo}__in": faltantes}).values_list(
+                self.campo, "id"
+            )
+        )
+
+    def __getitem__(self, nome):
+        if nome in self.invalidos:
+            raise ValueError(f"{self.modelo._meta.verbose_name} inválido: {self.invalidos[nome]}")
+        return self.ids[nome]
+
+
+class Importador:
+    """Converte e grava um tipo de planilha; subclasses definem ``converter``."""
+
+    modelo = None
+    campos_atualizados = ()
+    # Modelo de arquivo (``dashboards.arquivamento``): códigos já arquivados
+    # não voltam para a tabela de origem, onde seriam contados duas vezes.
+    arquivo = None
+    # Consultas (``values()``) do que um registro tinha antes de ser regravado
+    # (as chaves que pode deixar e a sua contribuição aos totais), enviadas em
+    # ``anteriores`` para quem mantém dados derivados.
+    campos_anteriores = ()
+
+    def preparar(self, linhas):
+        """Resolve, para o lote, as chaves naturais referenciadas pelas linhas."""
+
+    def converter(self, linha):
+        raise NotImplementedError
+
+    def anteriores(self, objetos):
+        """``campos_anteriores`` dos registros de ``objetos`` que já existem, antes do upsert."""
+
+        if not self.campos_anteriores or not objetos:
+            return []
+        return list(
+            self.modelo.objects.select_for_update(of=("self",))
+            .filter(codigo_origem__in=[objeto.codigo_origem for objeto in objetos])
+            .order_by()
+            .values(*self.campos_anteriores)
+        )
+
+    def gravar(self, objetos):
+        unicos = ["codigo_origem"]
+        # Em tabelas particionadas o código só é único junto com a data.
+        campo = particionamento.campo_particao(self.modelo)
+        if campo:
+            particionamento.realinhar(self.modelo, campo, objetos)
+            unicos.append(campo)
+        self.modelo.objects.bulk_create(
+            objetos,
+            update_conflicts=True,
+            unique_fields=unicos,
+            update_fields=[*self.campos_atualizados, "updated_at"],
+        )
+
+    def importar(self, linhas, tamanho_lote=TAMANHO_LOTE):
+        resultado = ResultadoImportacao()
+        # As referências já foram resolvidas em ``preparar``.
+        relacoes = [campo.name for campo in self.modelo._meta.concrete_fields if campo.is_relation]
+        linhas = enumerate(linhas, start=2)  # a linha 1 é o cabeçalho
+        while lote := list(islice(linhas, tamanho_lote)):
+            with transaction.atomic():
+                self.preparar([linha for _, linha in lote])
+                objetos, numeros = {}, {}
+                for numero, linha in lote:
+                    try:
+                        objeto = self.converter(linha)
+                        _validar(objeto, exclude=relacoes)
+                    except KeyError as exc:
+                        resultado.erros.append((numero, f"referência não encontrada: {exc}"))
+                        continue
+                    except ValueError as exc:
+                        resultado.erros.append((numero, str(exc)))
+                        continue
+                    # A última ocorrência de um código no lote prevalece.
+                    objetos[objeto.codigo_origem] = objeto
+                    numeros[objeto.codigo_origem] = numero
+                if self.arquivo is not None and objetos:
+                    for codigo in self.arquivo.objects.filter(
+                        codigo_origem__in=list(objetos)
+                    ).values_list("codigo_origem", flat=True).distinct():
+                        resultado.erros.append((numeros[codigo], f"registro arquivado: {codigo}"))
+                        del objetos[codigo]
+                gravados = list(objetos.values())
+                anteriores = self.anteriores(gravados)
+                self.gravar(gravados)
+                # Dentro da transação, para que o que depende do lote seja
+                # atualizado atomicamente com ele.
+                lote_importado.send(
+                    sender=self.modelo, objetos=gravados, anteriores=anteriores
+                )
+            resultado.processados += len(gravados)
+        return resultado
+
+
+def _nomes(linhas, coluna, extras=lambda linha: {}):
+    """Nomes não vazios de ``coluna`` no lote, com os campos usados ao criá-los."""
+
+    nomes = {}
+    for linha in linhas:
+        nome = _texto(linha.get(coluna), obrigatorio=False)
+        if nome:
+            nomes.setdefault(nome, extras(linha))
+    return nomes
+
+
+class ImportadorVendas(Importador):
+    modelo = Venda
+    arquivo = VendaArquivo
+    campos_anteriores = (
+        "id",
+        "codigo_origem",
+        "corretor_id",
+        "empreendimento_id",
+        "valor_contrato",
+        "unidades_vendidas",
+    )
+    campos_atualizados = (
+        "corretor",
+        "empreendimento",
+        "cliente_nome",
+        "data_venda",
+        "unidades_vendidas",
+        "valor_contrato",
+        "status",
+    )
+
+    def __init__(self):
+        self.corretores = CacheChavesNaturais(Corretor)
+        self.empreendimentos = CacheChavesNaturais(Empreendimento)
+
+    def preparar(self, linhas):
+        self.corretores.garantir(_nomes(linhas, "corretor"))
+        self.empreendimentos.garantir(
+            _nomes(
+                linhas,
+                "empreendimento",
+                lambda linha: {"cidade": _texto(linha.get("cidade"), obrigatorio=False)},
+            )
+        )
+
+    def converter(self, linha):
+        return Venda(
+            codigo_origem=_texto(linha.get("codigo")),
+            corretor_id=self.corretores[_texto(linha.get("corretor"))],
+            empreendimento_id=self.empreendimentos[_texto(linha.get("empreendimento"))],
+            cliente_nome=_texto(linha.get("cliente")),
+            data_venda=_data(linha.get("data_venda")),
+            unidades_vendidas=_inteiro(linha.get("unidades"), padrao=1),
+            valor_contrato=_decimal(linha.get("valor_contrato")),
+            status=_escolha(linha.get("status"), Venda.Status.choices, Venda.Status.ATIVA),
+        )
+
+
+class ImportadorRecebiveis(Importador):
+    modelo = Recebivel
+    arquivo = RecebivelArquivo
+    campos_anteriores = (
+        "venda__corretor_id",
+        "venda__empreendimento_id",
+        "valor",
+        "valor_pago",
+        "status",
+    )
+    campos_atualizados = (
+        "venda",
+        "data_vencimento",
+        "valor",
+        "data_pagamento",
+        "valor_pago",
+        "status",
+    )
+
+    def __init__(self):
+        self.vendas = {}
+
+    def preparar(self, linhas):
+        # As vendas são muitas para caber em memória; guarda só as do lote.
+        codigos = {_texto(linha.get("venda"), obrigatorio=False) for linha in linhas}
+        codigos.discard("")
+        self.vendas = dict(
+            Venda.objects.filter(codigo_origem__in=codigos).values_list("codigo_origem", "id")
+            if codigos
+            else ()
+        )
+
+    def converter(self, linha):
+        return Recebivel(
+            codigo_origem=_texto(linha.get("codigo")),
+            venda_id=self.vendas[_texto(linha.get("venda"))],
+            data_vencimento=_data(linha.get("data_vencimento")),
+            valor=_decimal(linha.get("valor")),
+            data_pagamento=_data(linha.get("data_pagamento"), obrigatorio=False),
+            valor_pago=_decimal(linha.get("valor_pago"), obrigatorio=False),
+            status=_escolha(
+                linha.get("status"), Recebivel.Status.choices, Recebivel.Status.ABERTO
+            ),
+        )
+
+
+class ImportadorPedidos(Importador):
+    modelo = PedidoCompra
+    campos_anteriores = ("empreendimento_id", "fornecedor_id")
+    campos_atualizados = ("empreendimento", "fornecedor", "data_pedido", "categoria", "valor_total")
+
+    def __init__(self):
+        self.empreendimentos = CacheChavesNaturais(Empreendimento)
+        self.fornecedores = CacheChavesNaturais(Fornecedor)
+
+    def preparar(self, linhas):
+        self.empreendimentos.garantir(_nomes(linhas, "empreendimento"))
+        self.fornecedores.garantir(_nomes(linhas, "fornecedor"))
+
+    def converter(self, linha):
+        return PedidoCompra(
+            codigo_origem=_texto(linha.get("codigo")),
+            empreendimento_id=self.empreendimentos[_texto(linha.get("empreendimento"))],
+            fornecedor_id=self.fornecedores[_texto(linha.get("fornecedor"))],
+            data_pedido=_data(linha.get("data_pedido")),
+            categoria=_escolha(linha.get("categoria"), PedidoCompra.CATEGORIAS, "outros"),
+            valor_total=_decimal(linha.get("valor_total")),
+        )
+
+
+class ImportadorTarefas(Importador):
+    modelo = TarefaPlanejada
+    campos_anteriores = ("empreendimento_id",)
+    campos_atualizados = (
+        "empreendimento",
+        "categoria",
+        "nome",
+        "data_inicio_prevista",
+        "data_fim_prevista",
+        "data_fim_real",
+        "custo_planejado",
+        "custo_real",
+    )
+
+    def __init__(self):
+        self.empreendimentos = CacheChavesNaturais(Empreendimento)
+        self.categorias = CacheChavesNaturais(CategoriaPlanejamento)
+
+    def preparar(self, linhas):
+        self.empreendimentos.garantir(_nomes(linhas, "empreendimento"))
+        self.categorias.garantir(_nomes(linhas, "categoria"))
+
+    def converter(self, linha):
+        categoria = _texto(linha.get("categoria"), obrigatorio=False)
+        return TarefaPlanejada(
+            codigo_origem=_texto(linha.get("codigo")),
+            empreendimento_id=self.empreendimentos[_texto(linha.get("empreendimento"))],
+            categoria_id=self.categorias[categoria] if categoria else None,
+            nome=_texto(linha.get("nome")),
+            data_inicio_prevista=_data(linha.get("data_inicio_prevista")),
+            data_fim_prevista=_data(linha.get("data_fim_prevista")),
+            data_fim_real=_data(linha.get("data_fim_real"), obrigatorio=False),
+            custo_planejado=_decimal(linha.get("custo_planejado")),
+            custo_real=_decimal(linha.get("custo_real"), obrigatorio=False),
+        )
+
+
+IMPORTADORES = {
+    "vendas": ImportadorVendas,
+    "recebiveis": ImportadorRecebiveis,
+    "pedidos": ImportadorPedidos,
+    "tarefas": ImportadorTarefas,
+}
@@ -0,0 +1,135 @@
+"""Instrumentação de latência, consultas SQL e memória por requisição.
+
+O ``InstrumentacaoMiddleware`` instala um ``execute_wrapper`` em todas as
+conexões configuradas e mede, para cada requisição, o número de consultas, o
+tempo gasto no banco, o tempo total e quanto cresceu a memória do processo: a
+alocada pelo Python, se o ``tracemalloc`` estiver ligado (``PYTHONTRACEMALLOC``),
+ou a residente atual (``/proc/self/statm``). A memória é do processo inteiro e,
+com várias requisições simultâneas, inclui as das outras; sem nenhuma das duas
+fontes a medida fica de fora. As medidas são expostas no cabeçalho
+``Server-Timing`` e registradas numa linha ``chave=valor`` no logger
+``core.instrumentacao`` em nível INFO, que por padrão não é registrado (veja
+``INSTRUMENTACAO_LOG_LEVEL``).
+
+``INSTRUMENTACAO_ORCAMENTOS`` associa nomes de rota (``app:nome``, aceitando
+curingas como ``admin:*_changelist``) a limites de ``consultas``, ``sql_ms``,
+``total_ms`` e ``memoria_kib``; uma requisição que ultrapassa algum deles é
+registrada com nível WARNING.
+
+Em respostas em fluxo (``StreamingHttpResponse``) as consultas feitas durante
+a iteração do conteúdo ocorrem depois do middleware e não entram na contagem.
+O mesmo vale para consultas feitas em outras threads, como as seções do
+dashboard assíncrono, já que cada thread usa as próprias conexões.
+"""
+
+import logging
+import os
+import time
+import tracemalloc
+from contextlib import ExitStack
+from fnmatch import fnmatchcase
+
+from django.conf import settings
+from django.db import connections
+
+try:
+    _TAMANHO_PAGINA = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):  # pragma: no cover - indisponível no Windows
+    _TAMANHO_PAGINA = None
+
+logger = logging.getLogger(__name__)
+
+
+def _memoria_kib():
+    """Memória atual do processo em KiB, ou ``None`` se não houver como medi-la."""
+
+    if tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[0] / 1024
+    if _TAMANHO_PAGINA is None:  # pragma: no cover
+        return None
+    try:
+        with open("/proc/self/statm", "rb") as statm:
+            residentes = int(statm.read().split()[1])
+    except OSError:  # pragma: no cover - sem /proc, como no macOS
+        return None
+    return residentes * _TAMANHO_PAGINA / 1024
+
+
+class MedidorConsultas:
+    """``execute_wrapper`` que acumula o número e a duração das consultas."""
+
+    def __init__(self):
+        self.consultas = 0
+        self.segundos = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.segundos += time.perf_counter() - inicio
+            self.consultas += 1
+
+
+def orcamento(nome_rota):
+    """Limites configurados para ``nome_rota`` (o primeiro padrão que casar)."""
+
+    for padrao, limites in getattr(settings, "INSTRUMENTACAO_ORCAMENTOS", {}).items():
+        if nome_rota and fnmatchcase(nome_rota, padrao):
+            return limites
+    return {}
+
+
+class InstrumentacaoMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        medidor = MedidorConsultas()
+        memoria_inicial = _memoria_kib()
+        inicio = time.perf_counter()
+        with ExitStack() as pilha:
+            for conexao in connections.all():
+                pilha.enter_context(conexao.execute_wrapper(medidor))
+            response = self.get_response(request)
+        total = time.perf_counter() - inicio
+
+        correspondencia = getattr(request, "resolver_match", None)
+        medidas = {
+            "rota": correspondencia.view_name if correspondencia else "",
+            "metodo": request.method,
+            "caminho": request.path,
+            "status": response.status_code,
+            "consultas": medidor.consultas,
+            "sql_ms": round(medidor.segundos * 1000, 1),
+            "total_ms": round(total * 1000, 1),
+        }
+        memoria_final = _memoria_kib()
+        if memoria_inicial is not None and memoria_final is not None:
+            medidas["memoria_kib"] = round(memoria_final - memoria_inicial)
+
+        if getattr(settings, "INSTRUMENTACAO_SERVER_TIMING", True):
+            response["Server-Timing"] = ", ".join(
+                [
+                    f'sql;dur={medidas["sql_ms"]};desc="{medidor.consultas} consultas"',
+                    f"app;dur={round(medidas['total_ms'] - medidas['sql_ms'], 1)}",
+                    f"total;dur={medidas['total_ms']}",
+                ]
+            )
+
+        excedidos = [
+            f"{metrica}>{limite}"
+            for metrica, limite in orcamento(medidas["rota"]).items()
+            if medidas.get(metrica, 0) > limite
+        ]
+        linha = " ".join(f"{chave}={valor}" for chave, valor in medidas.items())
+        if excedidos:
+            logger.warning(
+                "%s orcamento_excedido=%s",
+                linha,
+                ",".join(excedidos),
+                extra={"instrumentacao": medidas, "orcamento_excedido": excedidos},
+            )
+        else:
+            logger.info("%s", linha, extra={"instrumentacao": medidas})
+        return response
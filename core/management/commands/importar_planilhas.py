@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.importacao import IMPORTADORES, TAMANHO_LOTE, ErroImportacao, ler_planilha
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa vendas, recebíveis, pedidos de compra ou tarefas de uma planilha "
+        "CSV/XLSX, atualizando os registros já importados pelo código de origem."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("tipo", choices=sorted(IMPORTADORES))
+        parser.add_argument("arquivo", help="Arquivo .csv ou .xlsx com cabeçalho na primeira linha.")
+        parser.add_argument("--planilha", help="Nome da aba do arquivo .xlsx (padrão: a ativa).")
+        parser.add_argument("--delimitador", default=";", help="Delimitador do CSV.")
+        parser.add_argument("--lote", type=int, default=TAMANHO_LOTE)
+
+    def handle(self, *args, **options):
+        linhas = ler_planilha(
+            options["arquivo"], planilha=options["planilha"], delimitador=options["delimitador"]
+        )
+        try:
+            resultado = IMPORTADORES[options["tipo"]]().importar(linhas, options["lote"])
+        except (ErroImportacao, OSError) as exc:
+            raise CommandError(str(exc)) from exc
+
+        for numero, erro in resultado.erros:
+            self.stderr.write(f"Linha {numero}: {erro}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{resultado.processados} registro(s) importado(s), "
+                f"{len(resultado.erros)} linha(s) com erro."
+            )
+        )
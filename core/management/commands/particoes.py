@@ -0,0 +1,121 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core import particionamento
+from core.particionamento import PARTICIONAMENTOS
+
+
+class Command(BaseCommand):
+    help = (
+        "Mantém as partições por data de vendas e recebíveis (PostgreSQL): converte as "
+        "tabelas (particionar/desparticionar), lista, cria as futuras, desanexa ou anexa "
+        "partições antigas e mostra a poda no EXPLAIN."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "acao",
+            choices=(
+                "particionar",
+                "desparticionar",
+                "listar",
+                "criar",
+                "desanexar",
+                "anexar",
+                "explicar",
+            ),
+        )
+        parser.add_argument(
+            "--modelo",
+            action="append",
+            choices=sorted(PARTICIONAMENTOS),
+            help="Modelo a tratar (padrão: todos os particionados).",
+        )
+        parser.add_argument(
+            "--meses",
+            type=int,
+            default=particionamento.ANTECEDENCIA_MESES,
+            help=(
+                "particionar e criar: meses à frente cobertos por partições "
+                "(padrão: %(default)s)."
+            ),
+        )
+        parser.add_argument(
+            "--antes-de", help="desanexar: data AAAA-MM-DD até a qual as partições terminam."
+        )
+        parser.add_argument("--nome", help="anexar: nome da partição desanexada.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("O particionamento está disponível apenas no PostgreSQL.")
+        acao = options["acao"]
+        if acao == "desanexar" and not options["antes_de"]:
+            raise CommandError("Informe --antes-de para desanexar partições.")
+        if acao == "anexar" and not options["nome"]:
+            raise CommandError("Informe --nome para anexar uma partição.")
+
+        for rotulo in options["modelo"] or sorted(PARTICIONAMENTOS):
+            alvo = PARTICIONAMENTOS[rotulo]
+            tabela = alvo.tabela()
+            convertida = particionamento.particionada(connection, tabela)
+            if acao == "particionar" and convertida:
+                self.stdout.write(f"{tabela} já está particionada.")
+                continue
+            if acao != "particionar" and not convertida:
+                if acao == "desparticionar":
+                    self.stdout.write(f"{tabela} não está particionada.")
+                    continue
+                raise CommandError(f"A tabela {tabela} não está particionada.")
+            with transaction.atomic():
+                getattr(self, f"_{acao}")(alvo, tabela, options)
+
+    def _particionar(self, alvo, tabela, options):
+        particionamento.converter(
+            connection, tabela, alvo.coluna(), alvo.granularidade, meses=options["meses"]
+        )
+        particionamento.garantir_integridade(connection)
+        self.stdout.write(f"{tabela}: particionada por {alvo.campo}")
+
+    def _desparticionar(self, alvo, tabela, options):
+        particionamento.desconverter(connection, tabela, alvo.coluna())
+        particionamento.garantir_integridade(connection)
+        self.stdout.write(f"{tabela}: de volta a uma tabela comum")
+
+    def _listar(self, alvo, tabela, options):
+        self.stdout.write(tabela)
+        for nome, limites, linhas in particionamento.particoes(connection, tabela):
+            self.stdout.write(f"  {nome}: {limites} (~{max(linhas, 0)} linhas)")
+
+    def _criar(self, alvo, tabela, options):
+        criadas = particionamento.garantir_particoes(connection, alvo, meses=options["meses"])
+        self.stdout.write(f"{tabela}: {len(criadas)} partição(ões) criada(s) {criadas}")
+
+    def _desanexar(self, alvo, tabela, options):
+        try:
+            data = date.fromisoformat(options["antes_de"])
+        except ValueError as exc:
+            raise CommandError(f"Data inválida: {options['antes_de']}") from exc
+        try:
+            desanexadas = particionamento.desanexar_anteriores(connection, tabela, data)
+        except ValueError as exc:
+            raise CommandError(str(exc)) from exc
+        self.stdout.write(f"{tabela}: desanexada(s) {desanexadas}")
+
+    def _anexar(self, alvo, tabela, options):
+        if particionamento.limites_do_nome(tabela, options["nome"]) is None:
+            # Com vários modelos, a partição pertence a só um deles.
+            return
+        particionamento.anexar(connection, tabela, options["nome"])
+        self.stdout.write(f"{tabela}: {options['nome']} anexada")
+
+    def _explicar(self, alvo, tabela, options):
+        inicio = particionamento.inicio_periodo(alvo.granularidade, timezone.localdate())
+        fim = particionamento.proximo_periodo(alvo.granularidade, inicio)
+        consulta = alvo.modelo().objects.filter(
+            **{f"{alvo.campo}__gte": inicio, f"{alvo.campo}__lt": fim}
+        )
+        lidas = sorted(particionamento.particoes_lidas(consulta))
+        self.stdout.write(f"{tabela} [{inicio} a {fim}): lê {', '.join(lidas)}")
@@ -0,0 +1,46 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.carga import CAMINHO_PADRAO, cookie_sessao, executar
+
+
+class Command(BaseCommand):
+    help = (
+        "Dispara requisições concorrentes pelo handler WSGI e mede as latências "
+        "(p50, p95, p99) com a configuração de conexões do banco em uso."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--caminho", default=CAMINHO_PADRAO)
+        parser.add_argument("--requisicoes", type=int, default=500)
+        parser.add_argument("--concorrencia", type=int, default=8)
+        parser.add_argument("--usuario", help="Usuário autenticado nas requisições.")
+        parser.add_argument("--saida", help="Arquivo JSON de destino (padrão: saída padrão).")
+
+    def handle(self, *args, **options):
+        if options["requisicoes"] < 1 or options["concorrencia"] < 1:
+            raise CommandError("Informe requisições e concorrência positivas.")
+        cookie = None
+        if options["usuario"]:
+            modelo = get_user_model()
+            try:
+                usuario = modelo.objects.get(**{modelo.USERNAME_FIELD: options["usuario"]})
+            except modelo.DoesNotExist as exc:
+                raise CommandError(f"Usuário inexistente: {options['usuario']}") from exc
+            cookie = cookie_sessao(usuario)
+
+        resultado = executar(
+            options["caminho"],
+            requisicoes=options["requisicoes"],
+            concorrencia=options["concorrencia"],
+            cookie=cookie,
+        )
+        conteudo = json.dumps(resultado, ensure_ascii=False, indent=2)
+        if options["saida"]:
+            with open(options["saida"], "w", encoding="utf-8") as arquivo:
+                arquivo.write(conteudo)
+            self.stderr.write(self.style.SUCCESS(f"Resultado gravado em {options['saida']}."))
+        else:
+            self.stdout.write(conteudo)
@@ -1,12 +1,28 @@
-from django.db import models
+from django.db import models, router, transaction
 
 
 class TimeStampedModel(models.Model):
     """Abstract base class with created/updated timestamps."""
 
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         abstract = True
         ordering = ("-created_at",)
+
+
+class AtomicSaveModel(TimeStampedModel):
+    """Timestamped model whose ``save()`` runs in a transaction, signals included.
+
+    ``pre_save`` receivers may lock the stored row with ``select_for_update``
+    and keep the lock until ``post_save`` has applied the derived changes.
+    """
+
+    class Meta(TimeStampedModel.Meta):
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
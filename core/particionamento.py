@@ -0,0 +1,627 @@
+"""Particionamento por intervalo de datas (PostgreSQL) de vendas e recebíveis.
+
+``Venda`` é particionada por ``data_venda`` e ``Recebivel`` por
+``data_vencimento``, em partições anuais ``<tabela>_pAAAA`` (ou mensais,
+``<tabela>_pAAAA_MM``) e uma partição padrão ``<tabela>_padrao`` para as
+datas ainda sem partição. Consultas com filtro de data (aging, comparativos
+mensais, dashboard) leem só as partições do intervalo, e o ORM não muda.
+
+A conversão é opcional e explícita: ``manage.py particoes particionar`` (ou as
+migrações ``comercial.0006`` e ``carteira.0005`` com ``DB_PARTICIONAR=True``)
+converte as tabelas, e ``particoes desparticionar`` (ou reverter as migrações)
+as devolve ao formato comum, com as restrições originais.
+
+O PostgreSQL exige que a chave primária e as restrições únicas de uma tabela
+particionada incluam a coluna de partição, e não aceita chaves estrangeiras
+para colunas que não sejam únicas sozinhas. Por isso, enquanto particionadas:
+
+* a chave primária passa a ser ``(id, data)``; o ``id`` segue único pela sequência;
+* a restrição única de ``codigo_origem`` passa a incluir a data, e o gatilho
+  ``<tabela>_codigo_unico`` mantém o código único em todas as partições; o
+  importador move para a nova data os registros existentes antes do upsert
+  (``realinhar``);
+* as chaves estrangeiras que apontam para a tabela (``carteira_recebivel.venda_id``)
+  são trocadas por gatilhos (``garantir_integridade``) que recusam referências
+  a registros inexistentes e exclusões de registros ainda referenciados.
+
+Desanexar uma partição tira suas linhas das consultas, como o arquivamento.
+Por isso partições com linhas ainda referenciadas (vendas com parcelas) são
+recusadas, e ``desanexando_particao`` é enviado antes de cada uma sair, para
+que ``dashboards.arquivamento`` some as linhas aos totais arquivados;
+``particao_anexada`` desfaz a soma quando ela volta.
+
+Nos demais bancos nada é feito.
+"""
+
+import json
+import re
+from dataclasses import dataclass
+from datetime import date
+
+from django.apps import apps as apps_globais
+from django.conf import settings
+from django.db import connection, connections, migrations
+from django.db.models import Case, Value, When
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .postgres import eh_postgresql
+
+# Períodos futuros mantidos criados, para que nada caia na partição padrão.
+ANTECEDENCIA_MESES = 24
+# Comentário das restrições únicas a que ``converter`` acrescentou a coluna de partição.
+MARCA_AMPLIADA = "particionamento: coluna acrescentada "
+
+# Enviados na transação da operação, com o modelo, a conexão e os limites
+# ``inicio`` e ``fim`` da partição. Um receptor pode recusar a desanexação
+# com ``ValueError``.
+desanexando_particao = Signal()
+particao_anexada = Signal()
+
+
+@dataclass(frozen=True)
+class Particionamento:
+    rotulo: str
+    campo: str
+    granularidade: str = "ano"
+
+    def modelo(self, apps=apps_globais):
+        return apps.get_model(self.rotulo)
+
+    def tabela(self, apps=apps_globais):
+        return self.modelo(apps)._meta.db_table
+
+    def coluna(self, apps=apps_globais):
+        return self.modelo(apps)._meta.get_field(self.campo).column
+
+    def referencias(self, apps=apps_globais):
+        """``(tabela, coluna)`` das chaves estrangeiras de outros modelos para este."""
+
+        return [
+            (relacao.related_model._meta.db_table, relacao.field.column)
+            for relacao in self.modelo(apps)._meta.related_objects
+            if relacao.one_to_many and relacao.field.db_constraint
+        ]
+
+
+PARTICIONAMENTOS = {
+    particionamento.rotulo: particionamento
+    for particionamento in (
+        Particionamento("comercial.Venda", "data_venda"),
+        Particionamento("carteira.Recebivel", "data_vencimento"),
+    )
+}
+
+
+def inicio_periodo(granularidade, data):
+    return date(data.year, 1, 1) if granularidade == "ano" else date(data.year, data.month, 1)
+
+
+def proximo_periodo(granularidade, inicio):
+    if granularidade == "ano":
+        return date(inicio.year + 1, 1, 1)
+    return date(inicio.year + inicio.month // 12, inicio.month % 12 + 1, 1)
+
+
+def periodos(granularidade, desde, ate):
+    """Inícios dos períodos que cobrem as datas de ``desde`` a ``ate``."""
+
+    atual = inicio_periodo(granularidade, desde)
+    while atual <= ate:
+        yield atual
+        atual = proximo_periodo(granularidade, atual)
+
+
+def limite_antecedencia(meses=ANTECEDENCIA_MESES):
+    """Primeiro dia do ``meses``-ésimo mês após o mês corrente."""
+
+    hoje = timezone.localdate()
+    mes = hoje.month - 1 + meses
+    return date(hoje.year + mes // 12, mes % 12 + 1, 1)
+
+
+def nome_particao(tabela, granularidade, inicio):
+    if granularidade == "ano":
+        return f"{tabela}_p{inicio.year}"
+    return f"{tabela}_p{inicio.year}_{inicio.month:02d}"
+
+
+def limites_do_nome(tabela, nome):
+    """``(inicio, fim)`` da partição ``nome`` de ``tabela``, ou None se não seguir o padrão."""
+
+    encontrado = re.fullmatch(rf"{re.escape(tabela)}_p(\d{{4}})(?:_(\d{{2}}))?", nome)
+    if encontrado is None:
+        return None
+    ano, mes = encontrado.groups()
+    granularidade = "mes" if mes else "ano"
+    inicio = date(int(ano), int(mes or 1), 1)
+    return inicio, proximo_periodo(granularidade, inicio)
+
+
+def particionada(conexao, tabela):
+    if not eh_postgresql(conexao):
+        return False
+    with conexao.cursor() as cursor:
+        cursor.execute(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))",
+            [tabela],
+        )
+        return cursor.fetchone()[0]
+
+
+def particoes(conexao, tabela):
+    """Partições anexadas a ``tabela``: ``(nome, limites, linhas estimadas)``."""
+
+    with conexao.cursor() as cursor:
+        cursor.execute(
+            "SELECT filha.relname, pg_get_expr(filha.relpartbound, filha.oid), "
+            "filha.reltuples::bigint "
+            "FROM pg_inherits JOIN pg_class filha ON filha.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = %s::regclass ORDER BY filha.relname",
+            [tabela],
+        )
+        return cursor.fetchall()
+
+
+def _existe(cursor, nome):
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [nome])
+    return cursor.fetchone()[0]
+
+
+def criar_particao(conexao, tabela, coluna, granularidade, inicio):
+    """Cria a partição do período de ``inicio``; retorna False se ela já existia.
+
+    Linhas do período que estejam na partição padrão são movidas para a nova.
+    """
+
+    q = conexao.ops.quote_name
+    nome = nome_particao(tabela, granularidade, inicio)
+    fim = proximo_periodo(granularidade, inicio)
+    with conexao.cursor() as cursor:
+        if _existe(cursor, nome):
+            return False
+        cursor.execute(
+            f"CREATE TABLE {q(nome)} (LIKE {q(tabela)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+        cursor.execute(
+            f"WITH movidas AS (DELETE FROM {q(tabela + '_padrao')} "
+            f"WHERE {q(coluna)} >= %s AND {q(coluna)} < %s RETURNING *) "
+            f"INSERT INTO {q(nome)} SELECT * FROM movidas",
+            [inicio, fim],
+        )
+        cursor.execute(
+            f"ALTER TABLE {q(tabela)} ATTACH PARTITION {q(nome)} "
+            f"FOR VALUES FROM ('{inicio.isoformat()}') TO ('{fim.isoformat()}')"
+        )
+    return True
+
+
+def garantir_particoes(conexao, particionamento, desde=None, meses=ANTECEDENCIA_MESES):
+    """Cria as partições de ``desde`` (padrão: hoje) até ``meses`` à frente.
+
+    Retorna os nomes das partições criadas.
+    """
+
+    desde = desde or timezone.localdate()
+    ate = limite_antecedencia(meses)
+    tabela, coluna = particionamento.tabela(), particionamento.coluna()
+    granularidade = particionamento.granularidade
+    return [
+        nome_particao(tabela, granularidade, inicio)
+        for inicio in periodos(granularidade, desde, ate)
+        if criar_particao(conexao, tabela, coluna, granularidade, inicio)
+    ]
+
+
+def _da_tabela(tabela):
+    for particionamento in PARTICIONAMENTOS.values():
+        if particionamento.tabela() == tabela:
+            return particionamento
+    raise ValueError(f"{tabela} não é uma tabela particionável.")
+
+
+def desanexar_anteriores(conexao, tabela, data):
+    """Desanexa as partições que terminam até ``data``; as tabelas continuam no banco.
+
+    Recusa com ``ValueError`` as partições com linhas ainda referenciadas por
+    outras tabelas e envia ``desanexando_particao`` antes de cada uma sair.
+    """
+
+    alvo = _da_tabela(tabela)
+    q = conexao.ops.quote_name
+    desanexadas = []
+    for nome, _, _ in particoes(conexao, tabela):
+        limites = limites_do_nome(tabela, nome)
+        if not limites or limites[1] > data:
+            continue
+        with conexao.cursor() as cursor:
+            # Bloqueia gravações e novas referências até o fim da transação.
+            cursor.execute(f"LOCK TABLE {q(nome)} IN EXCLUSIVE MODE")
+            for filha, coluna in alvo.referencias():
+                cursor.execute(
+                    f"SELECT EXISTS (SELECT 1 FROM {q(filha)} "
+                    f"WHERE {q(coluna)} IN (SELECT id FROM {q(nome)}))"
+                )
+                if cursor.fetchone()[0]:
+                    raise ValueError(f"{nome} tem linhas ainda referenciadas por {filha}.")
+            desanexando_particao.send(
+                sender=alvo.modelo(), conexao=conexao, inicio=limites[0], fim=limites[1]
+            )
+            cursor.execute(f"ALTER TABLE {q(tabela)} DETACH PARTITION {q(nome)}")
+        desanexadas.append(nome)
+    return desanexadas
+
+
+def anexar(conexao, tabela, nome):
+    """Anexa de volta uma partição desanexada, com os limites dados pelo nome."""
+
+    limites = limites_do_nome(tabela, nome)
+    if limites is None:
+        raise ValueError(f"{nome} não segue o padrão de nomes das partições de {tabela}.")
+    inicio, fim = limites
+    q = conexao.ops.quote_name
+    with conexao.cursor() as cursor:
+        cursor.execute(
+            f"ALTER TABLE {q(tabela)} ATTACH PARTITION {q(nome)} "
+            f"FOR VALUES FROM ('{inicio.isoformat()}') TO ('{fim.isoformat()}')"
+        )
+    particao_anexada.send(
+        sender=_da_tabela(tabela).modelo(), conexao=conexao, inicio=inicio, fim=fim
+    )
+
+
+def converter(conexao, tabela, coluna, granularidade, meses=ANTECEDENCIA_MESES):
+    """Recria ``tabela`` como tabela particionada por ``coluna``, preservando dados e índices."""
+
+    if particionada(conexao, tabela):
+        return
+    q = conexao.ops.quote_name
+    nova = f"{tabela}__particionada"
+    with conexao.cursor() as cursor:
+        _verificar_pendentes(cursor)
+        # Índices avulsos (os das restrições são recriados a partir delas).
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes "
+            "WHERE schemaname = current_schema() AND tablename = %s AND indexname NOT IN "
+            "(SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass)",
+            [tabela, tabela],
+        )
+        indices = [linha[0] for linha in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype IN ('u', 'f') ORDER BY conname",
+            [tabela],
+        )
+        restricoes = cursor.fetchall()
+        cursor.execute(
+            f"SELECT MIN({q(coluna)}), MAX({q(coluna)}), COALESCE(MAX(id), 0) FROM {q(tabela)}"
+        )
+        minimo, maximo, maior_id = cursor.fetchone()
+        # Chaves estrangeiras de outras tabelas para esta: o PostgreSQL não as
+        # aceita numa tabela particionada; ``garantir_integridade`` cria os
+        # gatilhos equivalentes.
+        for filha, nome in _chaves_estrangeiras_para(cursor, tabela):
+            cursor.execute(f"ALTER TABLE {q(filha)} DROP CONSTRAINT {q(nome)}")
+
+        cursor.execute(
+            f"CREATE TABLE {q(nova)} (LIKE {q(tabela)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            f"PARTITION BY RANGE ({q(coluna)})"
+        )
+        cursor.execute(f"CREATE TABLE {q(tabela + '_padrao')} PARTITION OF {q(nova)} DEFAULT")
+        ate = max(maximo or date.min, limite_antecedencia(meses))
+        for inicio in periodos(granularidade, minimo or timezone.localdate(), ate):
+            cursor.execute(
+                f"CREATE TABLE {q(nome_particao(tabela, granularidade, inicio))} "
+                f"PARTITION OF {q(nova)} FOR VALUES FROM ('{inicio.isoformat()}') "
+                f"TO ('{proximo_periodo(granularidade, inicio).isoformat()}')"
+            )
+        cursor.execute(f"INSERT INTO {q(nova)} SELECT * FROM {q(tabela)}")
+        cursor.execute(f"DROP TABLE {q(tabela)}")
+        cursor.execute(f"ALTER TABLE {q(nova)} RENAME TO {q(tabela)}")
+
+        cursor.execute(
+            f"ALTER TABLE {q(tabela)} ADD CONSTRAINT {q(tabela + '_pkey')} "
+            f"PRIMARY KEY (id, {q(coluna)})"
+        )
+        sequencia = f"{tabela}_id_seq"
+        cursor.execute(f"CREATE SEQUENCE {q(sequencia)} OWNED BY {q(tabela)}.id")
+        cursor.execute("SELECT setval(%s, %s, %s)", [sequencia, max(maior_id, 1), maior_id > 0])
+        cursor.execute(
+            f"ALTER TABLE {q(tabela)} ALTER COLUMN id SET DEFAULT nextval('{sequencia}'::regclass)"
+        )
+        for nome, tipo, definicao in restricoes:
+            ampliada = False
+            if tipo == "u":
+                colunas = re.fullmatch(r"UNIQUE \((.*)\)", definicao).group(1)
+                if coluna not in [parte.strip('" ') for parte in colunas.split(",")]:
+                    colunas = f"{colunas}, {q(coluna)}"
+                    ampliada = True
+                definicao = f"UNIQUE ({colunas})"
+            cursor.execute(f"ALTER TABLE {q(tabela)} ADD CONSTRAINT {q(nome)} {definicao}")
+            if ampliada:
+                # Marca para ``desconverter`` a coluna acrescentada à restrição.
+                cursor.execute(
+                    f"COMMENT ON CONSTRAINT {q(nome)} ON {q(tabela)} IS "
+                    f"'{MARCA_AMPLIADA}{coluna}'"
+                )
+        for indice in indices:
+            cursor.execute(indice)
+        cursor.execute(f"ANALYZE {q(tabela)}")
+
+
+def desconverter(conexao, tabela, coluna):
+    """Recria ``tabela`` como tabela comum, desfazendo ``converter``.
+
+    Os dados, os índices e as restrições voltam ao formato original: chave
+    primária em ``id`` (identidade), restrições únicas sem a coluna de
+    partição. As chaves estrangeiras para a tabela voltam com
+    ``garantir_integridade``.
+    """
+
+    if not particionada(conexao, tabela):
+        return
+    q = conexao.ops.quote_name
+    nova = f"{tabela}__comum"
+    with conexao.cursor() as cursor:
+        _verificar_pendentes(cursor)
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes "
+            "WHERE schemaname = current_schema() AND tablename = %s AND indexname NOT IN "
+            "(SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass)",
+            [tabela, tabela],
+        )
+        # Índices de tabelas particionadas são definidos ``ON ONLY`` a tabela mãe.
+        indices = [linha[0].replace(" ON ONLY ", " ON ", 1) for linha in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, contype, pg_get_constraintdef(oid), "
+            "obj_description(oid, 'pg_constraint') FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND conparentid = 0 AND contype IN ('u', 'f') "
+            "ORDER BY conname",
+            [tabela],
+        )
+        restricoes = cursor.fetchall()
+        cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {q(tabela)}")
+        maior_id = cursor.fetchone()[0]
+
+        cursor.execute(
+            f"CREATE TABLE {q(nova)} (LIKE {q(tabela)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+        # A sequência atual pertence à tabela particionada e sai com ela.
+        cursor.execute(f"ALTER TABLE {q(nova)} ALTER COLUMN id DROP DEFAULT")
+        cursor.execute(f"INSERT INTO {q(nova)} SELECT * FROM {q(tabela)}")
+        cursor.execute(f"DROP TABLE {q(tabela)}")
+        cursor.execute(f"ALTER TABLE {q(nova)} RENAME TO {q(tabela)}")
+
+        cursor.execute(
+            f"ALTER TABLE {q(tabela)} ADD CONSTRAINT {q(tabela + '_pkey')} PRIMARY KEY (id)"
+        )
+        cursor.execute(
+            f"ALTER TABLE {q(tabela)} ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY "
+            f"(START WITH {maior_id + 1})"
+        )
+        for nome, tipo, definicao, comentario in restricoes:
+            if tipo == "u" and comentario == f"{MARCA_AMPLIADA}{coluna}":
+                colunas = re.fullmatch(r"UNIQUE \((.*)\)", definicao).group(1)
+                partes = [parte.strip() for parte in colunas.split(",")]
+                definicao = "UNIQUE ({})".format(
+                    ", ".join(parte for parte in partes if parte.strip('"') != coluna)
+                )
+            cursor.execute(f"ALTER TABLE {q(tabela)} ADD CONSTRAINT {q(nome)} {definicao}")
+        for indice in indices:
+            cursor.execute(indice)
+        cursor.execute(f"ANALYZE {q(tabela)}")
+
+
+def _verificar_pendentes(cursor):
+    # O PostgreSQL não exclui tabelas com verificações adiadas pendentes na
+    # transação: elas rodam agora e as chaves voltam ao modo adiado do Django.
+    cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+    cursor.execute("SET CONSTRAINTS ALL DEFERRED")
+
+
+def _chaves_estrangeiras_para(cursor, tabela):
+    """``(tabela, restrição)`` das chaves estrangeiras de outras tabelas para ``tabela``."""
+
+    cursor.execute(
+        "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+        "WHERE confrelid = %s::regclass AND conrelid <> confrelid AND contype = 'f' "
+        "AND conparentid = 0",
+        [tabela],
+    )
+    return cursor.fetchall()
+
+
+# Gatilhos que substituem, nas tabelas particionadas, a restrição única de
+# ``codigo_origem`` e as chaves estrangeiras. Os argumentos trazem os nomes
+# das tabelas: nas partições, ``TG_TABLE_NAME`` é o nome da partição.
+FUNCOES_INTEGRIDADE = (
+    """
+    CREATE OR REPLACE FUNCTION particionamento_codigo_unico() RETURNS trigger AS $$
+    DECLARE
+        repetido boolean;
+    BEGIN
+        IF NEW.codigo_origem IS NULL THEN
+            RETURN NULL;
+        END IF;
+        -- Serializa gravações concorrentes do mesmo código até o commit.
+        PERFORM pg_advisory_xact_lock(hashtext(TG_ARGV[0] || ':' || NEW.codigo_origem));
+        EXECUTE format(
+            'SELECT EXISTS (SELECT 1 FROM %I WHERE codigo_origem = $1 AND id <> $2)', TG_ARGV[0]
+        ) INTO repetido USING NEW.codigo_origem, NEW.id;
+        IF repetido THEN
+            RAISE EXCEPTION 'codigo_origem % já existe em %', NEW.codigo_origem, TG_ARGV[0]
+                USING ERRCODE = 'unique_violation';
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION particionamento_referencia_existe() RETURNS trigger AS $$
+    DECLARE
+        valor bigint := (to_jsonb(NEW) ->> TG_ARGV[1])::bigint;
+        encontrados integer;
+    BEGIN
+        IF valor IS NULL THEN
+            RETURN NULL;
+        END IF;
+        EXECUTE format('SELECT 1 FROM %I WHERE id = $1 FOR KEY SHARE', TG_ARGV[0])
+            USING valor;
+        GET DIAGNOSTICS encontrados = ROW_COUNT;
+        IF encontrados = 0 THEN
+            RAISE EXCEPTION '%.% = % não existe em %', TG_TABLE_NAME, TG_ARGV[1], valor,
+                TG_ARGV[0] USING ERRCODE = 'foreign_key_violation';
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION particionamento_sem_referencias() RETURNS trigger AS $$
+    DECLARE
+        referenciado boolean;
+    BEGIN
+        EXECUTE format('SELECT EXISTS (SELECT 1 FROM %I WHERE %I = $1)', TG_ARGV[0], TG_ARGV[1])
+            INTO referenciado USING OLD.id;
+        IF referenciado THEN
+            RAISE EXCEPTION '% ainda referencia %.id = %', TG_ARGV[0], TG_TABLE_NAME, OLD.id
+                USING ERRCODE = 'foreign_key_violation';
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+)
+
+
+def garantir_integridade(conexao, apps=apps_globais):
+    """Ajusta as garantias de ``PARTICIONAMENTOS`` ao estado atual de cada tabela.
+
+    Tabelas particionadas recebem os gatilhos de código único e de chave
+    estrangeira; tabelas comuns os perdem e voltam a ter as chaves
+    estrangeiras do Django, com a mesma definição das migrações.
+    """
+
+    q = conexao.ops.quote_name
+    with conexao.cursor() as cursor:
+        for funcao in FUNCOES_INTEGRIDADE:
+            cursor.execute(funcao)
+        for alvo in PARTICIONAMENTOS.values():
+            tabela = alvo.tabela(apps)
+            if not _existe(cursor, tabela):
+                continue
+            particionada_agora = particionada(conexao, tabela)
+            gatilho = f"{tabela}_codigo_unico"
+            cursor.execute(f"DROP TRIGGER IF EXISTS {q(gatilho)} ON {q(tabela)}")
+            if particionada_agora:
+                cursor.execute(
+                    f"CREATE TRIGGER {q(gatilho)} AFTER INSERT OR UPDATE OF codigo_origem "
+                    f"ON {q(tabela)} FOR EACH ROW "
+                    f"EXECUTE FUNCTION particionamento_codigo_unico('{tabela}')"
+                )
+            for filha, coluna in alvo.referencias(apps):
+                if not _existe(cursor, filha):
+                    continue
+                na_filha, na_tabela = f"{filha}_{coluna}_existe", f"{tabela}_{filha}_livre"
+                cursor.execute(f"DROP TRIGGER IF EXISTS {q(na_filha)} ON {q(filha)}")
+                cursor.execute(f"DROP TRIGGER IF EXISTS {q(na_tabela)} ON {q(tabela)}")
+                ligadas = {origem for origem, _ in _chaves_estrangeiras_para(cursor, tabela)}
+                if particionada_agora:
+                    cursor.execute(
+                        f"CREATE TRIGGER {q(na_filha)} AFTER INSERT OR UPDATE OF {q(coluna)} "
+                        f"ON {q(filha)} FOR EACH ROW EXECUTE FUNCTION "
+                        f"particionamento_referencia_existe('{tabela}', '{coluna}')"
+                    )
+                    cursor.execute(
+                        f"CREATE TRIGGER {q(na_tabela)} AFTER DELETE ON {q(tabela)} "
+                        f"FOR EACH ROW EXECUTE FUNCTION "
+                        f"particionamento_sem_referencias('{filha}', '{coluna}')"
+                    )
+                elif filha not in ligadas:
+                    cursor.execute(
+                        f"ALTER TABLE {q(filha)} ADD CONSTRAINT "
+                        f"{q(f'{filha}_{coluna}_fk_{tabela}_id')} FOREIGN KEY ({q(coluna)}) "
+                        f"REFERENCES {q(tabela)} (id) DEFERRABLE INITIALLY DEFERRED"
+                    )
+
+
+def converter_em_particionada(rotulo):
+    """Operação de migração que particiona a tabela de ``rotulo`` (ver ``PARTICIONAMENTOS``).
+
+    Só converte com ``PARTICIONAR_TABELAS`` (``DB_PARTICIONAR``) ligado; sem
+    ele, use ``manage.py particoes particionar`` quando quiser. Reverter a
+    migração devolve a tabela ao formato comum, se estiver particionada.
+    """
+
+    particionamento = PARTICIONAMENTOS[rotulo]
+
+    def aplicar(apps, schema_editor):
+        conexao = schema_editor.connection
+        if not eh_postgresql(conexao) or not settings.PARTICIONAR_TABELAS:
+            return
+        converter(
+            conexao,
+            particionamento.tabela(apps),
+            particionamento.coluna(apps),
+            particionamento.granularidade,
+        )
+        garantir_integridade(conexao, apps)
+
+    def desfazer(apps, schema_editor):
+        conexao = schema_editor.connection
+        if not eh_postgresql(conexao):
+            return
+        desconverter(conexao, particionamento.tabela(apps), particionamento.coluna(apps))
+        garantir_integridade(conexao, apps)
+
+    return migrations.RunPython(aplicar, desfazer)
+
+
+def campo_particao(modelo, conexao=connection):
+    """Campo de partição de ``modelo`` se sua tabela estiver particionada, senão None."""
+
+    particionamento = PARTICIONAMENTOS.get(modelo._meta.label)
+    if particionamento is None or not particionada(conexao, modelo._meta.db_table):
+        return None
+    return particionamento.campo
+
+
+def realinhar(modelo, campo, objetos):
+    """Grava a nova data dos registros existentes de ``objetos`` cuja data mudou.
+
+    O upsert sobre ``(codigo_origem, data)`` trataria uma data alterada como
+    registro novo; o ``UPDATE`` move a linha de partição mantendo o ``id``.
+    """
+
+    novas = {objeto.codigo_origem: getattr(objeto, campo) for objeto in objetos}
+    mudaram = {
+        codigo: novas[codigo]
+        for codigo, atual in modelo.objects.filter(codigo_origem__in=novas).values_list(
+            "codigo_origem", campo
+        )
+        if atual != novas[codigo]
+    }
+    if mudaram:
+        casos = [When(codigo_origem=codigo, then=Value(data)) for codigo, data in mudaram.items()]
+        modelo.objects.filter(codigo_origem__in=mudaram).update(
+            **{campo: Case(*casos, output_field=modelo._meta.get_field(campo))}
+        )
+
+
+def particoes_lidas(queryset):
+    """Tabelas lidas pelo plano de ``queryset`` (``EXPLAIN``), para conferir a poda."""
+
+    sql, params = queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plano = cursor.fetchone()[0]
+    if isinstance(plano, str):
+        plano = json.loads(plano)
+    lidas = set()
+    pendentes = [plano[0]["Plan"]]
+    while pendentes:
+        no = pendentes.pop()
+        if "Relation Name" in no:
+            lidas.add(no["Relation Name"])
+        pendentes.extend(no.get("Plans", ()))
+    return lidas
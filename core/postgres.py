@@ -0,0 +1,73 @@
+"""Recursos específicos do PostgreSQL, inativos nos demais bancos.
+
+Em desenvolvimento e nos testes o projeto roda em SQLite; as funções e
+operações de migração deste módulo verificam o banco da conexão e não fazem
+nada fora do PostgreSQL, de modo que o mesmo histórico de migrações serve
+aos dois.
+"""
+
+from django.db import migrations
+
+
+def eh_postgresql(conexao):
+    return conexao.vendor == "postgresql"
+
+
+def contagem_estimada(modelo, conexao):
+    """Número de linhas estimado pelo PostgreSQL (``pg_class.reltuples``).
+
+    Retorna None fora do PostgreSQL ou se a tabela ainda não foi analisada.
+    """
+
+    if not eh_postgresql(conexao):
+        return None
+    with conexao.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+            [modelo._meta.db_table],
+        )
+        linha = cursor.fetchone()
+    if linha is None or linha[0] < 0:
+        return None
+    return linha[0]
+
+
+def _nome_indice_trigrama(tabela, coluna):
+    return f"{tabela}_{coluna}_trgm"[:63]
+
+
+def indices_trigrama(*alvos):
+    """Operação de migração com índices GIN de trigramas (``pg_trgm``).
+
+    Cada alvo é ``("app_label.Modelo", "campo")``. O índice cobre
+    ``UPPER(coluna::text)``, a expressão que o Django gera para ``icontains``
+    e ``istartswith``, então as buscas do admin passam a usá-lo tanto para
+    trechos quanto para prefixos.
+    """
+
+    def _indices(apps):
+        for rotulo, campo in alvos:
+            opts = apps.get_model(rotulo)._meta
+            yield opts.db_table, opts.get_field(campo).column
+
+    def criar(apps, schema_editor):
+        if not eh_postgresql(schema_editor.connection):
+            return
+        quote = schema_editor.quote_name
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for tabela, coluna in _indices(apps):
+            schema_editor.execute(
+                f"CREATE INDEX IF NOT EXISTS {quote(_nome_indice_trigrama(tabela, coluna))} "
+                f"ON {quote(tabela)} USING gin ((UPPER({quote(coluna)}::text)) gin_trgm_ops)"
+            )
+
+    def remover(apps, schema_editor):
+        if not eh_postgresql(schema_editor.connection):
+            return
+        quote = schema_editor.quote_name
+        for tabela, coluna in _indices(apps):
+            schema_editor.execute(
+                f"DROP INDEX IF EXISTS {quote(_nome_indice_trigrama(tabela, coluna))}"
+            )
+
+    return migrations.RunPython(criar, remover)
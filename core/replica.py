@@ -0,0 +1,130 @@
+"""Leitura em réplica para os caminhos pesados de consulta.
+
+Quando o alias ``replica`` está configurado (``DB_REPLICA_NAME``), o
+``RoteadorReplica`` envia à réplica as leituras feitas dentro de
+``em_replica()``: dashboard, API de indicadores, detalhamentos, exportações e
+relatório. Todo o resto, inclusive o admin, lê do primário, e todas as
+escritas vão para o primário.
+
+Para que quem acabou de gravar veja a própria alteração (read-your-writes), a
+primeira escrita de uma requisição fixa as leituras seguintes no primário, e
+o ``FixacaoPrimarioMiddleware`` grava um cookie que mantém o cliente no
+primário por ``REPLICA_FIXACAO_SEGUNDOS``. Só as escritas nos modelos do
+negócio fixam: sessão, ``last_login`` e o log do admin não mudam o que os
+relatórios leem. A janela deve superar o atraso típico de replicação; sem
+réplica configurada, nada muda.
+"""
+
+from contextlib import ContextDecorator
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA = "replica"
+COOKIE_FIXACAO = "pi02_primario"
+# Apps do framework cujas escritas não fixam as leituras no primário.
+APPS_SEM_FIXACAO = frozenset({"admin", "auth", "contenttypes", "sessions"})
+
+_na_replica = ContextVar("na_replica", default=False)
+_fixado = ContextVar("fixado_no_primario", default=False)
+_escreveu = ContextVar("escreveu", default=False)
+
+
+def replica_configurada():
+    return REPLICA in connections
+
+
+def banco_de_leitura():
+    """Alias de onde ler agora: a réplica, se configurada e sem fixação no primário."""
+
+    if replica_configurada() and not (_fixado.get() or _escreveu.get()):
+        return REPLICA
+    return DEFAULT_DB_ALIAS
+
+
+def lendo_da_replica():
+    """Se as leituras feitas agora vão para a réplica."""
+
+    return _na_replica.get() and banco_de_leitura() == REPLICA
+
+
+class em_replica(ContextDecorator):
+    """Envia à réplica as leituras do bloco (ou da função decorada)."""
+
+    def _recreate_cm(self):
+        # Cada chamada da função decorada guarda o próprio token.
+        return type(self)()
+
+    def __enter__(self):
+        self._token = _na_replica.set(True)
+        return self
+
+    def __exit__(self, *exc):
+        _na_replica.reset(self._token)
+        return False
+
+
+class no_primario(ContextDecorator):
+    """Lê do primário dentro do bloco, mesmo sob ``em_replica()``."""
+
+    def _recreate_cm(self):
+        return type(self)()
+
+    def __enter__(self):
+        self._token = _fixado.set(True)
+        return self
+
+    def __exit__(self, *exc):
+        _fixado.reset(self._token)
+        return False
+
+
+class RoteadorReplica:
+    def db_for_read(self, model, **hints):
+        if _na_replica.get():
+            return banco_de_leitura()
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Sempre o primário, mesmo para objetos lidos da réplica.
+        if model._meta.app_label not in APPS_SEM_FIXACAO:
+            _escreveu.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        bancos = {DEFAULT_DB_ALIAS, REPLICA}
+        if obj1._state.db in bancos and obj2._state.db in bancos:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # A réplica recebe o esquema pela replicação do primário.
+        if db == REPLICA:
+            return False
+        return None
+
+
+class FixacaoPrimarioMiddleware:
+    """Fixa no primário as leituras de quem gravou há menos de ``REPLICA_FIXACAO_SEGUNDOS``."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        fixado = _fixado.set(COOKIE_FIXACAO in request.COOKIES)
+        escreveu = _escreveu.set(False)
+        try:
+            response = self.get_response(request)
+            if _escreveu.get():
+                response.set_cookie(
+                    COOKIE_FIXACAO,
+                    "1",
+                    max_age=settings.REPLICA_FIXACAO_SEGUNDOS,
+                    httponly=True,
+                    samesite="Lax",
+                )
+            return response
+        finally:
+            _fixado.reset(fixado)
+            _escreveu.reset(escreveu)
@@ -1,3 +1,626 @@
-from django.test import TestCase
+import contextvars
+import json
+import tempfile
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connection, connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from carteira.models import Recebivel
+from comercial.models import Corretor, Empreendimento, Venda
+from core import carga, instrumentacao, particionamento, replica
+from core.importacao import ImportadorRecebiveis, ImportadorVendas
+from dashboards import cache as cache_dashboard
+from dashboards import busca, kpis
+from dashboards.filtros import SEM_FILTROS, Filtros
+
+
+class ImportacaoPlanilhasTests(TestCase):
+    VENDAS = (
+        "codigo;corretor;empreendimento;cidade;cliente;data_venda;unidades;valor_contrato;status\n"
+        "V1;Ana;Residencial Sol;Natal;Cliente A;2024-01-10;1;250.000,00;ativa\n"
+        "V2;Bruno;Residencial Sol;Natal;Cliente B;15/02/2024;2;480000.50;\n"
+        "V3;Ana;Parque Lua;Recife;Cliente C;2024-03-05;1;não-numérico;ativa\n"
+    )
+    RECEBIVEIS = (
+        "codigo;venda;data_vencimento;valor;data_pagamento;valor_pago;status\n"
+        "R1;V1;2024-02-10;25.000,00;2024-02-09;25.000,00;pago\n"
+        "R2;V1;2024-03-10;25.000,00;;;aberto\n"
+        "R3;V9;2024-03-10;10.000,00;;;aberto\n"
+    )
+
+    def setUp(self) -> None:
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        self.diretorio = Path(diretorio.name)
+
+    def _importar(self, tipo: str, conteudo: str) -> tuple[str, str]:
+        arquivo = self.diretorio / f"{tipo}.csv"
+        arquivo.write_text(conteudo, encoding="utf-8")
+        saida, erros = StringIO(), StringIO()
+        call_command("importar_planilhas", tipo, str(arquivo), stdout=saida, stderr=erros)
+        return saida.getvalue(), erros.getvalue()
+
+    def test_importa_vendas_e_recebiveis_reportando_linhas_invalidas(self) -> None:
+        saida, erros = self._importar("vendas", self.VENDAS)
+
+        self.assertIn("2 registro(s) importado(s), 1 linha(s) com erro", saida)
+        self.assertIn("Linha 4: valor numérico inválido", erros)
+        self.assertEqual(Corretor.objects.count(), 2)
+        self.assertEqual(
+            list(Empreendimento.objects.values_list("nome", "cidade")),
+            [("Parque Lua", "Recife"), ("Residencial Sol", "Natal")],
+        )
+        venda = Venda.objects.get(codigo_origem="V2")
+        self.assertEqual(venda.valor_contrato, Decimal("480000.50"))
+        self.assertEqual(venda.unidades_vendidas, 2)
+        self.assertEqual(venda.status, Venda.Status.ATIVA)
+
+        saida, erros = self._importar("recebiveis", self.RECEBIVEIS)
+
+        self.assertIn("2 registro(s) importado(s)", saida)
+        self.assertIn("Linha 4: referência não encontrada", erros)
+        self.assertEqual(
+            Recebivel.objects.get(codigo_origem="R1").status, Recebivel.Status.PAGO
+        )
+
+    def test_recusa_linhas_que_o_banco_rejeitaria(self) -> None:
+        cabecalho = self.VENDAS.splitlines()[0]
+        conteudo = (
+            f"{cabecalho}\n"
+            f"V1;Ana;Residencial Sol;Natal;{'x' * 121};2024-01-10;1;1000;ativa\n"
+            "V2;Ana;Residencial Sol;Natal;Cliente B;2024-01-10;1;12345678901,00;ativa\n"
+            f"V3;{'C' * 121};Residencial Sol;Natal;Cliente C;2024-01-10;1;1000;ativa\n"
+            "V4;Ana;Residencial Sol;Natal;Cliente D;2024-01-10;1;1000;ativa\n"
+        )
+
+        saida, erros = self._importar("vendas", conteudo)
+
+        self.assertIn("1 registro(s) importado(s), 3 linha(s) com erro", saida)
+        self.assertIn("Linha 2: cliente_nome:", erros)
+        self.assertIn("Linha 3: valor_contrato:", erros)
+        self.assertIn("Linha 4: Corretor inválido:", erros)
+        self.assertEqual(list(Corretor.objects.values_list("nome", flat=True)), ["Ana"])
+
+    def test_parcelas_guardam_apenas_as_vendas_do_lote(self) -> None:
+        self._importar("vendas", self.VENDAS)
+        importador = ImportadorRecebiveis()
+        linhas = [
+            {"codigo": f"R{indice}", "venda": venda, "data_vencimento": "2024-02-10", "valor": "10"}
+            for indice, venda in enumerate(("V1", "V2"))
+        ]
+
+        resultado = importador.importar(linhas, tamanho_lote=1)
+
+        self.assertEqual(resultado.processados, 2)
+        self.assertEqual(list(importador.vendas), ["V2"])
+
+    def test_reimportar_atualiza_sem_duplicar(self) -> None:
+        self._importar("vendas", self.VENDAS)
+        self._importar("vendas", self.VENDAS.replace("250.000,00", "260.000,00"))
+
+        self.assertEqual(Venda.objects.count(), 2)
+        self.assertEqual(Corretor.objects.count(), 2)
+        self.assertEqual(
+            Venda.objects.get(codigo_origem="V1").valor_contrato, Decimal("260000.00")
+        )
+
+    def test_reimportar_recusa_parcelas_arquivadas(self) -> None:
+        self._importar("vendas", self.VENDAS)
+        self._importar("recebiveis", self.RECEBIVEIS)
+        call_command("arquivar", antes_de="2024-03-01", stdout=StringIO())
+
+        saida, erros = self._importar("recebiveis", self.RECEBIVEIS)
+
+        self.assertIn("1 registro(s) importado(s)", saida)
+        self.assertIn("Linha 2: registro arquivado: R1", erros)
+        self.assertFalse(Recebivel.objects.filter(codigo_origem="R1").exists())
+
+    def test_lotes_resolvem_chaves_naturais_com_consultas_constantes(self) -> None:
+        linhas = [
+            {
+                "codigo": f"V{indice}",
+                "corretor": f"Corretor {indice % 3}",
+                "empreendimento": "Residencial Sol",
+                "cidade": "Natal",
+                "cliente": f"Cliente {indice}",
+                "data_venda": "2024-01-10",
+                "valor_contrato": "1000",
+            }
+            for indice in range(50)
+        ]
+        importador = ImportadorVendas()
+
+        # Por lote: criação e releitura de corretores e empreendimentos, a
+        # consulta dos códigos já arquivados, a leitura dos valores anteriores
+        # dos registros existentes, o upsert das vendas, a diferença nos totais
+        # dos pares (corretor, empreendimento) do lote (criação das linhas que
+        # faltam e uma atualização por par), a regravação no índice de busca de
+        # vendas, corretores e empreendimentos (exclusão e inserção de cada) e
+        # o savepoint da transação. No PostgreSQL não há índice a regravar, mas
+        # a gravação verifica se a tabela de vendas é particionada.
+        with self.assertNumQueries(19 if busca.usa_fts() else 14):
+            resultado = importador.importar(linhas, tamanho_lote=50)
+
+        self.assertEqual(resultado.processados, 50)
+        self.assertEqual(Venda.objects.count(), 50)
+
+
+class InstrumentacaoMiddlewareTests(TestCase):
+    def setUp(self) -> None:
+        self.client.force_login(
+            get_user_model().objects.create_superuser(username="admin", password="senha")
+        )
+
+    def test_exposes_server_timing_and_logs_measurements(self) -> None:
+        with self.assertLogs("core.instrumentacao", "INFO") as registros:
+            response = self.client.get(reverse("admin:comercial_venda_changelist"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(
+            response["Server-Timing"],
+            r'^sql;dur=[\d.]+;desc="\d+ consultas", app;dur=[\d.]+, total;dur=[\d.]+$',
+        )
+        [registro] = registros.records
+        medidas = registro.instrumentacao
+        self.assertEqual(medidas["rota"], "admin:comercial_venda_changelist")
+        self.assertGreater(medidas["consultas"], 0)
+        self.assertIn(f"consultas={medidas['consultas']}", registro.getMessage())
+
+    @skipUnless(instrumentacao._memoria_kib() is not None, "sem medida de memória")
+    def test_memory_follows_current_usage_not_the_process_peak(self) -> None:
+        bloco = b"x" * (64 * 1024 * 1024)
+        del bloco
+        # Abaixo do pico já atingido: ``ru_maxrss`` não cresceria aqui.
+        antes = instrumentacao._memoria_kib()
+        bloco = b"x" * (32 * 1024 * 1024)
+
+        self.assertGreater(instrumentacao._memoria_kib() - antes, 16 * 1024)
+        del bloco
+
+    @override_settings(INSTRUMENTACAO_ORCAMENTOS={"admin:*_changelist": {"consultas": 1}})
+    def test_warns_when_view_exceeds_budget(self) -> None:
+        with self.assertLogs("core.instrumentacao", "WARNING") as registros:
+            self.client.get(reverse("admin:comercial_venda_changelist"))
+
+        [registro] = registros.records
+        self.assertEqual(registro.orcamento_excedido, ["consultas>1"])
+        self.assertIn("orcamento_excedido=consultas>1", registro.getMessage())
+
+
+class AdminGrandeVolumeTests(TestCase):
+    def setUp(self) -> None:
+        self.client.force_login(
+            get_user_model().objects.create_superuser(username="admin", password="senha")
+        )
+        self.corretor = Corretor.objects.create(nome="Ana Lima")
+
+    def _criar_recebiveis(self, quantidade) -> None:
+        for indice in range(quantidade):
+            empreendimento = Empreendimento.objects.create(nome=f"Obra {indice}", cidade="Santos")
+            venda = Venda.objects.create(
+                corretor=self.corretor,
+                empreendimento=empreendimento,
+                cliente_nome=f"Cliente {indice}",
+                data_venda=date(2024, 1, 1),
+                valor_contrato=Decimal("1000.00"),
+            )
+            Recebivel.objects.create(
+                venda=venda, data_vencimento=date(2024, 2, 1), valor=Decimal("100.00")
+            )
+
+    def _changelist(self, **parametros):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(
+                reverse("admin:carteira_recebivel_changelist"), parametros
+            )
+        self.assertEqual(response.status_code, 200)
+        return response, len(consultas)
+
+    def test_changelist_queries_do_not_grow_with_rows(self) -> None:
+        self._criar_recebiveis(1)
+        _, consultas_iniciais = self._changelist()
+        self._criar_recebiveis(5)
+        response, consultas = self._changelist()
+
+        self.assertEqual(consultas, consultas_iniciais)
+        changelist = response.context["cl"]
+        self.assertFalse(changelist.show_full_result_count)
+        self.assertEqual(changelist.result_count, 6)
+        self.assertEqual(changelist.date_hierarchy, "data_vencimento")
+
+    def test_search_counts_filtered_rows_exactly(self) -> None:
+        self._criar_recebiveis(3)
+        response, _ = self._changelist(q="Obra 1")
+        self.assertEqual(response.context["cl"].result_count, 1)
+
+    def test_archive_is_read_only_and_only_queried_on_search(self) -> None:
+        self._criar_recebiveis(2)
+        Recebivel.objects.update(status=Recebivel.Status.PAGO, valor_pago=Decimal("100.00"))
+        call_command("arquivar", antes_de="2024-03-01", stdout=StringIO())
+        url = reverse("admin:carteira_recebivelarquivo_changelist")
+
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url)
+        self.assertEqual(response.context["cl"].result_count, 0)
+        self.assertFalse(
+            any("carteira_recebivelarquivo" in item["sql"] for item in consultas.captured_queries)
+        )
+        self.assertFalse(response.context["has_add_permission"])
+
+        response = self.client.get(url, {"q": '"Cliente 1"'})
+        [parcela] = response.context["cl"].result_list
+        self.assertEqual(parcela.cliente_nome, "Cliente 1")
+        response = self.client.get(url, {"q": str(parcela.pk)})
+        self.assertEqual(list(response.context["cl"].result_list), [parcela])
+
+
+class TesteCargaTests(TransactionTestCase):
+    # As requisições rodam em threads com conexões próprias, que só enxergam dados gravados.
+
+    def test_reports_latency_percentiles_for_authenticated_requests(self) -> None:
+        get_user_model().objects.create_user(username="carga", password="senha")
+        saida = StringIO()
+
+        with self.assertLogs("core.instrumentacao", "INFO"):
+            call_command(
+                "teste_carga",
+                "--requisicoes",
+                "7",
+                "--concorrencia",
+                "3",
+                "--usuario",
+                "carga",
+                stdout=saida,
+            )
+
+        resultado = json.loads(saida.getvalue())
+        self.assertEqual(resultado["requisicoes"], 7)
+        self.assertEqual(resultado["status"], {"200": 7})
+        self.assertEqual(resultado["banco"], connection.vendor)
+        self.assertLessEqual(resultado["ms"]["p50"], resultado["ms"]["p95"])
+        self.assertLessEqual(resultado["ms"]["p95"], resultado["ms"]["max"])
+
+    def test_percentile_uses_nearest_rank(self) -> None:
+        valores = list(range(1, 21))
+
+        self.assertEqual(carga.percentil(valores, 95), 19)
+        self.assertEqual(carga.percentil(valores, 50), 10)
+        self.assertEqual(carga.percentil([7], 99), 7)
+
+
+@skipUnless(connection.vendor == "sqlite", "A réplica de teste é um arquivo SQLite.")
+class ReplicaLeituraTests(TransactionTestCase):
+    # Um segundo arquivo SQLite faz o papel da réplica, com dados próprios.
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        # Declarado só aqui: o alias não existe quando o runner coleta os testes.
+        cls.databases = {DEFAULT_DB_ALIAS, replica.REPLICA}
+        cls.diretorio = tempfile.TemporaryDirectory()
+        connections.settings[replica.REPLICA] = {
+            **connections.settings[DEFAULT_DB_ALIAS],
+            "NAME": str(Path(cls.diretorio.name) / "replica.sqlite3"),
+        }
+        # O roteador não migra a réplica; aqui o esquema não vem por replicação.
+        with override_settings(DATABASE_ROUTERS=[]):
+            call_command("migrate", database=replica.REPLICA, verbosity=0)
+        # bulk_create não dispara os sinais que gravariam no primário.
+        [corretor] = Corretor.objects.using(replica.REPLICA).bulk_create(
+            [Corretor(nome="Corretor da Réplica")]
+        )
+        [empreendimento] = Empreendimento.objects.using(replica.REPLICA).bulk_create(
+            [Empreendimento(nome="Torre Réplica", cidade="Santos")]
+        )
+        Venda.objects.using(replica.REPLICA).bulk_create(
+            [
+                Venda(
+                    corretor=corretor,
+                    empreendimento=empreendimento,
+                    cliente_nome="Cliente da Réplica",
+                    data_venda=date(2024, 1, 10),
+                    valor_contrato=Decimal("100000.00"),
+                )
+            ]
+        )
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        super().tearDownClass()
+        connections[replica.REPLICA].close()
+        del connections[replica.REPLICA]
+        del connections.settings[replica.REPLICA]
+        cls.diretorio.cleanup()
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.client.force_login(
+            get_user_model().objects.create_superuser(username="admin", password="senha")
+        )
+        Venda.objects.create(
+            corretor=Corretor.objects.create(nome="Corretor do Primário"),
+            empreendimento=Empreendimento.objects.create(nome="Torre Primária", cidade="Santos"),
+            cliente_nome="Cliente do Primário",
+            data_venda=date(2024, 1, 10),
+            valor_contrato=Decimal("200000.00"),
+        )
+
+    def _exportar_vendas(self):
+        response = self.client.get(reverse("dashboards:exportar", args=["vendas"]))
+        return b"".join(response.streaming_content).decode()
+
+    def test_reporting_paths_read_from_replica(self) -> None:
+        self.assertIn("Cliente da Réplica", self._exportar_vendas())
+
+        response = self.client.get(reverse("dashboards:detalhamento", args=["vendas"]))
+        self.assertContains(response, "Cliente da Réplica")
+        self.assertNotContains(response, "Cliente do Primário")
+
+        response = self.client.get(reverse("admin:comercial_venda_changelist"))
+        self.assertContains(response, "Cliente do Primário")
+
+    def test_client_reads_primary_after_writing(self) -> None:
+        response = self.client.post(
+            reverse("admin:comercial_corretor_add"), {"nome": "Novo Corretor", "ativo": "on"}
+        )
+
+        self.assertEqual(response.status_code, 302)
+        cookie = response.cookies[replica.COOKIE_FIXACAO]
+        self.assertEqual(cookie["max-age"], settings.REPLICA_FIXACAO_SEGUNDOS)
+        exportacao = self._exportar_vendas()
+        self.assertIn("Cliente do Primário", exportacao)
+        self.assertNotIn("Cliente da Réplica", exportacao)
+
+    def test_login_does_not_pin_the_client_to_primary(self) -> None:
+        self.client.logout()
+        response = self.client.post(
+            reverse("admin:login"), {"username": "admin", "password": "senha"}
+        )
+
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIn(replica.COOKIE_FIXACAO, response.cookies)
+        self.assertIn("Cliente da Réplica", self._exportar_vendas())
+
+    def test_cache_entries_right_after_a_change_are_computed_on_primary(self) -> None:
+        def clientes():
+            return list(Venda.objects.values_list("cliente_nome", flat=True))
+
+        @replica.em_replica()
+        def calcular(nome):
+            return cache_dashboard.obter_ou_calcular(nome, clientes, ["comercial.venda"])
+
+        # Contexto novo: as escritas do setUp fixariam as leituras no primário.
+        self.assertEqual(
+            contextvars.Context().run(calcular, "clientes"), ["Cliente do Primário"]
+        )
+        with override_settings(REPLICA_FIXACAO_SEGUNDOS=0):
+            self.assertEqual(
+                contextvars.Context().run(calcular, "clientes-antigos"), ["Cliente da Réplica"]
+            )
+
+    def test_router_sends_writes_and_migrations_to_primary(self) -> None:
+        roteador = replica.RoteadorReplica()
+
+        def rotas():
+            fora = roteador.db_for_read(Venda)
+            with replica.em_replica():
+                antes = roteador.db_for_read(Venda)
+                escrita = roteador.db_for_write(Venda)
+                depois = roteador.db_for_read(Venda)
+            return fora, antes, escrita, depois
+
+        self.assertEqual(
+            contextvars.Context().run(rotas),
+            (None, replica.REPLICA, DEFAULT_DB_ALIAS, DEFAULT_DB_ALIAS),
+        )
+        self.assertFalse(roteador.allow_migrate(replica.REPLICA, "comercial"))
+        self.assertIsNone(roteador.allow_migrate(DEFAULT_DB_ALIAS, "comercial"))
+
+
+class ParticionamentoTests(TestCase):
+    def test_partition_names_encode_their_bounds(self) -> None:
+        anual = particionamento.nome_particao("comercial_venda", "ano", date(2024, 1, 1))
+        mensal = particionamento.nome_particao("comercial_venda", "mes", date(2024, 12, 1))
+
+        self.assertEqual(anual, "comercial_venda_p2024")
+        self.assertEqual(
+            particionamento.limites_do_nome("comercial_venda", anual),
+            (date(2024, 1, 1), date(2025, 1, 1)),
+        )
+        self.assertEqual(
+            particionamento.limites_do_nome("comercial_venda", mensal),
+            (date(2024, 12, 1), date(2025, 1, 1)),
+        )
+        self.assertIsNone(
+            particionamento.limites_do_nome("comercial_venda", "comercial_venda_padrao")
+        )
+        self.assertEqual(
+            list(particionamento.periodos("mes", date(2024, 11, 20), date(2025, 1, 5))),
+            [date(2024, 11, 1), date(2024, 12, 1), date(2025, 1, 1)],
+        )
+
+    @skipUnless(connection.vendor != "postgresql", "Verifica os demais bancos.")
+    def test_other_databases_keep_plain_tables(self) -> None:
+        with self.assertNumQueries(0):
+            self.assertIsNone(particionamento.campo_particao(Venda, connection))
+        with self.assertRaisesMessage(CommandError, "apenas no PostgreSQL"):
+            call_command("particoes", "listar", stdout=StringIO())
+
+
+@skipUnless(connection.vendor == "postgresql", "O particionamento exige PostgreSQL.")
+class ParticionamentoPostgresTests(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        # As migrações só particionam com DB_PARTICIONAR; aqui a conversão é
+        # explícita e desfeita com a transação da classe.
+        call_command("particoes", "particionar", stdout=StringIO())
+
+    def setUp(self) -> None:
+        self.corretor = Corretor.objects.create(nome="Ana")
+        self.empreendimento = Empreendimento.objects.create(nome="Sol", cidade="Natal")
+        alvo = particionamento.PARTICIONAMENTOS["comercial.Venda"]
+        particionamento.garantir_particoes(connection, alvo, desde=date(2023, 1, 1))
+
+    def _venda(self, codigo, data_venda):
+        return Venda.objects.create(
+            codigo_origem=codigo,
+            corretor=self.corretor,
+            empreendimento=self.empreendimento,
+            cliente_nome="Cliente",
+            data_venda=data_venda,
+            valor_contrato=Decimal("1000.00"),
+        )
+
+    def test_date_filters_read_only_matching_partitions(self) -> None:
+        self.assertTrue(particionamento.particionada(connection, "comercial_venda"))
+        self.assertTrue(particionamento.particionada(connection, "carteira_recebivel"))
+        antiga = self._venda("V1", date(2023, 5, 1))
+        self._venda("V2", date(2024, 5, 1))
+
+        consulta = Venda.objects.filter(
+            data_venda__gte=date(2023, 1, 1), data_venda__lt=date(2024, 1, 1)
+        )
+        self.assertEqual(list(consulta), [antiga])
+        self.assertEqual(particionamento.particoes_lidas(consulta), {"comercial_venda_p2023"})
+
+    def test_import_moves_redated_rows_between_partitions(self) -> None:
+        venda = self._venda("V1", date(2023, 5, 1))
+
+        ImportadorVendas().importar(
+            [
+                {
+                    "codigo": "V1",
+                    "corretor": "Ana",
+                    "empreendimento": "Sol",
+                    "cliente": "Cliente",
+                    "data_venda": "2024-02-01",
+                    "valor_contrato": "1000,00",
+                }
+            ]
+        )
+
+        self.assertEqual(Venda.objects.get().pk, venda.pk)
+        self.assertEqual(Venda.objects.get().data_venda, date(2024, 2, 1))
+
+    def test_old_partitions_can_be_detached_and_attached_again(self) -> None:
+        self._venda("V1", date(2023, 5, 1))
+
+        desanexadas = particionamento.desanexar_anteriores(
+            connection, "comercial_venda", date(2024, 1, 1)
+        )
+        self.assertEqual(desanexadas, ["comercial_venda_p2023"])
+        self.assertFalse(Venda.objects.exists())
+
+        particionamento.anexar(connection, "comercial_venda", "comercial_venda_p2023")
+        self.assertEqual(Venda.objects.count(), 1)
+
+    def test_detached_partitions_keep_the_dashboard_totals(self) -> None:
+        particionamento.garantir_particoes(
+            connection,
+            particionamento.PARTICIONAMENTOS["carteira.Recebivel"],
+            desde=date(2023, 1, 1),
+        )
+        venda = self._venda("V1", date(2023, 5, 1))
+        self._venda("V2", date(2024, 5, 1))
+        Recebivel.objects.create(
+            venda=venda,
+            data_vencimento=date(2023, 6, 1),
+            valor=Decimal("100.00"),
+            valor_pago=Decimal("100.00"),
+            status=Recebivel.Status.PAGO,
+        )
+        periodo = Filtros(data_inicio=date(2023, 1, 1))
+
+        def indicadores():
+            return [
+                kpis.comercial_kpis(filtros) | kpis.carteira_kpis(filtros)
+                for filtros in (SEM_FILTROS, periodo)
+            ]
+
+        antes = indicadores()
+
+        def desanexar(rotulo):
+            call_command(
+                "particoes", "desanexar", modelo=[rotulo], antes_de="2024-01-01", stdout=StringIO()
+            )
+
+        # A venda ainda tem parcelas na tabela: a partição fica.
+        with self.assertRaisesMessage(CommandError, "referenciadas por carteira_recebivel"):
+            desanexar("comercial.Venda")
+        self.assertEqual(Venda.objects.count(), 2)
+
+        desanexar("carteira.Recebivel")
+        desanexar("comercial.Venda")
+        self.assertEqual(Venda.objects.get().codigo_origem, "V2")
+        self.assertFalse(Recebivel.objects.exists())
+        self.assertEqual(indicadores(), antes)
+
+        particionamento.anexar(connection, "comercial_venda", "comercial_venda_p2023")
+        particionamento.anexar(connection, "carteira_recebivel", "carteira_recebivel_p2023")
+        self.assertEqual(indicadores(), antes)
+
+    def test_partitions_with_open_installments_are_not_detached(self) -> None:
+        particionamento.garantir_particoes(
+            connection,
+            particionamento.PARTICIONAMENTOS["carteira.Recebivel"],
+            desde=date(2023, 1, 1),
+        )
+        Recebivel.objects.create(
+            venda=self._venda("V1", date(2023, 5, 1)),
+            data_vencimento=date(2023, 6, 1),
+            valor=Decimal("100.00"),
+        )
+
+        with self.assertRaises(ValueError):
+            particionamento.desanexar_anteriores(
+                connection, "carteira_recebivel", date(2024, 1, 1)
+            )
+        self.assertEqual(Recebivel.objects.count(), 1)
+
+    def test_codigo_origem_stays_unique_across_partitions(self) -> None:
+        self._venda("V1", date(2023, 5, 1))
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self._venda("V1", date(2024, 5, 1))
+
+    def test_triggers_replace_the_foreign_key_to_sales(self) -> None:
+        venda = self._venda("V1", date(2023, 5, 1))
+        Recebivel.objects.create(
+            venda=venda, data_vencimento=date(2023, 6, 1), valor=Decimal("100.00")
+        )
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Recebivel.objects.create(
+                venda_id=venda.pk + 1000, data_vencimento=date(2023, 6, 1), valor=Decimal("1")
+            )
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute("DELETE FROM comercial_venda WHERE id = %s", [venda.pk])
+
+    def test_conversion_is_reverted_with_the_original_constraints(self) -> None:
+        self._venda("V1", date(2023, 5, 1))
+
+        call_command("particoes", "desparticionar", stdout=StringIO())
+
+        self.assertFalse(particionamento.particionada(connection, "comercial_venda"))
+        self.assertFalse(particionamento.particionada(connection, "carteira_recebivel"))
+        self.assertEqual(Venda.objects.count(), 1)
+        with connection.cursor() as cursor:
+            restricoes = connection.introspection.get_constraints(cursor, "carteira_recebivel")
+        self.assertIn(
+            ("comercial_venda", "id"),
+            [dados["foreign_key"] for dados in restricoes.values() if dados["foreign_key"]],
+        )
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self._venda("V1", date(2024, 5, 1))
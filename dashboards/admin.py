@@ -1,3 +1,16 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import KpiSnapshotDiario
+
+
+@admin.register(KpiSnapshotDiario)
+class KpiSnapshotDiarioAdmin(admin.ModelAdmin):
+    list_display = (
+        "data",
+        "valor_total_vendas",
+        "total_carteira",
+        "valor_inadimplente",
+        "custo_total_compras",
+        "atualizado_ate",
+    )
+    date_hierarchy = "data"
@@ -0,0 +1,116 @@
+"""API somente leitura com os grupos de KPIs do dashboard.
+
+As respostas trazem ``ETag`` e ``Last-Modified`` calculados a partir do
+``updated_at`` mais recente das tabelas de origem e das versões de cache da
+seção (que também mudam em exclusões). Requisições condicionais cujo conteúdo
+não mudou recebem 304 sem recalcular nenhum indicador.
+"""
+
+import hashlib
+
+from django.apps import apps
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.replica import em_replica
+
+from . import busca, cache, secoes
+from .forms import FiltroDashboardForm
+
+
+def ultima_atualizacao(rotulos):
+    """Maior ``updated_at`` entre os modelos informados (``app.modelo``)."""
+
+    datas = [
+        apps.get_model(rotulo).objects.aggregate(ultima=Max("updated_at"))["ultima"]
+        for rotulo in rotulos
+    ]
+    datas = [data for data in datas if data is not None]
+    return max(datas) if datas else None
+
+
+class KpiAPIView(APIView):
+    secao = None
+    indicador = None
+
+    @em_replica()
+    def get(self, request):
+        filtros_form = FiltroDashboardForm(request.query_params or None)
+        if filtros_form.is_bound and not filtros_form.is_valid():
+            raise ValidationError(filtros_form.errors)
+        filtros = filtros_form.filtros()
+        dependencias = secoes.dependencias(self.secao)
+        ultima = ultima_atualizacao(dependencias)
+        assinatura = "|".join(
+            [
+                timezone.localdate().isoformat(),
+                self.indicador,
+                filtros.chave(),
+                ultima.isoformat() if ultima else "",
+                *(
+                    f"{rotulo}={versao}"
+                    for rotulo, versao in sorted(cache.versoes(dependencias).items())
+                ),
+            ]
+        )
+        etag = quote_etag(hashlib.md5(assinatura.encode()).hexdigest())
+        last_modified = int(ultima.timestamp()) if ultima else None
+
+        resposta = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if resposta is None:
+            resposta = Response(secoes.secao(self.secao, filtros)[self.indicador])
+        resposta["ETag"] = etag
+        if last_modified is not None:
+            resposta["Last-Modified"] = http_date(last_modified)
+        return resposta
+
+
+class VendasComparativosAPIView(KpiAPIView):
+    secao = "comercial"
+    indicador = "comparativos"
+
+
+class InadimplenciaCorretorAPIView(KpiAPIView):
+    secao = "carteira"
+    indicador = "inadimplencia_por_corretor"
+
+
+class SupplierShareAPIView(KpiAPIView):
+    secao = "compras"
+    indicador = "supplier_share"
+
+
+class MargemAPIView(KpiAPIView):
+    secao = "estrategicos"
+    indicador = "margem_por_empreendimento"
+
+
+class FluxoCaixaAPIView(KpiAPIView):
+    """Projeção de entradas; ``?granularidade=semanal`` troca os meses por semanas."""
+
+    secao = "fluxo_caixa"
+    indicador = "mensal"
+
+    def get(self, request):
+        if request.query_params.get("granularidade") == "semanal":
+            self.indicador = "semanal"
+        return super().get(request)
+
+
+class BuscaAPIView(APIView):
+    """Busca global: ``?q=termo&limite=N`` (até ``LIMITE_MAXIMO`` resultados)."""
+
+    LIMITE_MAXIMO = 50
+
+    def get(self, request):
+        try:
+            limite = int(request.query_params.get("limite", busca.LIMITE_PADRAO))
+        except ValueError:
+            limite = busca.LIMITE_PADRAO
+        limite = min(max(limite, 1), self.LIMITE_MAXIMO)
+        return Response(busca.buscar(request.query_params.get("q", ""), limite=limite))
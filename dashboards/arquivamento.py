@@ -0,0 +1,294 @@
+"""Arquivamento de parcelas pagas e vendas canceladas antigas.
+
+Parcelas pagas com vencimento anterior ao corte e vendas canceladas anteriores
+ao corte, cujas parcelas já tenham todas saído da tabela de origem, são
+copiadas para ``RecebivelArquivo`` e ``VendaArquivo`` e excluídas da origem em
+lotes, cada um na sua transação. Na mesma transação a contribuição do lote é
+somada aos totais diários de ``TotalArquivado``, que os KPIs com histórico
+(``dashboards.kpis``, ``dashboards.fluxo_caixa`` e os fatos de
+``refresh_kpis``) leem no lugar das tabelas de arquivo.
+
+As exclusões são feitas em SQL, sem os sinais de ``post_delete``: os totais
+correntes continuam contando o que foi arquivado, e ``reconciliar`` soma
+``TotalArquivado`` ao reconstruí-los. Vendas canceladas com parcelas em
+aberto permanecem na origem. Não rode dois arquivamentos ao mesmo tempo.
+
+Partições desanexadas no PostgreSQL (``core.particionamento``) saem das
+consultas do mesmo jeito: ``ao_desanexar_particao`` soma suas linhas aos
+totais arquivados, e ``ao_anexar_particao`` as desconta quando ela volta.
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date
+from functools import partial
+
+from django.db import connection, transaction
+from django.db.models import Count, Exists, OuterRef, Sum
+from django.utils import timezone
+
+from carteira.models import Recebivel, RecebivelArquivo
+from comercial.models import Venda, VendaArquivo
+
+from . import busca, cache
+from .models import TotalArquivado
+
+MESES_RETENCAO = 24
+# Parâmetros por comando, abaixo do limite de variáveis do SQLite.
+TAMANHO_LOTE = 500
+
+CAMPOS_TOTAIS = (
+    "valor_vendas",
+    "unidades_vendidas",
+    "total_contratos",
+    "total_carteira",
+    "valor_recebido",
+    "total_parcelas",
+)
+
+
+@dataclass
+class ResultadoArquivamento:
+    recebiveis: int = 0
+    vendas: int = 0
+
+
+def corte_padrao(hoje=None, meses=MESES_RETENCAO):
+    """Primeiro dia do mês de ``meses`` meses antes do mês de ``hoje``."""
+
+    hoje = hoje or timezone.localdate()
+    mes = hoje.year * 12 + hoje.month - 1 - meses
+    return date(mes // 12, mes % 12 + 1, 1)
+
+
+def recebiveis_arquivaveis(corte):
+    return Recebivel.objects.filter(status=Recebivel.Status.PAGO, data_vencimento__lt=corte)
+
+
+def vendas_arquivaveis(corte):
+    """Vendas canceladas antes de ``corte`` cujas parcelas são todas arquiváveis."""
+
+    restantes = Recebivel.objects.filter(venda=OuterRef("pk")).exclude(
+        status=Recebivel.Status.PAGO, data_vencimento__lt=corte
+    )
+    return Venda.objects.filter(
+        status=Venda.Status.CANCELADA, data_venda__lt=corte
+    ).exclude(Exists(restantes))
+
+
+def _acumular(contribuicoes, agora):
+    """Soma ``contribuicoes`` ((corretor, empreendimento, data) -> valores) ao arquivo."""
+
+    existentes = {
+        (linha.corretor_id, linha.empreendimento_id, linha.data): linha
+        for linha in TotalArquivado.objects.select_for_update().filter(
+            corretor_id__in={corretor_id for corretor_id, _, _ in contribuicoes},
+            data__in={data for _, _, data in contribuicoes},
+        )
+    }
+    alteradas, novas = [], []
+    for chave, valores in contribuicoes.items():
+        linha = existentes.get(chave)
+        if linha is None:
+            corretor_id, empreendimento_id, data = chave
+            novas.append(
+                TotalArquivado(
+                    corretor_id=corretor_id, empreendimento_id=empreendimento_id, data=data
+                )
+            )
+            linha = novas[-1]
+        else:
+            linha.updated_at = agora
+            alteradas.append(linha)
+        for campo, valor in valores.items():
+            setattr(linha, campo, getattr(linha, campo) + valor)
+    TotalArquivado.objects.bulk_update(alteradas, [*CAMPOS_TOTAIS, "updated_at"])
+    TotalArquivado.objects.bulk_create(novas)
+
+
+def _excluir(modelo, ids):
+    # Sem ``QuerySet.delete()``: os sinais descontariam os totais correntes.
+    opts = modelo._meta
+    q = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {q(opts.db_table)} "
+            f"WHERE {q(opts.pk.column)} IN ({', '.join(['%s'] * len(ids))})",
+            ids,
+        )
+    transaction.on_commit(partial(cache.invalidar, opts.label_lower))
+
+
+def _arquivar_lote_recebiveis(corte, tamanho_lote):
+    with transaction.atomic():
+        parcelas = list(
+            recebiveis_arquivaveis(corte)
+            .select_related("venda")
+            .select_for_update(of=("self",))
+            .order_by("pk")[:tamanho_lote]
+        )
+        if not parcelas:
+            return 0
+        agora = timezone.now()
+        contribuicoes = defaultdict(lambda: defaultdict(int))
+        arquivo = []
+        for parcela in parcelas:
+            venda = parcela.venda
+            arquivo.append(
+                RecebivelArquivo(
+                    id=parcela.pk,
+                    venda_id=venda.pk,
+                    corretor_id=venda.corretor_id,
+                    empreendimento_id=venda.empreendimento_id,
+                    cliente_nome=venda.cliente_nome,
+                    data_vencimento=parcela.data_vencimento,
+                    valor=parcela.valor,
+                    data_pagamento=parcela.data_pagamento,
+                    valor_pago=parcela.valor_pago,
+                    status=parcela.status,
+                    codigo_origem=parcela.codigo_origem,
+                    created_at=parcela.created_at,
+                    updated_at=parcela.updated_at,
+                    arquivado_em=agora,
+                )
+            )
+            valores = contribuicoes[
+                (venda.corretor_id, venda.empreendimento_id, parcela.data_vencimento)
+            ]
+            valores["total_carteira"] += parcela.valor
+            valores["valor_recebido"] += parcela.valor_pago
+            valores["total_parcelas"] += 1
+        RecebivelArquivo.objects.bulk_create(arquivo)
+        _acumular(contribuicoes, agora)
+        _excluir(Recebivel, [parcela.pk for parcela in parcelas])
+    return len(parcelas)
+
+
+def _arquivar_lote_vendas(corte, tamanho_lote):
+    with transaction.atomic():
+        vendas = list(
+            vendas_arquivaveis(corte).select_for_update().order_by("pk")[:tamanho_lote]
+        )
+        if not vendas:
+            return 0
+        agora = timezone.now()
+        contribuicoes = defaultdict(lambda: defaultdict(int))
+        arquivo = []
+        for venda in vendas:
+            arquivo.append(
+                VendaArquivo(
+                    id=venda.pk,
+                    corretor_id=venda.corretor_id,
+                    empreendimento_id=venda.empreendimento_id,
+                    cliente_nome=venda.cliente_nome,
+                    data_venda=venda.data_venda,
+                    unidades_vendidas=venda.unidades_vendidas,
+                    valor_contrato=venda.valor_contrato,
+                    status=venda.status,
+                    codigo_origem=venda.codigo_origem,
+                    created_at=venda.created_at,
+                    updated_at=venda.updated_at,
+                    arquivado_em=agora,
+                )
+            )
+            valores = contribuicoes[(venda.corretor_id, venda.empreendimento_id, venda.data_venda)]
+            valores["valor_vendas"] += venda.valor_contrato
+            valores["unidades_vendidas"] += venda.unidades_vendidas
+            valores["total_contratos"] += 1
+        VendaArquivo.objects.bulk_create(arquivo)
+        _acumular(contribuicoes, agora)
+        ids = [venda.pk for venda in vendas]
+        _excluir(Venda, ids)
+        # Tira os clientes arquivados do índice da busca global.
+        busca.sincronizar(Venda, ids)
+    return len(vendas)
+
+
+def arquivar(corte, tamanho_lote=TAMANHO_LOTE, progresso=None):
+    """Move para o arquivo as parcelas pagas e as vendas canceladas anteriores a ``corte``.
+
+    As parcelas vão primeiro, para que as vendas canceladas cujas parcelas
+    foram todas arquivadas possam segui-las. ``progresso``, se informado, é
+    chamado com o modelo e a quantidade de cada lote concluído.
+    """
+
+    resultado = ResultadoArquivamento()
+    for modelo, arquivar_lote, campo in (
+        (Recebivel, _arquivar_lote_recebiveis, "recebiveis"),
+        (Venda, _arquivar_lote_vendas, "vendas"),
+    ):
+        while quantidade := arquivar_lote(corte, tamanho_lote):
+            setattr(resultado, campo, getattr(resultado, campo) + quantidade)
+            if progresso is not None:
+                progresso(modelo, quantidade)
+    return resultado
+
+
+def simular(corte):
+    """Quantas parcelas e vendas ``arquivar(corte)`` moveria, sem alterar nada."""
+
+    return ResultadoArquivamento(
+        recebiveis=recebiveis_arquivaveis(corte).count(),
+        vendas=vendas_arquivaveis(corte).count(),
+    )
+
+
+# Por modelo: campos (corretor, empreendimento, data) das linhas de uma
+# partição e as somas que elas acrescentam a ``TotalArquivado``.
+SOMAS_DA_PARTICAO = {
+    Venda: (
+        ("corretor_id", "empreendimento_id", "data_venda"),
+        {
+            "valor_vendas": Sum("valor_contrato"),
+            "unidades_vendidas": Sum("unidades_vendidas"),
+            "total_contratos": Count("id"),
+        },
+    ),
+    Recebivel: (
+        ("venda__corretor_id", "venda__empreendimento_id", "data_vencimento"),
+        {
+            "total_carteira": Sum("valor"),
+            "valor_recebido": Sum("valor_pago"),
+            "total_parcelas": Count("id"),
+        },
+    ),
+}
+
+
+def _acumular_particao(modelo, conexao, inicio, fim, sinal):
+    chaves, somas = SOMAS_DA_PARTICAO[modelo]
+    linhas = modelo.objects.using(conexao.alias).filter(
+        **{f"{chaves[2]}__gte": inicio, f"{chaves[2]}__lt": fim}
+    )
+    contribuicoes = {}
+    for linha in linhas.order_by().values(*chaves).annotate(**somas):
+        chave = tuple(linha.pop(campo) for campo in chaves)
+        contribuicoes[chave] = {campo: valor * sinal for campo, valor in linha.items()}
+    if contribuicoes:
+        _acumular(contribuicoes, timezone.now())
+    transaction.on_commit(partial(cache.invalidar, modelo._meta.label_lower))
+
+
+def ao_desanexar_particao(sender, conexao, inicio, fim, **kwargs):
+    """Soma aos totais arquivados as linhas da partição de ``sender`` que vai sair.
+
+    Como no arquivamento, só parcelas pagas podem sair: recusa com
+    ``ValueError`` partições de recebíveis com parcelas em aberto.
+    """
+
+    if sender is Recebivel:
+        abertas = Recebivel.objects.using(conexao.alias).filter(
+            data_vencimento__gte=inicio, data_vencimento__lt=fim
+        )
+        if abertas.exclude(status=Recebivel.Status.PAGO).exists():
+            raise ValueError(
+                f"Há parcelas em aberto com vencimento entre {inicio:%d/%m/%Y} e "
+                f"{fim:%d/%m/%Y}; só partições com parcelas pagas podem ser desanexadas."
+            )
+    _acumular_particao(sender, conexao, inicio, fim, 1)
+
+
+def ao_anexar_particao(sender, conexao, inicio, fim, **kwargs):
+    """Desconta dos totais arquivados as linhas da partição de ``sender`` que voltou."""
+
+    _acumular_particao(sender, conexao, inicio, fim, -1)
@@ -0,0 +1,124 @@
+"""Benchmark do ``dashboard_overview`` em escalas crescentes de recebíveis.
+
+Para cada escala a base é completada com dados sintéticos até o número de
+recebíveis pedido e a view é medida com o cache frio (todas as versões
+invalidadas) e quente. São registrados tempo, número de consultas e o pico de
+memória alocada pelo Python durante a requisição (``tracemalloc``). Por padrão
+tudo roda numa transação desfeita ao final, sem deixar dados na base.
+"""
+
+import statistics
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from carteira.models import Recebivel
+from comercial.models import Venda
+
+from . import cache, secoes, sinteticos
+from .snapshots import atualizar_snapshots, snapshot_do_dia
+from .views import dashboard_overview
+
+ESCALAS = (10_000, 100_000, 1_000_000)
+
+
+def _requisicao():
+    requisicao = RequestFactory().get(reverse("dashboards:overview"))
+    # Usuário não persistido: basta estar autenticado para o login_required.
+    requisicao.user = get_user_model()(username="benchmark")
+    return requisicao
+
+
+def _invalidar():
+    cache.invalidar(*secoes.todas_dependencias(), dados_alterados=False)
+
+
+def medir():
+    """Tempo e número de consultas de uma chamada à view."""
+
+    with CaptureQueriesContext(connection) as consultas:
+        inicio = time.perf_counter()
+        resposta = dashboard_overview(_requisicao())
+        duracao = time.perf_counter() - inicio
+    return {
+        "status": resposta.status_code,
+        "segundos": round(duracao, 4),
+        "consultas": len(consultas),
+    }
+
+
+def medir_memoria():
+    """Pico de memória (KiB) alocada pelo Python durante uma chamada à view.
+
+    Medido numa chamada separada, já que o ``tracemalloc`` deixa a execução
+    visivelmente mais lenta.
+    """
+
+    tracemalloc.start()
+    try:
+        dashboard_overview(_requisicao())
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(pico / 1024, 1)
+
+
+def medir_escala(recebiveis, repeticoes=3, semente=0, com_snapshot=False):
+    faltantes = recebiveis - Recebivel.objects.count()
+    inicio = time.perf_counter()
+    if faltantes > 0:
+        sinteticos.gerar(faltantes, semente=semente)
+    if com_snapshot:
+        atualizar_snapshots(completo=True)
+    geracao = time.perf_counter() - inicio
+
+    _invalidar()
+    frio = medir()
+    _invalidar()
+    pico_memoria = medir_memoria()
+    quentes = [medir() for _ in range(repeticoes)]
+    tempos = [medicao["segundos"] for medicao in quentes]
+    return {
+        "recebiveis": Recebivel.objects.count(),
+        "vendas": Venda.objects.count(),
+        "snapshot": snapshot_do_dia() is not None,
+        "preparo_segundos": round(geracao, 2),
+        "frio": frio,
+        "quente": {
+            "segundos_mediana": round(statistics.median(tempos), 4),
+            "segundos_min": min(tempos),
+            "consultas": quentes[-1]["consultas"],
+        },
+        "pico_memoria_kib": pico_memoria,
+    }
+
+
+def executar(escalas=ESCALAS, repeticoes=3, semente=0, com_snapshot=False, manter=False):
+    """Mede cada escala (em ordem crescente) e retorna o relatório em dicionário."""
+
+    resultados = []
+    try:
+        with transaction.atomic():
+            for escala in sorted(escalas):
+                resultados.append(
+                    medir_escala(
+                        escala, repeticoes=repeticoes, semente=semente, com_snapshot=com_snapshot
+                    )
+                )
+            if not manter:
+                transaction.set_rollback(True)
+    finally:
+        # O cache pode guardar seções calculadas sobre dados que foram desfeitos.
+        _invalidar()
+    return {
+        "executado_em": timezone.now().isoformat(),
+        "banco": connection.vendor,
+        "repeticoes": repeticoes,
+        "escalas": resultados,
+    }
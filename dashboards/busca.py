@@ -0,0 +1,227 @@
+"""Busca global por clientes, corretores, empreendimentos e fornecedores.
+
+No PostgreSQL a busca usa os índices GIN de trigramas (``pg_trgm``) criados
+pelas migrações de ``comercial`` e ``compras``: cada entidade é filtrada por
+trecho (``ILIKE``) ou por semelhança de palavras (``%>``) e ordenada por
+``word_similarity``, tudo numa única consulta ``UNION ALL``.
+
+Nos demais bancos (SQLite em desenvolvimento) os nomes são copiados para uma
+tabela virtual FTS5, mantida pelos sinais de gravação e exclusão e pelo sinal
+de importação em lote, e ordenados por ``bm25``. O ``rowid`` de cada linha
+codifica a entidade e o ID (``id * FATOR_ROWID + codigo``), o que permite
+atualizar e excluir sem varrer o índice.
+"""
+
+import re
+from dataclasses import dataclass
+
+from django.db import connection
+from django.db.models import BooleanField, F, FloatField, Func, Q, Value
+from django.db.models.functions import Upper
+from django.urls import reverse
+
+from comercial.models import Corretor, Empreendimento, Venda
+from compras.models import Fornecedor, PedidoCompra
+
+TABELA_FTS = "dashboards_busca"
+FATOR_ROWID = 8
+LIMITE_PADRAO = 20
+# Parâmetros por comando, abaixo do limite de variáveis do SQLite.
+TAMANHO_LOTE_SQL = 500
+
+
+@dataclass(frozen=True)
+class Entidade:
+    tipo: str
+    codigo: int
+    modelo: type
+    campo: str
+    rotulo: str
+
+    def url(self, objeto_id):
+        if self.tipo == "cliente":
+            return reverse("admin:comercial_venda_change", args=[objeto_id])
+        if self.tipo == "fornecedor":
+            return f"{reverse('dashboards:detalhamento', args=['pedidos'])}?fornecedor={objeto_id}"
+        return f"{reverse('dashboards:detalhamento', args=['vendas'])}?{self.tipo}={objeto_id}"
+
+
+ENTIDADES = {
+    entidade.tipo: entidade
+    for entidade in (
+        Entidade("cliente", 1, Venda, "cliente_nome", "Cliente"),
+        Entidade("corretor", 2, Corretor, "nome", "Corretor"),
+        Entidade("empreendimento", 3, Empreendimento, "nome", "Empreendimento"),
+        Entidade("fornecedor", 4, Fornecedor, "nome", "Fornecedor"),
+    )
+}
+POR_CODIGO = {entidade.codigo: entidade for entidade in ENTIDADES.values()}
+POR_MODELO = {entidade.modelo: entidade for entidade in ENTIDADES.values()}
+
+
+def usa_fts(conexao=connection):
+    return conexao.vendor != "postgresql"
+
+
+class SemelhancaPalavras(Func):
+    """``texto %> termo``: algum trecho de ``texto`` lembra ``termo`` (usa o índice GIN)."""
+
+    arg_joiner = " %%> "
+    template = "(%(expressions)s)"
+    output_field = BooleanField()
+
+
+class SimilaridadePalavras(Func):
+    function = "word_similarity"
+    output_field = FloatField()
+
+
+def _buscar_postgresql(termo, limite):
+    termo_upper = Upper(Value(termo))
+    partes = []
+    for entidade in ENTIDADES.values():
+        texto = Upper(F(entidade.campo))
+        partes.append(
+            entidade.modelo.objects.filter(
+                Q(**{f"{entidade.campo}__icontains": termo})
+                | SemelhancaPalavras(texto, termo_upper)
+            )
+            .annotate(
+                codigo=Value(entidade.codigo),
+                texto=F(entidade.campo),
+                relevancia=SimilaridadePalavras(termo_upper, texto),
+            )
+            .values_list("id", "codigo", "texto", "relevancia")
+            .order_by("-relevancia")[:limite]
+        )
+    primeira, *demais = partes
+    return primeira.union(*demais, all=True).order_by("-relevancia")[:limite]
+
+
+def _expressao_fts(termo):
+    palavras = re.findall(r"\w+", termo)
+    # Cada palavra vira um prefixo entre aspas; palavras separadas equivalem a AND.
+    return " ".join(f'"{palavra}"*' for palavra in palavras)
+
+
+def _buscar_fts(termo, limite):
+    expressao = _expressao_fts(termo)
+    if not expressao:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid, texto, -bm25({TABELA_FTS}) FROM {TABELA_FTS} "
+            f"WHERE {TABELA_FTS} MATCH %s ORDER BY bm25({TABELA_FTS}) LIMIT %s",
+            [expressao, limite],
+        )
+        return [
+            (rowid // FATOR_ROWID, rowid % FATOR_ROWID, texto, relevancia)
+            for rowid, texto, relevancia in cursor.fetchall()
+        ]
+
+
+def buscar(termo, limite=LIMITE_PADRAO):
+    """Resultados das quatro entidades para ``termo``, do mais ao menos relevante."""
+
+    termo = termo.strip()
+    if not termo:
+        return []
+    linhas = _buscar_fts(termo, limite) if usa_fts() else _buscar_postgresql(termo, limite)
+    resultados = []
+    for objeto_id, codigo, texto, relevancia in linhas:
+        entidade = POR_CODIGO[codigo]
+        resultados.append(
+            {
+                "tipo": entidade.tipo,
+                "rotulo": entidade.rotulo,
+                "id": objeto_id,
+                "texto": texto,
+                "relevancia": round(float(relevancia), 4),
+                "url": entidade.url(objeto_id),
+            }
+        )
+    return resultados
+
+
+# Manutenção do índice FTS5 ------------------------------------------------------
+
+
+def criar_indice(conexao=connection):
+    if not usa_fts(conexao):
+        return
+    with conexao.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA_FTS} "
+            "USING fts5(texto, tokenize='unicode61 remove_diacritics 2')"
+        )
+
+
+def remover_indice(conexao=connection):
+    if not usa_fts(conexao):
+        return
+    with conexao.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {TABELA_FTS}")
+
+
+def _copiar(cursor, entidade, ids=None):
+    opts = entidade.modelo._meta
+    coluna = opts.get_field(entidade.campo).column
+    sql = (
+        f"INSERT INTO {TABELA_FTS} (rowid, texto) "
+        f"SELECT id * {FATOR_ROWID} + {entidade.codigo}, {coluna} FROM {opts.db_table}"
+    )
+    if ids is None:
+        cursor.execute(sql)
+    else:
+        cursor.execute(f"{sql} WHERE id IN ({', '.join(['%s'] * len(ids))})", list(ids))
+
+
+def _excluir(cursor, entidade, ids):
+    rowids = [objeto_id * FATOR_ROWID + entidade.codigo for objeto_id in ids]
+    cursor.execute(
+        f"DELETE FROM {TABELA_FTS} WHERE rowid IN ({', '.join(['%s'] * len(rowids))})",
+        rowids,
+    )
+
+
+def sincronizar(modelo, ids):
+    """Regrava no índice as linhas ``ids`` de ``modelo`` (as inexistentes saem dele)."""
+
+    entidade = POR_MODELO.get(modelo)
+    ids = list(ids)
+    if entidade is None or not usa_fts():
+        return
+    with connection.cursor() as cursor:
+        for inicio in range(0, len(ids), TAMANHO_LOTE_SQL):
+            lote = ids[inicio : inicio + TAMANHO_LOTE_SQL]
+            _excluir(cursor, entidade, lote)
+            _copiar(cursor, entidade, lote)
+
+
+def reconstruir(conexao=connection):
+    """Recria o conteúdo do índice a partir das tabelas de origem."""
+
+    if not usa_fts(conexao):
+        return
+    with conexao.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABELA_FTS}")
+        for entidade in ENTIDADES.values():
+            _copiar(cursor, entidade)
+
+
+def sincronizar_instancia(sender, instance, **kwargs):
+    """Receptor de ``post_save`` e ``post_delete`` das entidades buscáveis."""
+
+    sincronizar(sender, [instance.pk])
+
+
+def apos_importacao(sender, objetos=(), **kwargs):
+    """Indexa os registros de um lote importado e os nomes criados em lote para ele."""
+
+    if sender is Venda:
+        sincronizar(Venda, [venda.pk for venda in objetos])
+        sincronizar(Corretor, {venda.corretor_id for venda in objetos})
+        sincronizar(Empreendimento, {venda.empreendimento_id for venda in objetos})
+    elif sender is PedidoCompra:
+        sincronizar(Fornecedor, {pedido.fornecedor_id for pedido in objetos})
+        sincronizar(Empreendimento, {pedido.empreendimento_id for pedido in objetos})
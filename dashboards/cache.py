@@ -0,0 +1,181 @@
+"""Cache versionado dos fragmentos calculados do dashboard.
+
+Cada modelo de origem tem sua própria versão em cache. Uma entrada é gravada
+sob uma chave que inclui as versões de todos os modelos de que depende; os
+sinais registrados em ``dashboards.signals`` incrementam a versão do modelo
+alterado, de forma que só as entradas que leem daquele modelo deixam de ser
+encontradas. As entradas antigas expiram sozinhas no backend configurado.
+
+A cada invalidação também fica registrado o instante da última alteração de
+cada modelo (``ultima_alteracao``), que decide se o snapshot diário ainda
+reflete as tabelas de origem. Logo depois de uma alteração a réplica pode
+ainda não tê-la recebido: se a entrada nova seria calculada na réplica dentro
+de ``REPLICA_FIXACAO_SEGUNDOS`` da alteração, ela é calculada no primário,
+para não gravar sob a versão nova um valor anterior a ela.
+"""
+
+from contextlib import contextmanager
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from core import replica
+
+PREFIXO = "dashboards"
+CHAVE_ACERTOS = f"{PREFIXO}:estatisticas:acertos"
+CHAVE_FALHAS = f"{PREFIXO}:estatisticas:falhas"
+
+
+def _cache():
+    return caches[settings.DASHBOARD_CACHE_ALIAS]
+
+
+def _chave_versao(dependencia):
+    return f"{PREFIXO}:versao:{dependencia}"
+
+
+def _chave_alteracao(dependencia):
+    return f"{PREFIXO}:alteracao:{dependencia}"
+
+
+def _incrementar(chave, inicial):
+    cache = _cache()
+    try:
+        return cache.incr(chave)
+    except ValueError:
+        cache.add(chave, inicial, timeout=None)
+        return cache.incr(chave)
+
+
+def versoes(dependencias):
+    """Versões atuais de cada dependência (rótulos ``app.modelo``)."""
+
+    cache = _cache()
+    chaves = {_chave_versao(dependencia): dependencia for dependencia in dependencias}
+    encontradas = cache.get_many(chaves)
+    for chave in chaves.keys() - encontradas.keys():
+        # Começa de um valor baseado no relógio para não reaproveitar entradas
+        # gravadas antes de a chave de versão ser removida do cache.
+        cache.add(chave, time.time_ns(), timeout=None)
+        encontradas[chave] = cache.get(chave)
+    return {dependencia: encontradas[chave] for chave, dependencia in chaves.items()}
+
+
+def invalidar(*dependencias, dados_alterados=True):
+    """Incrementa a versão das dependências, descartando os fragmentos que as leem.
+
+    Com ``dados_alterados`` (o padrão), registra também o instante da
+    alteração; use ``False`` para apenas descartar o cache.
+    """
+
+    for dependencia in dependencias:
+        _incrementar(_chave_versao(dependencia), time.time_ns())
+    if dados_alterados:
+        agora = time.time()
+        _cache().set_many(
+            {_chave_alteracao(dependencia): agora for dependencia in dependencias}, timeout=None
+        )
+
+
+def registrar_base(dependencias, instante):
+    """Registra ``instante`` (epoch) como alteração das dependências ainda sem registro.
+
+    Chamado por quem acabou de ler as tabelas de origem: sem registro, nenhuma
+    alteração posterior a ``instante`` foi vista desde que o cache começou.
+    """
+
+    cache = _cache()
+    for dependencia in dependencias:
+        cache.add(_chave_alteracao(dependencia), instante, timeout=None)
+
+
+def ultima_alteracao(dependencias):
+    """Instante (epoch) da alteração mais recente entre as dependências.
+
+    Dependências sem registro, como após o cache ser esvaziado, contam como
+    alteradas agora: na dúvida, os dados derivados são tratados como velhos.
+    """
+
+    cache = _cache()
+    chaves = [_chave_alteracao(dependencia) for dependencia in dependencias]
+    encontradas = cache.get_many(chaves)
+    for chave in set(chaves) - encontradas.keys():
+        cache.add(chave, time.time(), timeout=None)
+        encontradas[chave] = cache.get(chave)
+    return max(encontradas.values(), default=0)
+
+
+@contextmanager
+def exclusivo(nome, timeout):
+    """Trava ``nome`` entre processos por até ``timeout`` segundos, sem esperar.
+
+    Produz ``True`` para quem obteve a trava, que é solta ao fim do bloco, e
+    ``False`` se outro processo já a detém.
+    """
+
+    cache = _cache()
+    trava = f"{PREFIXO}:trava:{nome}"
+    dono = cache.add(trava, True, timeout=timeout)
+    try:
+        yield dono
+    finally:
+        if dono:
+            cache.delete(trava)
+
+
+def estatisticas():
+    """Contadores de acertos e falhas do cache do dashboard."""
+
+    valores = _cache().get_many([CHAVE_ACERTOS, CHAVE_FALHAS])
+    return {
+        "acertos": valores.get(CHAVE_ACERTOS, 0),
+        "falhas": valores.get(CHAVE_FALHAS, 0),
+    }
+
+
+def obter_ou_calcular(nome, calcular, dependencias, timeout=None):
+    """Retorna ``calcular()`` em cache para as versões atuais das ``dependencias``.
+
+    Apenas um processo recalcula uma entrada ausente: os demais aguardam até
+    ``DASHBOARD_CACHE_ESPERA`` segundos pelo valor antes de calcularem por
+    conta própria.
+    """
+
+    cache = _cache()
+    timeout = settings.DASHBOARD_CACHE_TIMEOUT if timeout is None else timeout
+    versao = ".".join(str(valor) for _, valor in sorted(versoes(dependencias).items()))
+    chave = f"{PREFIXO}:{nome}:v{versao}"
+
+    valor = cache.get(chave)
+    if valor is not None:
+        _incrementar(CHAVE_ACERTOS, 0)
+        return valor
+
+    trava = f"{chave}:trava"
+    dono = cache.add(trava, True, timeout=settings.DASHBOARD_CACHE_ESPERA)
+    if not dono:
+        prazo = time.monotonic() + settings.DASHBOARD_CACHE_ESPERA
+        while time.monotonic() < prazo:
+            time.sleep(0.05)
+            valor = cache.get(chave)
+            if valor is not None:
+                _incrementar(CHAVE_ACERTOS, 0)
+                return valor
+
+    try:
+        if (
+            replica.lendo_da_replica()
+            and time.time() - ultima_alteracao(dependencias) < settings.REPLICA_FIXACAO_SEGUNDOS
+        ):
+            with replica.no_primario():
+                valor = calcular()
+        else:
+            valor = calcular()
+        cache.set(chave, valor, timeout=timeout)
+    finally:
+        # Quem esgotou a espera e calculou por conta própria não solta a trava alheia.
+        if dono:
+            cache.delete(trava)
+    _incrementar(CHAVE_FALHAS, 0)
+    return valor
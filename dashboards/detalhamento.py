@@ -0,0 +1,179 @@
+"""Listas de detalhamento (drill-down) dos KPIs com paginação por cursor.
+
+Em vez de ``OFFSET``, cada página continua a partir da última linha da
+anterior: o cursor guarda os valores da ordenação padrão do modelo
+(``-data_venda``, ``data_vencimento``, ``-data_pedido``) e o ``id`` usado como
+desempate, e a próxima página é filtrada por "depois desta linha". O custo de
+uma página não depende de quão fundo se está na lista. As colunas exibidas são
+carregadas com ``select_related`` + ``only()`` numa única consulta.
+"""
+
+from dataclasses import dataclass
+from operator import attrgetter
+
+from django.core import signing
+from django.db.models import Q
+
+from carteira.models import Recebivel
+from comercial.models import Venda
+from compras.models import PedidoCompra
+
+from .filtros import SEM_FILTROS
+
+TAMANHO_PAGINA = 50
+SALT_CURSOR = "dashboards.detalhamento"
+
+
+def _faixa(queryset, valor):
+    return queryset.em_aberto().na_faixa(valor)
+
+
+DETALHAMENTOS = {
+    "vendas": {
+        "modelo": Venda,
+        "titulo": "Vendas",
+        "filtro": "vendas",
+        "ordem": ("-data_venda", "-id"),
+        "colunas": (
+            ("id", "ID"),
+            ("data_venda", "Data da venda"),
+            ("cliente_nome", "Cliente"),
+            ("corretor.nome", "Corretor"),
+            ("empreendimento.nome", "Empreendimento"),
+            ("unidades_vendidas", "Unidades"),
+            ("valor_contrato", "Valor do contrato"),
+            ("status", "Status"),
+        ),
+        "criterios": {"status": lambda queryset, valor: queryset.filter(status=valor)},
+    },
+    "recebiveis": {
+        "modelo": Recebivel,
+        "titulo": "Recebíveis",
+        "filtro": "recebiveis",
+        "ordem": ("data_vencimento", "id"),
+        "colunas": (
+            ("id", "ID"),
+            ("venda_id", "Venda"),
+            ("venda.cliente_nome", "Cliente"),
+            ("venda.corretor.nome", "Corretor"),
+            ("data_vencimento", "Vencimento"),
+            ("valor", "Valor"),
+            ("valor_pago", "Valor pago"),
+            ("status", "Status"),
+        ),
+        "criterios": {
+            "faixa": _faixa,
+            "status": lambda queryset, valor: queryset.filter(status=valor),
+        },
+    },
+    "pedidos": {
+        "modelo": PedidoCompra,
+        "titulo": "Pedidos de compra",
+        "filtro": "pedidos",
+        "ordem": ("-data_pedido", "-id"),
+        "colunas": (
+            ("id", "ID"),
+            ("data_pedido", "Data do pedido"),
+            ("empreendimento.nome", "Empreendimento"),
+            ("fornecedor.nome", "Fornecedor"),
+            ("categoria", "Categoria"),
+            ("valor_total", "Valor total"),
+        ),
+        "criterios": {
+            "fornecedor": lambda queryset, valor: queryset.filter(fornecedor_id=valor),
+        },
+    },
+}
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+@dataclass
+class Pagina:
+    linhas: list
+    proximo_cursor: str | None
+
+
+def codificar_cursor(valores):
+    return signing.dumps([str(valor) for valor in valores], salt=SALT_CURSOR, compress=True)
+
+
+def decodificar_cursor(cursor):
+    try:
+        return signing.loads(cursor, salt=SALT_CURSOR)
+    except signing.BadSignature as exc:
+        raise CursorInvalido("Cursor de paginação inválido.") from exc
+
+
+def apos(ordem, valores):
+    """Condição "depois da linha com ``valores``" na ``ordem`` informada.
+
+    Para ``("-data_venda", "-id")`` gera
+    ``data_venda < d OR (data_venda = d AND id < i)``.
+    """
+
+    condicao = Q()
+    iguais = {}
+    for campo, valor in zip(ordem, valores):
+        nome = campo.lstrip("-")
+        operador = "lt" if campo.startswith("-") else "gt"
+        condicao |= Q(**iguais, **{f"{nome}__{operador}": valor})
+        iguais[nome] = valor
+    return condicao
+
+
+def consulta(nome, filtros=SEM_FILTROS, criterios=None):
+    """Queryset ordenado de ``nome`` com os filtros do dashboard e os critérios extras."""
+
+    detalhamento = DETALHAMENTOS[nome]
+    queryset = getattr(filtros, detalhamento["filtro"])(detalhamento["modelo"].objects)
+    for chave, valor in (criterios or {}).items():
+        if valor not in (None, ""):
+            queryset = detalhamento["criterios"][chave](queryset, valor)
+
+    atributos = [atributo for atributo, _ in detalhamento["colunas"]]
+    relacionados = {
+        atributo.rsplit(".", 1)[0].replace(".", "__") for atributo in atributos if "." in atributo
+    }
+    campos = {atributo.replace(".", "__") for atributo in atributos}
+    campos.update(campo.lstrip("-") for campo in detalhamento["ordem"])
+    return (
+        queryset.select_related(*sorted(relacionados))
+        .only(*sorted(campos))
+        .order_by(*detalhamento["ordem"])
+    )
+
+
+def _valor(objeto, atributo):
+    alvo, _, campo = atributo.rpartition(".")
+    alvo = attrgetter(alvo)(objeto) if alvo else objeto
+    exibicao = getattr(alvo, f"get_{campo}_display", None)
+    return exibicao() if exibicao else getattr(alvo, campo)
+
+
+def pagina(nome, filtros=SEM_FILTROS, criterios=None, cursor=None, tamanho=TAMANHO_PAGINA):
+    """Uma página de ``nome`` a partir de ``cursor`` (uma consulta).
+
+    Busca uma linha a mais que ``tamanho`` para saber se há próxima página.
+    """
+
+    detalhamento = DETALHAMENTOS[nome]
+    ordem = detalhamento["ordem"]
+    queryset = consulta(nome, filtros, criterios)
+    if cursor:
+        queryset = queryset.filter(apos(ordem, decodificar_cursor(cursor)))
+
+    objetos = list(queryset[: tamanho + 1])
+    proximo = None
+    if len(objetos) > tamanho:
+        objetos = objetos[:tamanho]
+        ultimo = objetos[-1]
+        proximo = codificar_cursor(getattr(ultimo, campo.lstrip("-")) for campo in ordem)
+
+    colunas = [atributo for atributo, _ in detalhamento["colunas"]]
+    return Pagina(
+        linhas=[[_valor(objeto, atributo) for atributo in colunas] for objeto in objetos],
+        proximo_cursor=proximo,
+    )
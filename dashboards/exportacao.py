@@ -0,0 +1,85 @@
+"""Exportação em CSV das tabelas de vendas, recebíveis e pedidos de compra.
+
+As linhas são lidas com ``values_list`` (os nomes relacionados entram por JOIN
+na mesma consulta) e percorridas com ``iterator(chunk_size=...)``, de modo que
+a memória usada não depende do tamanho da tabela.
+"""
+
+import csv
+
+from carteira.models import Recebivel
+from comercial.models import Venda
+from compras.models import PedidoCompra
+
+from .filtros import SEM_FILTROS
+
+CHUNK_SIZE = 2000
+
+EXPORTACOES = {
+    "vendas": {
+        "modelo": Venda,
+        "filtro": "vendas",
+        "colunas": (
+            ("id", "ID"),
+            ("data_venda", "Data da venda"),
+            ("cliente_nome", "Cliente"),
+            ("corretor__nome", "Corretor"),
+            ("empreendimento__nome", "Empreendimento"),
+            ("unidades_vendidas", "Unidades"),
+            ("valor_contrato", "Valor do contrato"),
+            ("status", "Status"),
+        ),
+    },
+    "recebiveis": {
+        "modelo": Recebivel,
+        "filtro": "recebiveis",
+        "colunas": (
+            ("id", "ID"),
+            ("venda_id", "Venda"),
+            ("venda__cliente_nome", "Cliente"),
+            ("venda__corretor__nome", "Corretor"),
+            ("venda__empreendimento__nome", "Empreendimento"),
+            ("data_vencimento", "Vencimento"),
+            ("valor", "Valor"),
+            ("data_pagamento", "Data do pagamento"),
+            ("valor_pago", "Valor pago"),
+            ("status", "Status"),
+        ),
+    },
+    "pedidos": {
+        "modelo": PedidoCompra,
+        "filtro": "pedidos",
+        "colunas": (
+            ("id", "ID"),
+            ("data_pedido", "Data do pedido"),
+            ("empreendimento__nome", "Empreendimento"),
+            ("fornecedor__nome", "Fornecedor"),
+            ("categoria", "Categoria"),
+            ("valor_total", "Valor total"),
+        ),
+    },
+}
+
+
+class _Eco:
+    """Pseudo-arquivo que devolve a linha escrita em vez de armazená-la."""
+
+    def write(self, valor):
+        return valor
+
+
+def linhas_csv(nome, filtros=SEM_FILTROS, chunk_size=CHUNK_SIZE, using=None):
+    """Gera as linhas CSV (cabeçalho incluído) da exportação ``nome``.
+
+    ``using`` fixa o banco lido; as linhas são geradas depois que a view
+    retorna, fora de qualquer ``em_replica()``.
+    """
+
+    exportacao = EXPORTACOES[nome]
+    campos = [campo for campo, _ in exportacao["colunas"]]
+    queryset = getattr(filtros, exportacao["filtro"])(exportacao["modelo"].objects.using(using))
+
+    escritor = csv.writer(_Eco(), delimiter=";")
+    yield escritor.writerow([titulo for _, titulo in exportacao["colunas"]])
+    for linha in queryset.order_by("pk").values_list(*campos).iterator(chunk_size=chunk_size):
+        yield escritor.writerow(linha)
@@ -0,0 +1,98 @@
+"""Filtros de período, empreendimento e corretor aplicados aos KPIs.
+
+Cada método recebe um queryset do modelo correspondente e aplica as
+condições sobre as colunas cobertas pelos índices compostos dos modelos:
+``Venda(data_venda, empreendimento)``, ``Recebivel(status, data_vencimento)`` e
+``PedidoCompra(empreendimento, data_pedido)``. O filtro de corretor não se
+aplica a compras e planejamento, que não se relacionam com corretores.
+"""
+
+from dataclasses import astuple, dataclass
+from datetime import date
+
+
+@dataclass(frozen=True)
+class Filtros:
+    data_inicio: date | None = None
+    data_fim: date | None = None
+    empreendimento_id: int | None = None
+    corretor_id: int | None = None
+
+    @property
+    def vazio(self) -> bool:
+        return self == Filtros()
+
+    @property
+    def sem_periodo(self) -> bool:
+        return self.data_inicio is None and self.data_fim is None
+
+    def chave(self) -> str:
+        """Identificador estável usado nas chaves de cache."""
+
+        return ":".join("-" if valor is None else str(valor) for valor in astuple(self))
+
+    def _periodo(self, campo):
+        condicoes = {}
+        if self.data_inicio:
+            condicoes[f"{campo}__gte"] = self.data_inicio
+        if self.data_fim:
+            condicoes[f"{campo}__lte"] = self.data_fim
+        return condicoes
+
+    def vendas(self, queryset):
+        condicoes = self._periodo("data_venda")
+        if self.empreendimento_id:
+            condicoes["empreendimento_id"] = self.empreendimento_id
+        if self.corretor_id:
+            condicoes["corretor_id"] = self.corretor_id
+        return queryset.filter(**condicoes)
+
+    def recebiveis(self, queryset):
+        condicoes = self._periodo("data_vencimento")
+        if self.empreendimento_id:
+            condicoes["venda__empreendimento_id"] = self.empreendimento_id
+        if self.corretor_id:
+            condicoes["venda__corretor_id"] = self.corretor_id
+        return queryset.filter(**condicoes)
+
+    def pedidos(self, queryset):
+        condicoes = self._periodo("data_pedido")
+        if self.empreendimento_id:
+            condicoes["empreendimento_id"] = self.empreendimento_id
+        return queryset.filter(**condicoes)
+
+    def tarefas(self, queryset):
+        condicoes = self._periodo("data_inicio_prevista")
+        if self.empreendimento_id:
+            condicoes["empreendimento_id"] = self.empreendimento_id
+        return queryset.filter(**condicoes)
+
+    def totais(self, queryset):
+        """Filtra ``TotalCorrente``, que não guarda datas e só atende filtros sem período."""
+
+        if not self.sem_periodo:
+            raise ValueError("Totais correntes não podem ser filtrados por período.")
+        condicoes = {}
+        if self.empreendimento_id:
+            condicoes["empreendimento_id"] = self.empreendimento_id
+        if self.corretor_id:
+            condicoes["corretor_id"] = self.corretor_id
+        return queryset.filter(**condicoes)
+
+    def arquivados(self, queryset):
+        """Filtra ``TotalArquivado``, cuja ``data`` segue o período de vendas e parcelas."""
+
+        condicoes = self._periodo("data")
+        if self.empreendimento_id:
+            condicoes["empreendimento_id"] = self.empreendimento_id
+        if self.corretor_id:
+            condicoes["corretor_id"] = self.corretor_id
+        return queryset.filter(**condicoes)
+
+    def empreendimentos(self, queryset):
+        if self.empreendimento_id:
+            return queryset.filter(pk=self.empreendimento_id)
+        return queryset
+
+
+SEM_FILTROS = Filtros()
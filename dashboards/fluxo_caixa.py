@@ -0,0 +1,146 @@
+"""Projeção de entradas de caixa a partir das parcelas a vencer.
+
+O saldo em aberto (``valor - valor_pago``) das parcelas não pagas que vencem
+nos próximos meses é somado no banco por período e por corretor. Sobre cada
+soma aplica-se o desconto (haircut) da taxa histórica de inadimplência do
+corretor: a fração do valor já vencido das suas parcelas que segue em aberto.
+Corretores sem histórico recebem a taxa geral; as parcelas pagas arquivadas
+contam no valor vencido pelos totais de ``TotalArquivado``. São três
+consultas, qualquer que seja o número de parcelas ou de granularidades
+(``projetar_em``); o Python só combina as linhas agregadas.
+"""
+
+from dataclasses import replace
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from carteira.models import Recebivel
+
+from . import series
+from .filtros import SEM_FILTROS
+from .kpis import SALDO_EXPRESSION, ZERO
+from .models import TotalArquivado
+
+HORIZONTE_MESES = 24
+CENTAVO = Decimal("0.01")
+
+
+def fim_do_horizonte(hoje, meses=HORIZONTE_MESES):
+    """Último dia do ``meses``-ésimo mês, contando o mês de ``hoje`` como o primeiro."""
+
+    mes = hoje.month - 1 + meses
+    return date(hoje.year + mes // 12, mes % 12 + 1, 1) - timedelta(days=1)
+
+
+def taxas_inadimplencia(recebiveis, hoje, arquivados=None):
+    """Taxas (0 a 1) por ID de corretor e a taxa geral, sobre as parcelas já vencidas.
+
+    ``arquivados`` (linhas de ``TotalArquivado``) soma ao valor vencido as
+    parcelas pagas que já foram para o arquivo.
+    """
+
+    vencidas = Q(data_vencimento__lt=hoje)
+    vencido, inadimplente = {}, {}
+    for linha in recebiveis.order_by().values("venda__corretor_id").annotate(
+        vencido=Coalesce(Sum("valor", filter=vencidas), ZERO),
+        inadimplente=Coalesce(
+            Sum(SALDO_EXPRESSION, filter=vencidas & ~Q(status=Recebivel.Status.PAGO)), ZERO
+        ),
+    ):
+        vencido[linha["venda__corretor_id"]] = linha["vencido"]
+        inadimplente[linha["venda__corretor_id"]] = linha["inadimplente"]
+    if arquivados is not None:
+        for linha in (
+            arquivados.filter(data__lt=hoje, total_parcelas__gt=0)
+            .order_by()
+            .values("corretor_id")
+            .annotate(vencido=Sum("total_carteira"))
+        ):
+            corretor_id = linha["corretor_id"]
+            vencido[corretor_id] = vencido.get(corretor_id, ZERO) + linha["vencido"]
+
+    taxas = {
+        corretor_id: inadimplente.get(corretor_id, ZERO) / valor
+        for corretor_id, valor in vencido.items()
+        if valor
+    }
+    total_vencido = sum(vencido.values(), ZERO)
+    total_inadimplente = sum(inadimplente.values(), ZERO)
+    taxa_geral = total_inadimplente / total_vencido if total_vencido else ZERO
+    return taxas, taxa_geral
+
+
+def projetar(granularidade="mes", filtros=SEM_FILTROS, meses=HORIZONTE_MESES, hoje=None):
+    """Entradas previstas por período nos próximos ``meses`` meses.
+
+    Usa os filtros de empreendimento e corretor; o período do dashboard não se
+    aplica, pois o horizonte da projeção é sempre a partir de hoje. Cada
+    período traz o saldo a vencer (``bruto``), o valor esperado após os
+    descontos por inadimplência (``esperado``) e a diferença (``desconto``).
+    """
+
+    return projetar_em((granularidade,), filtros, meses, hoje)[granularidade]
+
+
+def projetar_em(granularidades, filtros=SEM_FILTROS, meses=HORIZONTE_MESES, hoje=None):
+    """``projetar`` em cada uma das ``granularidades``, com as mesmas três consultas.
+
+    O saldo a vencer é agrupado de uma vez pelos períodos de todas elas.
+    Retorna ``{granularidade: projeção}``.
+    """
+
+    periodos = {nome: series.periodo_de(nome) for nome in granularidades}
+    hoje = hoje or timezone.localdate()
+    fim = fim_do_horizonte(hoje, meses)
+    filtros = replace(filtros, data_inicio=None, data_fim=None)
+    recebiveis = filtros.recebiveis(Recebivel.objects)
+    taxas, taxa_geral = taxas_inadimplencia(
+        recebiveis, hoje, filtros.arquivados(TotalArquivado.objects)
+    )
+
+    a_vencer = recebiveis.em_aberto().filter(data_vencimento__gte=hoje, data_vencimento__lte=fim)
+    chaves = {}
+    for nome, periodo in periodos.items():
+        chaves.update(series.chaves_periodo(periodo, "data_vencimento", prefixo=nome))
+    agrupado = a_vencer.annotate(**chaves).order_by().values(*chaves, "venda__corretor_id")
+    bruto = {nome: {} for nome in periodos}
+    esperado = {nome: {} for nome in periodos}
+    for linha in agrupado.annotate(saldo=Coalesce(Sum(SALDO_EXPRESSION), ZERO)):
+        taxa = taxas.get(linha["venda__corretor_id"], taxa_geral)
+        for nome, periodo in periodos.items():
+            inicio = series.inicio_periodo(linha, periodo, prefixo=nome)
+            bruto[nome][inicio] = bruto[nome].get(inicio, ZERO) + linha["saldo"]
+            esperado[nome][inicio] = (
+                esperado[nome].get(inicio, ZERO) + linha["saldo"] * (1 - taxa)
+            )
+
+    return {
+        nome: _projecao(periodo, hoje, fim, bruto[nome], esperado[nome], taxa_geral)
+        for nome, periodo in periodos.items()
+    }
+
+
+def _projecao(periodo, hoje, fim, bruto, esperado, taxa_geral):
+    resultado = []
+    for inicio in series.periodos(periodo, hoje, fim):
+        valor_bruto = bruto.get(inicio, ZERO)
+        valor_esperado = esperado.get(inicio, ZERO).quantize(CENTAVO)
+        resultado.append(
+            {
+                "label": periodo.rotulo(inicio),
+                "inicio": inicio,
+                "bruto": valor_bruto,
+                "esperado": valor_esperado,
+                "desconto": valor_bruto - valor_esperado,
+            }
+        )
+    return {
+        "periodos": resultado,
+        "total_bruto": sum((item["bruto"] for item in resultado), ZERO),
+        "total_esperado": sum((item["esperado"] for item in resultado), ZERO),
+        "taxa_inadimplencia_geral": taxa_geral * 100,
+    }
@@ -0,0 +1,50 @@
+from django import forms
+
+from comercial.models import Corretor, Empreendimento
+
+from .filtros import Filtros
+
+
+class FiltroDashboardForm(forms.Form):
+    data_inicio = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={"type": "date", "class": "form-control"}),
+    )
+    data_fim = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={"type": "date", "class": "form-control"}),
+    )
+    empreendimento = forms.ModelChoiceField(
+        queryset=Empreendimento.objects.only("id", "nome"),
+        required=False,
+        empty_label="Todos",
+        widget=forms.Select(attrs={"class": "form-select"}),
+    )
+    corretor = forms.ModelChoiceField(
+        queryset=Corretor.objects.only("id", "nome"),
+        required=False,
+        empty_label="Todos",
+        widget=forms.Select(attrs={"class": "form-select"}),
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        data_inicio = cleaned_data.get("data_inicio")
+        data_fim = cleaned_data.get("data_fim")
+        if data_inicio and data_fim and data_inicio > data_fim:
+            raise forms.ValidationError("A data inicial deve ser anterior à data final.")
+        return cleaned_data
+
+    def filtros(self) -> Filtros:
+        """Filtros válidos informados; retorna filtros vazios se o formulário for inválido."""
+
+        if not self.is_valid():
+            return Filtros()
+        empreendimento = self.cleaned_data["empreendimento"]
+        corretor = self.cleaned_data["corretor"]
+        return Filtros(
+            data_inicio=self.cleaned_data["data_inicio"],
+            data_fim=self.cleaned_data["data_fim"],
+            empreendimento_id=empreendimento.pk if empreendimento else None,
+            corretor_id=corretor.pk if corretor else None,
+        )
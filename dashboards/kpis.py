@@ -0,0 +1,522 @@
+"""Motor de cálculo dos KPIs do dashboard executivo.
+
+Cada área (Comercial, Carteira, Compras e Planejamento) possui uma função que
+lê os detalhamentos agrupados com uma consulta cada e soma os totais gerais a
+partir dos grupos, de modo que o número de consultas não cresce com o volume
+de registros nem com o número de corretores e empreendimentos. As séries de
+vendas do dashboard (``evolucao_vendas``) são agregadas no banco: os
+comparativos agrupam as três granularidades juntas e as tendências usam
+funções de janela. Sem filtro de período, os totais e rankings de vendas e
+carteira são lidos de ``TotalCorrente`` (ver ``dashboards.totais``) em vez das
+tabelas de transações. Com período, vendas e parcelas arquivadas entram pelos
+totais diários de ``TotalArquivado`` (ver ``dashboards.arquivamento``).
+"""
+
+from dataclasses import replace
+from decimal import Decimal
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import (
+    Count,
+    DecimalField,
+    ExpressionWrapper,
+    F,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from carteira.models import Recebivel
+from comercial.models import Empreendimento, Venda
+from compras.models import PedidoCompra
+from planejamento.models import TarefaPlanejada
+
+from . import series
+from .filtros import SEM_FILTROS
+from .models import TotalArquivado, TotalCorrente
+
+ZERO = Decimal("0")
+
+SALDO_EXPRESSION = ExpressionWrapper(
+    F("valor") - F("valor_pago"), output_field=DecimalField(max_digits=12, decimal_places=2)
+)
+
+
+# Séries temporais disponíveis: modelo, método de ``Filtros``, campo de data e
+# valores somados (nome -> (campo, valor nos períodos vazios)).
+SERIES = {
+    "vendas": (
+        Venda,
+        "vendas",
+        "data_venda",
+        {"valor": ("valor_contrato", ZERO), "unidades": ("unidades_vendidas", 0)},
+    ),
+    "recebiveis": (
+        Recebivel,
+        "recebiveis",
+        "data_vencimento",
+        {"valor": ("valor", ZERO), "valor_pago": ("valor_pago", ZERO)},
+    ),
+    "pedidos": (PedidoCompra, "pedidos", "data_pedido", {"valor": ("valor_total", ZERO)}),
+}
+
+# Colunas de ``TotalArquivado`` somadas às séries: contagem que indica linhas
+# da série e valores (nome -> coluna).
+SERIES_ARQUIVADAS = {
+    "vendas": ("total_contratos", {"valor": "valor_vendas", "unidades": "unidades_vendidas"}),
+    "recebiveis": ("total_parcelas", {"valor": "total_carteira", "valor_pago": "valor_recebido"}),
+}
+
+COMPARATIVOS = {"mensal": "mes", "bimestral": "bimestre", "semestral": "semestre"}
+
+
+def series_temporais(nome, granularidades, filtros=SEM_FILTROS):
+    """Série ``nome`` (ver ``SERIES``) em cada uma das ``granularidades``, agregada no banco.
+
+    Uma consulta na tabela e outra nos totais arquivados, se houver, qualquer
+    que seja o número de granularidades. Retorna ``{granularidade: série}``.
+    """
+
+    modelo, metodo, campo, valores = SERIES[nome]
+    adicionais = []
+    if nome in SERIES_ARQUIVADAS:
+        contagem, colunas = SERIES_ARQUIVADAS[nome]
+        arquivados = filtros.arquivados(TotalArquivado.objects).filter(**{f"{contagem}__gt": 0})
+        adicionais.append(
+            (arquivados, "data", {saida: Sum(coluna) for saida, coluna in colunas.items()})
+        )
+    return series.series_em(
+        granularidades,
+        getattr(filtros, metodo)(modelo.objects),
+        campo,
+        {saida: Coalesce(Sum(origem), zero) for saida, (origem, zero) in valores.items()},
+        {saida: zero for saida, (_, zero) in valores.items()},
+        inicio=filtros.data_inicio,
+        fim=filtros.data_fim,
+        adicionais=adicionais,
+    )
+
+
+def serie_temporal(nome, granularidade, filtros=SEM_FILTROS):
+    """Série ``nome`` (ver ``SERIES``) agregada por ``granularidade`` no banco."""
+
+    return series_temporais(nome, (granularidade,), filtros)[granularidade]
+
+
+def comparativos_vendas(filtros=SEM_FILTROS):
+    """Séries de vendas mensal, bimestral e semestral, agrupadas juntas no banco."""
+
+    por_granularidade = series_temporais("vendas", COMPARATIVOS.values(), filtros)
+    return {
+        periodo: por_granularidade[granularidade]
+        for periodo, granularidade in COMPARATIVOS.items()
+    }
+
+
+def tendencias_vendas(filtros=SEM_FILTROS):
+    """Vendas mensais com variação anual, somas móveis de 3/6/12 meses e acumulado no ano.
+
+    Calculado numa única consulta com funções de janela sobre as vendas e os
+    totais arquivados. Com data inicial, a consulta começa 12 meses antes do
+    mês inicial para que as janelas dos primeiros meses fiquem completas; o
+    resultado considera meses inteiros.
+    """
+
+    inicio = filtros.data_inicio
+    if inicio is not None:
+        inicio = inicio.replace(day=1)
+        filtros = replace(filtros, data_inicio=inicio.replace(year=inicio.year - 1))
+    return series.indicadores_mensais(
+        [
+            (filtros.vendas(Venda.objects), "data_venda", "valor_contrato"),
+            (
+                filtros.arquivados(TotalArquivado.objects).filter(total_contratos__gt=0),
+                "data",
+                "valor_vendas",
+            ),
+        ],
+        a_partir_de=inicio,
+    )
+
+
+def evolucao_vendas(filtros=SEM_FILTROS):
+    """Comparativos (``comparativos_vendas``) e tendências (``tendencias_vendas``) das vendas."""
+
+    return {
+        "comparativos": comparativos_vendas(filtros),
+        "tendencias": tendencias_vendas(filtros),
+    }
+
+
+def _somar_colunas(linhas, **zeros):
+    """Totais das colunas ``zeros`` (nome -> valor inicial) somadas sobre ``linhas``."""
+
+    return {
+        campo: sum((linha[campo] for linha in linhas), zero) for campo, zero in zeros.items()
+    }
+
+
+def _somar_por_chave(linhas, adicionais, chave, ordem, decrescente=True):
+    """Soma às ``linhas`` (dicionários) as ``adicionais`` com os mesmos valores de ``chave``.
+
+    Linhas só presentes em ``adicionais`` são incluídas; o resultado é
+    reordenado por ``ordem``; sem adicionais, a ordem de ``linhas`` é mantida.
+    """
+
+    adicionais = list(adicionais)
+    if not adicionais:
+        return [dict(linha) for linha in linhas]
+    por_chave = {tuple(linha[campo] for campo in chave): dict(linha) for linha in linhas}
+    for linha in adicionais:
+        identificador = tuple(linha[campo] for campo in chave)
+        atual = por_chave.get(identificador)
+        if atual is None:
+            por_chave[identificador] = dict(linha)
+            continue
+        for campo, valor in linha.items():
+            if campo not in chave:
+                atual[campo] += valor
+    return sorted(por_chave.values(), key=lambda linha: linha[ordem], reverse=decrescente)
+
+
+def comercial_kpis(filtros=SEM_FILTROS):
+    """Indicadores de desempenho comercial."""
+
+    if filtros.sem_periodo:
+        # Totais mantidos pelos sinais de Venda: somam poucas linhas em vez de
+        # varrer a tabela de vendas.
+        vendas_por_corretor = list(
+            filtros.totais(TotalCorrente.objects)
+            .filter(total_contratos__gt=0)
+            .values(
+                "corretor__nome",
+                "empreendimento__nome",
+                total_valor=F("valor_vendas"),
+                total_unidades=F("unidades_vendidas"),
+                contratos=F("total_contratos"),
+            )
+            .order_by("-valor_vendas")
+        )
+    else:
+        # Vendas canceladas já arquivadas entram pelos totais diários do arquivo.
+        vendas_por_corretor = _somar_por_chave(
+            filtros.vendas(Venda.objects)
+            .values("corretor__nome", "empreendimento__nome")
+            .annotate(
+                total_valor=Coalesce(Sum("valor_contrato"), ZERO),
+                total_unidades=Coalesce(Sum("unidades_vendidas"), 0),
+                contratos=Count("id"),
+            )
+            .order_by("-total_valor"),
+            filtros.arquivados(TotalArquivado.objects)
+            .filter(total_contratos__gt=0)
+            .values("corretor__nome", "empreendimento__nome")
+            .annotate(
+                total_valor=Sum("valor_vendas"),
+                total_unidades=Sum("unidades_vendidas"),
+                contratos=Sum("total_contratos"),
+            ),
+            ("corretor__nome", "empreendimento__nome"),
+            "total_valor",
+        )
+    # Todo contrato tem corretor e empreendimento: os totais são a soma dos grupos.
+    vendas_stats = _somar_colunas(
+        vendas_por_corretor, total_valor=ZERO, total_unidades=0, contratos=0
+    )
+    for linha in vendas_por_corretor:
+        del linha["contratos"]
+
+    total_vendas = vendas_stats["total_valor"]
+    total_unidades = vendas_stats["total_unidades"]
+    total_contratos = vendas_stats["contratos"]
+    ticket_medio_por_unidade = (total_vendas / total_unidades) if total_unidades else ZERO
+
+    return {
+        "valor_total_vendas": total_vendas,
+        "total_unidades": total_unidades,
+        "ticket_medio_venda": (total_vendas / total_contratos) if total_contratos else ZERO,
+        "ticket_medio_por_unidade": ticket_medio_por_unidade,
+        "vendas_por_corretor": vendas_por_corretor,
+        **evolucao_vendas(filtros),
+    }
+
+
+def inadimplencia_por_corretor(linhas):
+    """Formata tuplas ``(corretor, total_carteira, valor_inadimplente)``."""
+
+    resultado = []
+    for nome, total_carteira, valor_inadimplente in linhas:
+        taxa = (valor_inadimplente / total_carteira * 100) if total_carteira else ZERO
+        resultado.append(
+            {
+                "corretor": nome or "Não informado",
+                "total_carteira": total_carteira,
+                "valor_inadimplente": valor_inadimplente,
+                "taxa": taxa,
+            }
+        )
+    return resultado
+
+
+def carteira_kpis(filtros=SEM_FILTROS):
+    """Indicadores de saúde financeira da carteira de recebíveis."""
+
+    em_aberto = ~Q(status=Recebivel.Status.PAGO)
+    recebiveis = filtros.recebiveis(Recebivel.objects)
+    if filtros.sem_periodo:
+        carteira_por_corretor = list(
+            filtros.totais(TotalCorrente.objects)
+            .filter(total_parcelas__gt=0)
+            .values(nome=F("corretor__nome"))
+            .annotate(
+                total=Sum("total_carteira"),
+                total_pago=Sum("valor_recebido"),
+                inadimplente=Sum("valor_inadimplente"),
+            )
+            .order_by("nome")
+        )
+    else:
+        # Parcelas pagas já arquivadas: entram no total e no recebido, sem saldo.
+        carteira_por_corretor = _somar_por_chave(
+            recebiveis.values(nome=F("venda__corretor__nome"))
+            .annotate(
+                total=Coalesce(Sum("valor"), ZERO),
+                total_pago=Coalesce(Sum("valor_pago"), ZERO),
+                inadimplente=Coalesce(Sum(SALDO_EXPRESSION, filter=em_aberto), ZERO),
+            )
+            .order_by("nome"),
+            filtros.arquivados(TotalArquivado.objects)
+            .filter(total_parcelas__gt=0)
+            .values(nome=F("corretor__nome"))
+            .annotate(
+                total=Sum("total_carteira"),
+                total_pago=Sum("valor_recebido"),
+                inadimplente=Value(ZERO),
+            ),
+            ("nome",),
+            "nome",
+            decrescente=False,
+        )
+    recebiveis_stats = _somar_colunas(
+        carteira_por_corretor, total=ZERO, total_pago=ZERO, inadimplente=ZERO
+    )
+    total_recebiveis = recebiveis_stats["total"]
+    valor_pago = recebiveis_stats["total_pago"]
+    valor_inadimplente = recebiveis_stats["inadimplente"]
+    taxa_inadimplencia = (
+        (valor_inadimplente / total_recebiveis) if total_recebiveis else ZERO
+    )
+
+    faixas = recebiveis.em_aberto().faixas_de_atraso(timezone.localdate())
+
+    return {
+        "taxa_inadimplencia": taxa_inadimplencia * 100,
+        "inadimplencia_por_faixa": {chave: valor for chave, valor in faixas.items() if valor},
+        "valor_recebido": valor_pago,
+        "saldo_devedor": total_recebiveis - valor_pago,
+        "inadimplencia_por_corretor": inadimplencia_por_corretor(
+            (item["nome"], item["total"], item["inadimplente"])
+            for item in carteira_por_corretor
+        ),
+    }
+
+
+def supplier_share(linhas, total):
+    """Formata tuplas ``(fornecedor, valor)`` com o percentual sobre ``total``."""
+
+    return [
+        {
+            "fornecedor": nome,
+            "valor": valor,
+            "percentual": (valor / total * 100) if total else ZERO,
+        }
+        for nome, valor in linhas
+    ]
+
+
+def compras_kpis(filtros=SEM_FILTROS):
+    """Indicadores de custos de compras e participação de fornecedores."""
+
+    # Uma consulta por par (empreendimento, fornecedor); os dois rankings e o
+    # total geral são somados a partir dos pares.
+    por_empreendimento, por_fornecedor = {}, {}
+    for item in (
+        filtros.pedidos(PedidoCompra.objects)
+        .values("empreendimento__nome", "fornecedor__nome")
+        .annotate(total=Coalesce(Sum("valor_total"), ZERO))
+        .order_by()
+    ):
+        empreendimento, fornecedor, total = (
+            item["empreendimento__nome"],
+            item["fornecedor__nome"],
+            item["total"],
+        )
+        por_empreendimento[empreendimento] = por_empreendimento.get(empreendimento, ZERO) + total
+        por_fornecedor[fornecedor] = por_fornecedor.get(fornecedor, ZERO) + total
+    custo_por_empreendimento = [
+        {"empreendimento__nome": nome, "total": total}
+        for nome, total in sorted(por_empreendimento.items())
+    ]
+    custo_total_compras = sum(por_empreendimento.values(), ZERO)
+    total_por_fornecedor = sorted(por_fornecedor.items(), key=lambda item: item[1], reverse=True)
+    return {
+        "custo_total": custo_total_compras,
+        "custo_por_empreendimento": custo_por_empreendimento,
+        "supplier_share": supplier_share(total_por_fornecedor, custo_total_compras),
+    }
+
+
+def planejado_vs_realizado(linhas):
+    """Acrescenta a variação (real - planejado) a cada linha."""
+
+    return [
+        {
+            **item,
+            "variacao": item["custo_real"] - item["custo_planejado"],
+        }
+        for item in linhas
+    ]
+
+
+def planejamento_kpis(filtros=SEM_FILTROS):
+    """Comparativo entre custo planejado e realizado por empreendimento."""
+
+    planejamento_resumo = (
+        filtros.tarefas(TarefaPlanejada.objects)
+        .values("empreendimento__nome")
+        .annotate(
+            custo_planejado=Coalesce(Sum("custo_planejado"), ZERO),
+            custo_real=Coalesce(Sum("custo_real"), ZERO),
+        )
+        .order_by("empreendimento__nome")
+    )
+    return planejado_vs_realizado(planejamento_resumo)
+
+
+# A relação reversa ``Empreendimento.vendas`` impede usar o mesmo nome na
+# anotação, por isso as colunas calculadas recebem o prefixo ``total_``.
+MARGEM_ORDENACOES = {
+    "nome": "nome",
+    "vendas": "total_vendas",
+    "custos": "total_custos",
+    "margem": "margem",
+}
+
+
+def _soma_por_empreendimento(queryset, campo):
+    return Coalesce(
+        Subquery(
+            queryset.filter(empreendimento=OuterRef("pk"))
+            .order_by()
+            .values("empreendimento")
+            .annotate(total=Sum(campo))
+            .values("total"),
+            output_field=DecimalField(max_digits=14, decimal_places=2),
+        ),
+        ZERO,
+    )
+
+
+def margem_por_empreendimento(ordenar_por="nome", limite=None, filtros=SEM_FILTROS):
+    """Margem bruta (vendas - custos de compras) de cada empreendimento.
+
+    Vendas e custos são calculados como subconsultas correlacionadas, então o
+    resultado sai de uma única consulta. ``ordenar_por`` aceita ``nome``,
+    ``vendas``, ``custos`` ou ``margem`` (com prefixo ``-`` para ordem
+    decrescente) e ``limite`` restringe o resultado aos N primeiros.
+    """
+
+    campo = ordenar_por.lstrip("-")
+    if campo not in MARGEM_ORDENACOES:
+        raise ValueError(f"Ordenação inválida para margem: {ordenar_por!r}")
+    ordem = ordenar_por[: len(ordenar_por) - len(campo)] + MARGEM_ORDENACOES[campo]
+
+    empreendimentos = (
+        filtros.empreendimentos(Empreendimento.objects)
+        .annotate(
+            total_vendas=_soma_por_empreendimento(
+                filtros.vendas(Venda.objects), "valor_contrato"
+            )
+            + _soma_por_empreendimento(
+                filtros.arquivados(TotalArquivado.objects), "valor_vendas"
+            ),
+            total_custos=_soma_por_empreendimento(
+                filtros.pedidos(PedidoCompra.objects), "valor_total"
+            ),
+        )
+        .annotate(margem=F("total_vendas") - F("total_custos"))
+        .values("nome", "total_vendas", "total_custos", "margem")
+        .order_by(ordem, "nome")
+    )
+    if limite is not None:
+        empreendimentos = empreendimentos[:limite]
+
+    return [
+        {
+            "empreendimento": item["nome"],
+            "vendas": item["total_vendas"],
+            "custos": item["total_custos"],
+            "margem": item["margem"],
+        }
+        for item in empreendimentos
+    ]
+
+
+def _serie_chart(itens):
+    return [
+        {
+            "label": item["label"],
+            "valor": float(item["valor"]),
+            "unidades": item["unidades"],
+        }
+        for item in itens
+    ]
+
+
+CAMPOS_TENDENCIA = ("valor", "movel_3", "movel_6", "movel_12", "acumulado_ano", "ano_anterior")
+
+
+def _tendencias_chart(itens):
+    return [
+        {
+            "label": item["label"],
+            **{campo: float(item[campo]) for campo in CAMPOS_TENDENCIA},
+            "variacao_ano": (
+                None if item["variacao_ano"] is None else float(item["variacao_ano"])
+            ),
+        }
+        for item in itens
+    ]
+
+
+def charts_payload(comercial, carteira, compras):
+    """Serializa os dados consumidos pelos gráficos do dashboard."""
+
+    inadimplencia_por_corretor = carteira["inadimplencia_por_corretor"]
+    supplier_share = compras["supplier_share"]
+    return json.dumps(
+        {
+            "comparativos_vendas": {
+                periodo: _serie_chart(itens)
+                for periodo, itens in comercial["comparativos"].items()
+            },
+            "tendencias_vendas": _tendencias_chart(comercial["tendencias"]),
+            "inadimplencia_corretor": {
+                "labels": [item["corretor"] for item in inadimplencia_por_corretor],
+                "values": [
+                    float(item["valor_inadimplente"]) for item in inadimplencia_por_corretor
+                ],
+                "taxas": [float(item["taxa"]) for item in inadimplencia_por_corretor],
+            },
+            "supplier_share": {
+                "labels": [item["fornecedor"] for item in supplier_share],
+                "values": [float(item["valor"]) for item in supplier_share],
+            },
+        },
+        cls=DjangoJSONEncoder,
+    )
@@ -0,0 +1,66 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboards import arquivamento
+
+
+class Command(BaseCommand):
+    help = (
+        "Move parcelas pagas e vendas canceladas anteriores ao corte para as tabelas "
+        "de arquivo, em lotes transacionais, mantendo os totais dos KPIs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--antes-de",
+            help="Data de corte no formato AAAA-MM-DD (padrão: --meses antes do mês atual).",
+        )
+        parser.add_argument(
+            "--meses",
+            type=int,
+            default=arquivamento.MESES_RETENCAO,
+            help="Meses mantidos nas tabelas de origem (padrão: %(default)s).",
+        )
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=arquivamento.TAMANHO_LOTE,
+            help="Registros movidos por transação (padrão: %(default)s).",
+        )
+        parser.add_argument(
+            "--simular",
+            action="store_true",
+            help="Apenas conta os registros que seriam arquivados.",
+        )
+
+    def handle(self, *args, **options):
+        if options["antes_de"]:
+            try:
+                corte = date.fromisoformat(options["antes_de"])
+            except ValueError as exc:
+                raise CommandError(f"Data inválida: {options['antes_de']}") from exc
+        else:
+            corte = arquivamento.corte_padrao(meses=options["meses"])
+        if options["lote"] < 1:
+            raise CommandError("O lote deve ter ao menos um registro.")
+
+        if options["simular"]:
+            resultado = arquivamento.simular(corte)
+            self.stdout.write(
+                f"Seriam arquivados {resultado.recebiveis} recebível(is) e "
+                f"{resultado.vendas} venda(s) anteriores a {corte:%d/%m/%Y}."
+            )
+            return
+
+        def progresso(modelo, quantidade):
+            if options["verbosity"] > 1:
+                self.stdout.write(f"{quantidade} {modelo._meta.verbose_name_plural} arquivados.")
+
+        resultado = arquivamento.arquivar(corte, options["lote"], progresso)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{resultado.recebiveis} recebível(is) e {resultado.vendas} venda(s) "
+                f"anteriores a {corte:%d/%m/%Y} arquivados."
+            )
+        )
@@ -0,0 +1,55 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboards.benchmark import ESCALAS, executar
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede tempo, consultas e pico de memória do dashboard em escalas crescentes "
+        "de recebíveis e grava o resultado em JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--escalas",
+            default=",".join(str(escala) for escala in ESCALAS),
+            help="Números de recebíveis separados por vírgula (padrão: %(default)s).",
+        )
+        parser.add_argument("--repeticoes", type=int, default=3)
+        parser.add_argument("--semente", type=int, default=0)
+        parser.add_argument(
+            "--snapshot",
+            action="store_true",
+            help="Reconstrói os snapshots antes de medir (mede o caminho pré-agregado).",
+        )
+        parser.add_argument(
+            "--manter",
+            action="store_true",
+            help="Mantém os dados sintéticos gerados em vez de desfazê-los ao final.",
+        )
+        parser.add_argument("--saida", help="Arquivo JSON de destino (padrão: saída padrão).")
+
+    def handle(self, *args, **options):
+        try:
+            escalas = [int(valor) for valor in options["escalas"].split(",") if valor.strip()]
+        except ValueError as exc:
+            raise CommandError(f"Escalas inválidas: {options['escalas']}") from exc
+        if not escalas or min(escalas) < 1 or options["repeticoes"] < 1:
+            raise CommandError("Informe escalas e repetições positivas.")
+
+        relatorio = executar(
+            escalas,
+            repeticoes=options["repeticoes"],
+            semente=options["semente"],
+            com_snapshot=options["snapshot"],
+            manter=options["manter"],
+        )
+        conteudo = json.dumps(relatorio, ensure_ascii=False, indent=2)
+        if options["saida"]:
+            with open(options["saida"], "w", encoding="utf-8") as arquivo:
+                arquivo.write(conteudo)
+            self.stderr.write(self.style.SUCCESS(f"Resultado gravado em {options['saida']}."))
+        else:
+            self.stdout.write(conteudo)
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.replica import banco_de_leitura
+from dashboards.exportacao import CHUNK_SIZE, EXPORTACOES, linhas_csv
+from dashboards.forms import FiltroDashboardForm
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporta vendas, recebíveis ou pedidos de compra em CSV sem carregar a "
+        "tabela em memória."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("tabela", choices=sorted(EXPORTACOES))
+        parser.add_argument("--saida", help="Arquivo de destino (padrão: saída padrão).")
+        parser.add_argument("--data-inicio", help="Data inicial no formato AAAA-MM-DD.")
+        parser.add_argument("--data-fim", help="Data final no formato AAAA-MM-DD.")
+        parser.add_argument("--empreendimento", type=int, help="ID do empreendimento.")
+        parser.add_argument("--corretor", type=int, help="ID do corretor.")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        form = FiltroDashboardForm(
+            {
+                campo: options[campo]
+                for campo in ("data_inicio", "data_fim", "empreendimento", "corretor")
+                if options[campo] is not None
+            }
+        )
+        if not form.is_valid():
+            raise CommandError(form.errors.as_text())
+
+        linhas = linhas_csv(
+            options["tabela"],
+            filtros=form.filtros(),
+            chunk_size=options["chunk_size"],
+            using=banco_de_leitura(),
+        )
+        if options["saida"]:
+            with open(options["saida"], "w", encoding="utf-8", newline="") as arquivo:
+                arquivo.writelines(linhas)
+            self.stderr.write(self.style.SUCCESS(f"Exportação gravada em {options['saida']}."))
+        else:
+            for linha in linhas:
+                self.stdout.write(linha, ending="")
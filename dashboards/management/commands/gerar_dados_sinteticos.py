@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboards.sinteticos import gerar
+
+
+class Command(BaseCommand):
+    help = (
+        "Acrescenta corretores, empreendimentos, vendas com parcelas, pedidos de "
+        "compra com itens e tarefas sintéticos, na escala do número de recebíveis."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--recebiveis", type=int, default=10_000, help="Número de recebíveis a criar."
+        )
+        parser.add_argument("--parcelas", type=int, default=10, help="Parcelas por venda.")
+        parser.add_argument("--semente", type=int, default=0)
+        parser.add_argument("--lote", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if options["recebiveis"] < 1 or options["parcelas"] < 1:
+            raise CommandError("Informe quantidades positivas de recebíveis e parcelas.")
+
+        resultado = gerar(
+            options["recebiveis"],
+            parcelas_por_venda=options["parcelas"],
+            semente=options["semente"],
+            lote=options["lote"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{resultado.vendas} vendas, {resultado.recebiveis} recebíveis, "
+                f"{resultado.pedidos} pedidos ({resultado.itens} itens) e "
+                f"{resultado.tarefas} tarefas criados."
+            )
+        )
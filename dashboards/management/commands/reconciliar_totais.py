@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from dashboards.totais import reconciliar
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstrói, a partir de vendas e recebíveis, os totais correntes por "
+        "corretor e empreendimento mantidos pelos sinais de gravação."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--corretor",
+            type=int,
+            action="append",
+            dest="corretores",
+            help="ID do corretor a reconciliar (pode ser repetido; padrão: todos).",
+        )
+
+    def handle(self, *args, **options):
+        linhas = reconciliar(options["corretores"])
+        self.stdout.write(self.style.SUCCESS(f"{linhas} linha(s) de totais reconstruída(s)."))
@@ -0,0 +1,45 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboards.snapshots import atualizar_snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        "Atualiza as tabelas de fatos e o snapshot diário de KPIs do dashboard, "
+        "recalculando apenas o que mudou desde a última execução."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--completo",
+            action="store_true",
+            help="Reconstrói todos os fatos (necessário após gravações em lote sem sinais).",
+        )
+        parser.add_argument(
+            "--data",
+            help=(
+                "Data de referência do snapshot no formato AAAA-MM-DD, hoje ou adiante "
+                "(padrão: hoje)."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        data = None
+        if options["data"]:
+            try:
+                data = date.fromisoformat(options["data"])
+            except ValueError as exc:
+                raise CommandError(f"Data inválida: {options['data']}") from exc
+
+        try:
+            snapshot = atualizar_snapshots(data=data, completo=options["completo"])
+        except ValueError as exc:
+            raise CommandError(str(exc)) from exc
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Snapshot de {snapshot.data:%d/%m/%Y} atualizado "
+                f"(marca d'água {snapshot.atualizado_ate:%d/%m/%Y %H:%M:%S})."
+            )
+        )
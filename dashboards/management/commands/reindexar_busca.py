@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from dashboards import busca
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstrói o índice FTS5 da busca global a partir das tabelas de origem "
+        "(necessário após cargas feitas fora do ORM; sem efeito no PostgreSQL)."
+    )
+
+    def handle(self, *args, **options):
+        if not busca.usa_fts():
+            self.stdout.write("PostgreSQL: a busca usa os índices de trigramas, nada a fazer.")
+            return
+        with transaction.atomic():
+            busca.criar_indice()
+            busca.reconstruir()
+        self.stdout.write(self.style.SUCCESS("Índice de busca reconstruído."))
@@ -0,0 +1,227 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ("comercial", "0001_initial"),
+        ("compras", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="KpiSnapshotDiario",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("data", models.DateField(unique=True)),
+                (
+                    "atualizado_ate",
+                    models.DateTimeField(
+                        help_text="Marca d'água de updated_at considerada na última atualização."
+                    ),
+                ),
+                (
+                    "valor_total_vendas",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("total_unidades", models.PositiveIntegerField(default=0)),
+                ("total_contratos", models.PositiveIntegerField(default=0)),
+                (
+                    "total_carteira",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "valor_recebido",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "valor_inadimplente",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "atraso_0_30",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "atraso_31_60",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "atraso_61_120",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "atraso_120_mais",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "custo_total_compras",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+            ],
+            options={
+                "verbose_name": "Snapshot Diário de KPIs",
+                "verbose_name_plural": "Snapshots Diários de KPIs",
+                "ordering": ("-data",),
+            },
+        ),
+        migrations.CreateModel(
+            name="KpiEmpreendimento",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "valor_vendas",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("unidades_vendidas", models.PositiveIntegerField(default=0)),
+                ("total_contratos", models.PositiveIntegerField(default=0)),
+                (
+                    "custo_compras",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("total_pedidos", models.PositiveIntegerField(default=0)),
+                (
+                    "custo_planejado",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "custo_real",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("total_tarefas", models.PositiveIntegerField(default=0)),
+                (
+                    "empreendimento",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="comercial.empreendimento",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "KPI por Empreendimento",
+                "verbose_name_plural": "KPIs por Empreendimento",
+                "ordering": ("empreendimento",),
+            },
+        ),
+        migrations.CreateModel(
+            name="KpiFornecedor",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "valor_compras",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "fornecedor",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="compras.fornecedor",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "KPI por Fornecedor",
+                "verbose_name_plural": "KPIs por Fornecedor",
+                "ordering": ("fornecedor",),
+            },
+        ),
+        migrations.CreateModel(
+            name="KpiCorretor",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "valor_vendas",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("unidades_vendidas", models.PositiveIntegerField(default=0)),
+                ("total_contratos", models.PositiveIntegerField(default=0)),
+                (
+                    "total_carteira",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "valor_recebido",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "valor_inadimplente",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("total_parcelas", models.PositiveIntegerField(default=0)),
+                (
+                    "corretor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="comercial.corretor",
+                    ),
+                ),
+                (
+                    "empreendimento",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="comercial.empreendimento",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "KPI por Corretor",
+                "verbose_name_plural": "KPIs por Corretor",
+                "ordering": ("corretor", "empreendimento"),
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("corretor", "empreendimento"),
+                        name="kpi_corretor_empreendimento_unico",
+                    )
+                ],
+            },
+        ),
+    ]
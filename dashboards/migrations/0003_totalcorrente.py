@@ -0,0 +1,77 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("comercial", "0004_venda_codigo_origem"),
+        ("dashboards", "0002_alter_kpicorretor_updated_at_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TotalCorrente",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True, db_index=True)),
+                (
+                    "valor_vendas",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("unidades_vendidas", models.IntegerField(default=0)),
+                ("total_contratos", models.IntegerField(default=0)),
+                (
+                    "total_carteira",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "valor_recebido",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "valor_inadimplente",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("total_parcelas", models.IntegerField(default=0)),
+                (
+                    "corretor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="comercial.corretor",
+                    ),
+                ),
+                (
+                    "empreendimento",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="comercial.empreendimento",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Total Corrente por Corretor",
+                "verbose_name_plural": "Totais Correntes por Corretor",
+                "ordering": ("corretor", "empreendimento"),
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("corretor", "empreendimento"),
+                        name="total_corretor_empreend_unico",
+                    )
+                ],
+            },
+        ),
+    ]
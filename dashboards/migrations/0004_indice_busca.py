@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+def criar_indice(apps, schema_editor):
+    from dashboards import busca
+
+    busca.criar_indice(schema_editor.connection)
+    busca.reconstruir(schema_editor.connection)
+
+
+def remover_indice(apps, schema_editor):
+    from dashboards import busca
+
+    busca.remover_indice(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+    """Tabela FTS5 da busca global; no PostgreSQL a busca usa os índices de trigramas."""
+
+    dependencies = [
+        ("comercial", "0005_indices_trigrama"),
+        ("compras", "0005_indices_trigrama"),
+        ("dashboards", "0003_totalcorrente"),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_indice, remover_indice),
+    ]
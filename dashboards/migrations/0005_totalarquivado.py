@@ -0,0 +1,74 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("comercial", "0007_vendaarquivo"),
+        ("dashboards", "0004_indice_busca"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TotalArquivado",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True, db_index=True)),
+                ("data", models.DateField()),
+                (
+                    "valor_vendas",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("unidades_vendidas", models.IntegerField(default=0)),
+                ("total_contratos", models.IntegerField(default=0)),
+                (
+                    "total_carteira",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "valor_recebido",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("total_parcelas", models.IntegerField(default=0)),
+                (
+                    "corretor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="comercial.corretor",
+                    ),
+                ),
+                (
+                    "empreendimento",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="comercial.empreendimento",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Total Arquivado por Dia",
+                "verbose_name_plural": "Totais Arquivados por Dia",
+                "ordering": ("data", "corretor", "empreendimento"),
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("corretor", "empreendimento", "data"),
+                        name="total_arquivado_unico",
+                    )
+                ],
+            },
+        ),
+    ]
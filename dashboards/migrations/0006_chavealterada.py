@@ -0,0 +1,51 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:43
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dashboards", "0005_totalarquivado"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChaveAlterada",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "entidade",
+                    models.CharField(
+                        choices=[
+                            ("corretor", "Corretor"),
+                            ("empreendimento", "Empreendimento"),
+                            ("fornecedor", "Fornecedor"),
+                        ],
+                        max_length=15,
+                    ),
+                ),
+                ("objeto_id", models.BigIntegerField()),
+                (
+                    "registrada_em",
+                    models.DateTimeField(
+                        db_index=True, default=django.utils.timezone.now
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Chave de KPI Alterada",
+                "verbose_name_plural": "Chaves de KPI Alteradas",
+                "ordering": ("registrada_em",),
+            },
+        ),
+    ]
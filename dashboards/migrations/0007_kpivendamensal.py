@@ -0,0 +1,55 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("comercial", "0007_vendaarquivo"),
+        ("dashboards", "0006_chavealterada"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="KpiVendaMensal",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True, db_index=True)),
+                ("mes", models.DateField(help_text="Primeiro dia do mês.")),
+                (
+                    "valor_vendas",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("unidades_vendidas", models.PositiveIntegerField(default=0)),
+                (
+                    "empreendimento",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="comercial.empreendimento",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "KPI Mensal de Vendas",
+                "verbose_name_plural": "KPIs Mensais de Vendas",
+                "ordering": ("empreendimento", "mes"),
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("empreendimento", "mes"), name="kpi_venda_mensal_unico"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -1,3 +1,228 @@
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+from core.models import TimeStampedModel
+
+
+class KpiSnapshotDiario(TimeStampedModel):
+    """Totais consolidados do dashboard em uma data de referência."""
+
+    data = models.DateField(unique=True)
+    atualizado_ate = models.DateTimeField(
+        help_text="Marca d'água de updated_at considerada na última atualização."
+    )
+    valor_total_vendas = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_unidades = models.PositiveIntegerField(default=0)
+    total_contratos = models.PositiveIntegerField(default=0)
+    total_carteira = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    valor_recebido = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    valor_inadimplente = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    atraso_0_30 = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    atraso_31_60 = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    atraso_61_120 = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    atraso_120_mais = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    custo_total_compras = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Snapshot Diário de KPIs"
+        verbose_name_plural = "Snapshots Diários de KPIs"
+        ordering = ("-data",)
+
+    def __str__(self) -> str:
+        return f"KPIs de {self.data:%d/%m/%Y}"
+
+
+class ChaveAlterada(models.Model):
+    """Corretor, empreendimento ou fornecedor cujos fatos precisam ser recalculados.
+
+    Registrada quando um registro muda de chave ou é excluído: nesses casos o
+    ``updated_at`` das linhas restantes não revela a chave que perdeu valores.
+    ``refresh_kpis`` consome os registros anteriores à sua execução.
+    """
+
+    class Entidade(models.TextChoices):
+        CORRETOR = "corretor", "Corretor"
+        EMPREENDIMENTO = "empreendimento", "Empreendimento"
+        FORNECEDOR = "fornecedor", "Fornecedor"
+
+    entidade = models.CharField(max_length=15, choices=Entidade.choices)
+    objeto_id = models.BigIntegerField()
+    registrada_em = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        verbose_name = "Chave de KPI Alterada"
+        verbose_name_plural = "Chaves de KPI Alteradas"
+        ordering = ("registrada_em",)
+
+    def __str__(self) -> str:
+        return f"{self.get_entidade_display()} {self.objeto_id}"
+
+
+class KpiCorretor(TimeStampedModel):
+    """Vendas e carteira de um corretor em um empreendimento."""
+
+    corretor = models.ForeignKey(
+        "comercial.Corretor", on_delete=models.CASCADE, related_name="+"
+    )
+    empreendimento = models.ForeignKey(
+        "comercial.Empreendimento", on_delete=models.CASCADE, related_name="+"
+    )
+    valor_vendas = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    unidades_vendidas = models.PositiveIntegerField(default=0)
+    total_contratos = models.PositiveIntegerField(default=0)
+    total_carteira = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    valor_recebido = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    valor_inadimplente = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_parcelas = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "KPI por Corretor"
+        verbose_name_plural = "KPIs por Corretor"
+        ordering = ("corretor", "empreendimento")
+        constraints = [
+            models.UniqueConstraint(
+                fields=("corretor", "empreendimento"), name="kpi_corretor_empreendimento_unico"
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.corretor} - {self.empreendimento}"
+
+
+class KpiEmpreendimento(TimeStampedModel):
+    """Receita, custos e planejamento consolidados de um empreendimento."""
+
+    empreendimento = models.OneToOneField(
+        "comercial.Empreendimento", on_delete=models.CASCADE, related_name="+"
+    )
+    valor_vendas = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    unidades_vendidas = models.PositiveIntegerField(default=0)
+    total_contratos = models.PositiveIntegerField(default=0)
+    custo_compras = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_pedidos = models.PositiveIntegerField(default=0)
+    custo_planejado = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    custo_real = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_tarefas = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "KPI por Empreendimento"
+        verbose_name_plural = "KPIs por Empreendimento"
+        ordering = ("empreendimento",)
+
+    def __str__(self) -> str:
+        return str(self.empreendimento)
+
+
+class KpiFornecedor(TimeStampedModel):
+    """Total comprado de um fornecedor."""
+
+    fornecedor = models.OneToOneField(
+        "compras.Fornecedor", on_delete=models.CASCADE, related_name="+"
+    )
+    valor_compras = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "KPI por Fornecedor"
+        verbose_name_plural = "KPIs por Fornecedor"
+        ordering = ("fornecedor",)
+
+    def __str__(self) -> str:
+        return str(self.fornecedor)
+
+
+class KpiVendaMensal(TimeStampedModel):
+    """Vendas de um empreendimento em um mês, base das séries do dashboard."""
+
+    empreendimento = models.ForeignKey(
+        "comercial.Empreendimento", on_delete=models.CASCADE, related_name="+"
+    )
+    mes = models.DateField(help_text="Primeiro dia do mês.")
+    valor_vendas = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    unidades_vendidas = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "KPI Mensal de Vendas"
+        verbose_name_plural = "KPIs Mensais de Vendas"
+        ordering = ("empreendimento", "mes")
+        constraints = [
+            models.UniqueConstraint(
+                fields=("empreendimento", "mes"), name="kpi_venda_mensal_unico"
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.empreendimento} - {self.mes:%m/%Y}"
+
+
+class TotalCorrente(TimeStampedModel):
+    """Totais sempre atualizados de vendas e carteira de um corretor em um empreendimento.
+
+    Mantidos pelos sinais de ``Venda`` e ``Recebivel`` (``dashboards.totais``),
+    ao contrário dos fatos ``Kpi*``, que refletem a última execução de
+    ``refresh_kpis``.
+    """
+
+    corretor = models.ForeignKey(
+        "comercial.Corretor", on_delete=models.CASCADE, related_name="+"
+    )
+    empreendimento = models.ForeignKey(
+        "comercial.Empreendimento", on_delete=models.CASCADE, related_name="+"
+    )
+    valor_vendas = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    unidades_vendidas = models.IntegerField(default=0)
+    total_contratos = models.IntegerField(default=0)
+    total_carteira = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    valor_recebido = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    valor_inadimplente = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_parcelas = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Total Corrente por Corretor"
+        verbose_name_plural = "Totais Correntes por Corretor"
+        ordering = ("corretor", "empreendimento")
+        constraints = [
+            models.UniqueConstraint(
+                fields=("corretor", "empreendimento"), name="total_corretor_empreend_unico"
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.corretor} - {self.empreendimento}"
+
+
+class TotalArquivado(TimeStampedModel):
+    """Totais diários das vendas e parcelas movidas para o arquivo.
+
+    Gravados por ``dashboards.arquivamento`` na mesma transação que move cada
+    lote. ``data`` é a data da venda nas colunas de vendas e o vencimento nas
+    de carteira, os mesmos campos a que os filtros de período se aplicam, de
+    modo que os KPIs somam o arquivo sem ler as tabelas arquivadas. Só parcelas
+    pagas são arquivadas, por isso não há coluna de inadimplência.
+    """
+
+    corretor = models.ForeignKey(
+        "comercial.Corretor", on_delete=models.CASCADE, related_name="+"
+    )
+    empreendimento = models.ForeignKey(
+        "comercial.Empreendimento", on_delete=models.CASCADE, related_name="+"
+    )
+    data = models.DateField()
+    valor_vendas = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    unidades_vendidas = models.IntegerField(default=0)
+    total_contratos = models.IntegerField(default=0)
+    total_carteira = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    valor_recebido = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_parcelas = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Total Arquivado por Dia"
+        verbose_name_plural = "Totais Arquivados por Dia"
+        ordering = ("data", "corretor", "empreendimento")
+        constraints = [
+            models.UniqueConstraint(
+                fields=("corretor", "empreendimento", "data"), name="total_arquivado_unico"
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.corretor} - {self.empreendimento} ({self.data:%d/%m/%Y})"
@@ -0,0 +1,158 @@
+"""Relatório executivo em PDF, renderizado fora do ciclo da requisição.
+
+A renderização (WeasyPrint) roda num pool de threads do próprio processo e o
+PDF é gravado em ``DASHBOARD_RELATORIOS_DIR`` com o nome
+``<filtros>-<versão dos dados>.pdf``. A versão combina a data corrente e as
+versões de cache de todas as seções, de modo que o mesmo arquivo é servido
+até algum dado mudar. Uma trava no cache impede que dois processos renderizem
+o mesmo relatório ao mesmo tempo. Cada renderização sai de ``_tarefas`` ao
+terminar; uma falha fica registrada no cache até a próxima solicitação.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from core.replica import em_replica
+
+from . import cache, secoes
+
+logger = logging.getLogger(__name__)
+
+PRONTO = "pronto"
+PROCESSANDO = "processando"
+ERRO = "erro"
+
+_executor = None
+_tarefas = {}
+# Reentrante: a tarefa que já terminou chama ``_descartar`` dentro de ``solicitar``.
+_trava = threading.RLock()
+
+
+class ErroRelatorio(Exception):
+    pass
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.DASHBOARD_RELATORIOS_WORKERS,
+            thread_name_prefix="relatorio-pdf",
+        )
+    return _executor
+
+
+def _resumo(texto):
+    return hashlib.md5(texto.encode()).hexdigest()[:16]
+
+
+def chave_relatorio(filtros):
+    """Identificador do PDF para os ``filtros`` e a versão atual dos dados."""
+
+    versoes = cache.versoes(secoes.todas_dependencias())
+    versao = "|".join(
+        [
+            timezone.localdate().isoformat(),
+            *(f"{rotulo}={valor}" for rotulo, valor in sorted(versoes.items())),
+        ]
+    )
+    return f"{_resumo(filtros.chave())}-{_resumo(versao)}"
+
+
+def caminho(chave):
+    return Path(settings.DASHBOARD_RELATORIOS_DIR) / f"{chave}.pdf"
+
+
+def _chave_trava(chave):
+    return f"{cache.PREFIXO}:relatorio:{chave}:trava"
+
+
+def _chave_erro(chave):
+    return f"{cache.PREFIXO}:relatorio:{chave}:erro"
+
+
+def gerar_pdf(html):
+    try:
+        from weasyprint import HTML
+    except ImportError as exc:  # pragma: no cover - dependência de sistema
+        raise ErroRelatorio("Instale o WeasyPrint para gerar relatórios em PDF.") from exc
+    return HTML(string=html, base_url=str(settings.BASE_DIR)).write_pdf()
+
+
+def renderizar(filtros, chave):
+    """Grava o PDF de ``chave`` e remove as versões anteriores do mesmo relatório."""
+
+    with em_replica():
+        contexto = secoes.contexto_dashboard(filtros)
+    contexto.update(filtros=filtros, gerado_em=timezone.localtime())
+    pdf = gerar_pdf(render_to_string("dashboards/relatorio.html", contexto))
+
+    destino = caminho(chave)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    temporario = destino.with_name(f".{chave}.{os.getpid()}.{threading.get_ident()}.tmp")
+    temporario.write_bytes(pdf)
+    # A troca é atômica: quem lê o diretório nunca encontra um PDF pela metade.
+    os.replace(temporario, destino)
+
+    prefixo = chave.split("-")[0]
+    for anterior in destino.parent.glob(f"{prefixo}-*.pdf"):
+        if anterior != destino:
+            anterior.unlink(missing_ok=True)
+    return destino
+
+
+def _executar(filtros, chave):
+    try:
+        return renderizar(filtros, chave)
+    except Exception:
+        logger.exception("Falha ao renderizar o relatório %s", chave)
+        caches[settings.DASHBOARD_CACHE_ALIAS].set(
+            _chave_erro(chave), True, timeout=settings.DASHBOARD_RELATORIOS_TIMEOUT
+        )
+        raise
+    finally:
+        caches[settings.DASHBOARD_CACHE_ALIAS].delete(_chave_trava(chave))
+        # Fecha as conexões que a thread do pool abriu para calcular as seções.
+        connections.close_all()
+
+
+def _descartar(chave, tarefa):
+    with _trava:
+        if _tarefas.get(chave) is tarefa:
+            del _tarefas[chave]
+
+
+def solicitar(filtros):
+    """Estado do relatório de ``filtros``, agendando a renderização se necessário.
+
+    Retorna ``(estado, chave)``, com ``estado`` em ``PRONTO``, ``PROCESSANDO``
+    ou ``ERRO``. Após um erro, a próxima solicitação agenda uma nova tentativa.
+    """
+
+    chave = chave_relatorio(filtros)
+    if caminho(chave).exists():
+        return PRONTO, chave
+
+    armazenamento = caches[settings.DASHBOARD_CACHE_ALIAS]
+    if armazenamento.delete(_chave_erro(chave)):
+        return ERRO, chave
+
+    with _trava:
+        if chave not in _tarefas and armazenamento.add(
+            _chave_trava(chave), True, timeout=settings.DASHBOARD_RELATORIOS_TIMEOUT
+        ):
+            tarefa = _pool().submit(_executar, filtros, chave)
+            _tarefas[chave] = tarefa
+            tarefa.add_done_callback(partial(_descartar, chave))
+    return PROCESSANDO, chave
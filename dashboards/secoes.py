@@ -0,0 +1,166 @@
+"""Seções do dashboard, cada uma em cache com o próprio conjunto de dependências.
+
+Uma alteração em ``Recebivel`` recalcula apenas a seção ``carteira``; as
+demais continuam sendo servidas do cache. Todas as seções dependem também do
+snapshot diário, já que ele define a origem dos números; sem filtros, um
+snapshot velho é atualizado incrementalmente antes de ser lido (ver
+``snapshots.snapshot_atual``).
+
+``acontexto_dashboard`` monta o mesmo contexto de ``contexto_dashboard`` para
+views assíncronas, calculando as seções ao mesmo tempo num pool de até
+``DASHBOARD_SECOES_WORKERS`` threads, cada uma com a própria conexão ao banco:
+a latência da página se aproxima da seção mais lenta, e não da soma de todas.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from . import cache, fluxo_caixa, kpis, snapshots
+from .filtros import SEM_FILTROS
+from .models import KpiSnapshotDiario
+
+SNAPSHOT = KpiSnapshotDiario._meta.label_lower
+
+_executor = None
+
+DEPENDENCIAS = {
+    "comercial": ("comercial.venda", "comercial.corretor", "comercial.empreendimento"),
+    "carteira": ("carteira.recebivel", "comercial.venda", "comercial.corretor"),
+    "compras": (
+        "compras.pedidocompra",
+        "compras.itemcompra",
+        "compras.fornecedor",
+        "comercial.empreendimento",
+    ),
+    "estrategicos": (
+        "planejamento.tarefaplanejada",
+        "comercial.venda",
+        "compras.pedidocompra",
+        "comercial.empreendimento",
+    ),
+    "fluxo_caixa": ("carteira.recebivel", "comercial.venda"),
+}
+
+
+def _snapshot(nome, filtros):
+    # Os fatos pré-agregados não guardam o recorte por período, corretor ou
+    # empreendimento; com filtros os números vêm sempre das tabelas de origem.
+    if not filtros.vazio:
+        return None
+    return snapshots.snapshot_atual(DEPENDENCIAS[nome])
+
+
+def comercial(filtros):
+    snapshot = _snapshot("comercial", filtros)
+    if snapshot is not None:
+        return snapshots.comercial_kpis(snapshot)
+    return kpis.comercial_kpis(filtros)
+
+
+def carteira(filtros):
+    snapshot = _snapshot("carteira", filtros)
+    if snapshot is not None:
+        return snapshots.carteira_kpis(snapshot)
+    return kpis.carteira_kpis(filtros)
+
+
+def compras(filtros):
+    snapshot = _snapshot("compras", filtros)
+    if snapshot is not None:
+        return snapshots.compras_kpis(snapshot)
+    return kpis.compras_kpis(filtros)
+
+
+def estrategicos(filtros):
+    if _snapshot("estrategicos", filtros) is not None:
+        return {
+            "planejado_vs_realizado": snapshots.planejamento_kpis(),
+            "margem_por_empreendimento": snapshots.margem_por_empreendimento(),
+        }
+    return {
+        "planejado_vs_realizado": kpis.planejamento_kpis(filtros),
+        "margem_por_empreendimento": kpis.margem_por_empreendimento(filtros=filtros),
+    }
+
+
+def projecao_fluxo_caixa(filtros):
+    # Sempre a partir das parcelas: o snapshot não guarda os vencimentos futuros.
+    projecoes = fluxo_caixa.projetar_em(("mes", "semana"), filtros)
+    return {"mensal": projecoes["mes"], "semanal": projecoes["semana"]}
+
+
+CALCULOS = {
+    "comercial": comercial,
+    "carteira": carteira,
+    "compras": compras,
+    "estrategicos": estrategicos,
+    "fluxo_caixa": projecao_fluxo_caixa,
+}
+
+
+def dependencias(nome):
+    """Rótulos ``app.modelo`` lidos pela seção ``nome``."""
+
+    return DEPENDENCIAS[nome] + (SNAPSHOT,)
+
+
+def todas_dependencias():
+    """Rótulos lidos por pelo menos uma seção."""
+
+    return sorted({dep for nome in CALCULOS for dep in dependencias(nome)})
+
+
+def secao(nome, filtros=SEM_FILTROS):
+    """Seção ``nome`` do dashboard, recalculada só quando suas dependências mudam."""
+
+    # As faixas de atraso e a escolha do snapshot dependem da data corrente.
+    return cache.obter_ou_calcular(
+        f"secao:{nome}:{timezone.localdate().isoformat()}:{filtros.chave()}",
+        partial(CALCULOS[nome], filtros),
+        dependencias(nome),
+    )
+
+
+def _com_graficos(contexto):
+    contexto["charts_payload"] = kpis.charts_payload(
+        contexto["comercial"], contexto["carteira"], contexto["compras"]
+    )
+    return contexto
+
+
+def contexto_dashboard(filtros=SEM_FILTROS):
+    return _com_graficos({nome: secao(nome, filtros) for nome in CALCULOS})
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.DASHBOARD_SECOES_WORKERS,
+            thread_name_prefix="dashboard-secao",
+        )
+    return _executor
+
+
+def _secao_no_pool(nome, filtros):
+    # As threads do pool vivem além da requisição: como no ciclo de uma
+    # requisição, descarta conexões vencidas ou com erro antes e depois do uso.
+    close_old_connections()
+    try:
+        return secao(nome, filtros)
+    finally:
+        close_old_connections()
+
+
+async def acontexto_dashboard(filtros=SEM_FILTROS):
+    """Versão assíncrona de ``contexto_dashboard``, com as seções em paralelo."""
+
+    calcular = sync_to_async(_secao_no_pool, thread_sensitive=False, executor=_pool())
+    valores = await asyncio.gather(*(calcular(nome, filtros) for nome in CALCULOS))
+    return _com_graficos(dict(zip(CALCULOS, valores)))
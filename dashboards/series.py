@@ -0,0 +1,268 @@
+"""Séries temporais agregadas no banco, com granularidade configurável.
+
+O período de cada registro é calculado na própria consulta: o início da
+semana (``TruncWeek``) ou o par (ano, índice do período no ano), em que o
+índice é a divisão inteira do mês pelo tamanho do período. Assim cada série
+custa uma única consulta agrupada, em SQLite e PostgreSQL, e os períodos sem
+registros entre o primeiro e o último são preenchidos com valores zerados.
+
+``series_em`` agrupa cada fonte pelos períodos de várias granularidades na
+mesma consulta. ``indicadores_mensais`` usa funções de janela sobre o total
+mensal de uma ou mais fontes para obter, na mesma consulta, somas móveis,
+acumulado no ano e o valor do ano anterior.
+"""
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import connections
+from django.db.models import ExpressionWrapper, IntegerField, Sum
+from django.db.models.functions import Cast, ExtractMonth, ExtractYear, TruncWeek
+
+JANELAS_MOVEIS = (3, 6, 12)
+
+MESES = ["Jan", "Fev", "Mar", "Abr", "Mai", "Jun", "Jul", "Ago", "Set", "Out", "Nov", "Dez"]
+
+
+def rotulo_mes(data):
+    return f"{MESES[data.month - 1]}/{data.year}"
+
+
+@dataclass(frozen=True)
+class Granularidade:
+    """Tamanho do período em meses (0 para semanas) e a abreviação do rótulo."""
+
+    meses: int
+    abreviacao: str = ""
+
+    @property
+    def semanal(self) -> bool:
+        return self.meses == 0
+
+    def indice(self, data):
+        return (data.month - 1) // self.meses + 1
+
+    def inicio(self, data):
+        """Primeiro dia do período que contém ``data``."""
+
+        if self.semanal:
+            return data - timedelta(days=data.weekday())
+        return date(data.year, (self.indice(data) - 1) * self.meses + 1, 1)
+
+    def proximo(self, inicio):
+        if self.semanal:
+            return inicio + timedelta(days=7)
+        mes = inicio.month - 1 + self.meses
+        return date(inicio.year + mes // 12, mes % 12 + 1, 1)
+
+    def rotulo(self, inicio):
+        if self.semanal:
+            return f"{inicio.day:02d}/{rotulo_mes(inicio)}"
+        if self.meses == 1:
+            return rotulo_mes(inicio)
+        if self.meses == 12:
+            return str(inicio.year)
+        return f"{self.indice(inicio)}º {self.abreviacao}/{inicio.year}"
+
+
+GRANULARIDADES = {
+    "semana": Granularidade(0),
+    "mes": Granularidade(1),
+    "bimestre": Granularidade(2, "Bim"),
+    "trimestre": Granularidade(3, "Tri"),
+    "semestre": Granularidade(6, "Sem"),
+    "ano": Granularidade(12),
+}
+
+
+def chaves_periodo(periodo, campo, prefixo=""):
+    """Anotações que identificam o período de ``campo``, com nomes iniciados por ``prefixo``.
+
+    Prefixos distintos permitem agrupar pelos períodos de várias
+    granularidades na mesma consulta.
+    """
+
+    if periodo.semanal:
+        return {f"{prefixo}_semana": TruncWeek(campo)}
+    # O PostgreSQL devolve EXTRACT como numeric; o cast garante a divisão inteira.
+    indice = ExpressionWrapper(
+        (Cast(ExtractMonth(campo), IntegerField()) - 1) / periodo.meses + 1,
+        output_field=IntegerField(),
+    )
+    return {f"{prefixo}_ano": ExtractYear(campo), f"{prefixo}_indice": indice}
+
+
+def inicio_periodo(linha, periodo, prefixo=""):
+    """Retira de ``linha`` as chaves de ``chaves_periodo`` e devolve o início do período."""
+
+    if periodo.semanal:
+        semana = linha.pop(f"{prefixo}_semana")
+        return semana.date() if hasattr(semana, "date") else semana
+    ano, indice = linha.pop(f"{prefixo}_ano"), linha.pop(f"{prefixo}_indice")
+    return date(ano, (indice - 1) * periodo.meses + 1, 1)
+
+
+def periodos(periodo, inicio, fim):
+    """Inícios dos períodos de ``periodo`` entre as datas ``inicio`` e ``fim``."""
+
+    atual, ultimo = periodo.inicio(inicio), periodo.inicio(fim)
+    while atual <= ultimo:
+        yield atual
+        atual = periodo.proximo(atual)
+
+
+def periodo_de(nome):
+    """``Granularidade`` registrada como ``nome`` em ``GRANULARIDADES``."""
+
+    if nome not in GRANULARIDADES:
+        raise ValueError(f"Granularidade inválida: {nome!r}")
+    return GRANULARIDADES[nome]
+
+
+def serie(queryset, campo, granularidade, agregacoes, vazio, inicio=None, fim=None, adicionais=()):
+    """Agrega ``queryset`` por período de ``campo`` (uma consulta).
+
+    ``agregacoes`` mapeia o nome de cada valor à expressão de agregação e
+    ``vazio`` traz os valores usados nos períodos sem registros. ``inicio`` e
+    ``fim``, quando informados, estendem o preenchimento até essas datas.
+    ``adicionais`` traz outras fontes ``(queryset, campo, agregacoes)`` com os
+    mesmos nomes de valores, somadas período a período (uma consulta cada).
+    Retorna uma lista de dicionários com ``label``, ``inicio`` e os valores.
+    """
+
+    return series_em(
+        (granularidade,), queryset, campo, agregacoes, vazio, inicio, fim, adicionais
+    )[granularidade]
+
+
+def series_em(
+    granularidades, queryset, campo, agregacoes, vazio, inicio=None, fim=None, adicionais=()
+):
+    """``serie`` em cada uma das ``granularidades``, com as mesmas consultas.
+
+    Cada fonte é agrupada de uma vez pelos períodos de todas as granularidades
+    (``chaves_periodo`` com prefixos): o período de cada linha vem do banco, e
+    o Python só soma as linhas que caem no mesmo período. Retorna
+    ``{granularidade: série}``.
+    """
+
+    periodos = {nome: periodo_de(nome) for nome in granularidades}
+    valores = {nome: {} for nome in periodos}
+    for fonte, campo_fonte, expressoes in ((queryset, campo, agregacoes), *adicionais):
+        chaves = {}
+        for nome, periodo in periodos.items():
+            chaves.update(chaves_periodo(periodo, campo_fonte, prefixo=nome))
+        for linha in fonte.annotate(**chaves).order_by().values(*chaves).annotate(**expressoes):
+            inicios = {
+                nome: inicio_periodo(linha, periodo, prefixo=nome)
+                for nome, periodo in periodos.items()
+            }
+            for nome, atual in inicios.items():
+                anterior = valores[nome].get(atual)
+                valores[nome][atual] = (
+                    dict(linha)
+                    if anterior is None
+                    else {chave: anterior[chave] + valor for chave, valor in linha.items()}
+                )
+
+    return {
+        nome: _preencher(periodo, valores[nome], vazio, inicio, fim)
+        for nome, periodo in periodos.items()
+    }
+
+
+def _preencher(periodo, valores, vazio, inicio, fim):
+    inicio = inicio or min(valores, default=None)
+    fim = fim or max(valores, default=inicio)
+    if inicio is None:
+        return []
+    return [
+        {"label": periodo.rotulo(atual), "inicio": atual, **vazio, **valores.get(atual, {})}
+        for atual in periodos(periodo, inicio, fim)
+    ]
+
+
+def _numero_mes(campo):
+    ano = Cast(ExtractYear(campo), IntegerField())
+    return ExpressionWrapper(
+        ano * 12 + Cast(ExtractMonth(campo), IntegerField()) - 1, output_field=IntegerField()
+    )
+
+
+def indicadores_mensais(fontes, a_partir_de=None):
+    """Total mensal com somas móveis, acumulado no ano e variação anual (uma consulta).
+
+    ``fontes`` traz ``(queryset, campo de data, campo somado)``, como as vendas
+    e os totais arquivados. O total mensal de cada fonte é agrupado pelo ORM e
+    as fontes são unidas (``UNION ALL``); como o Django não anota uma união, as
+    funções de janela envolvem o SQL compilado dela. As janelas usam ``RANGE``
+    sobre o número do mês (ano * 12 + mês - 1), de modo que meses sem registros
+    contam como zero nas somas, embora não apareçam como linhas. O valor do ano
+    anterior é a soma de 13 meses menos a de 12. ``a_partir_de`` descarta os
+    meses anteriores, que entram apenas no cálculo das janelas.
+    """
+
+    mensais = [
+        queryset.order_by()
+        .annotate(_mes=_numero_mes(campo))
+        .values("_mes")
+        .annotate(_total=Sum(valor))
+        for queryset, campo, valor in fontes
+    ]
+    uniao = mensais[0].union(*mensais[1:], all=True)
+    conexao = connections[uniao.db]
+    sql, params = uniao.query.get_compiler(connection=conexao).as_sql()
+    q = conexao.ops.quote_name
+    mes, total = q("_mes"), q("_total")
+
+    def janela(nome, meses=None, particao=""):
+        quadro = f" RANGE BETWEEN {meses - 1} PRECEDING AND CURRENT ROW" if meses else ""
+        return f"SUM({total}) OVER ({particao}ORDER BY {mes}{quadro}) AS {q(nome)}"
+
+    janelas = [
+        *(janela(f"movel_{meses}", meses) for meses in JANELAS_MOVEIS),
+        janela("_treze_meses", 13),
+        janela("acumulado_ano", particao=f"PARTITION BY {mes} / 12 "),
+    ]
+    with conexao.cursor() as cursor:
+        cursor.execute(
+            f"SELECT {mes}, {total}, {', '.join(janelas)} FROM ("
+            f"SELECT {mes}, SUM({total}) AS {total} FROM ({sql}) fontes GROUP BY {mes}"
+            f") mensal ORDER BY {mes}",
+            params,
+        )
+        colunas = [coluna[0] for coluna in cursor.description]
+        linhas = [dict(zip(colunas, valores)) for valores in cursor.fetchall()]
+
+    # Sem o ORM, os valores chegam como o banco os devolve (no SQLite, float).
+    saida = fontes[0][0].model._meta.get_field(fontes[0][2])
+    casas = Decimal(1).scaleb(-saida.decimal_places)
+    for linha in linhas:
+        for coluna in colunas[1:]:
+            linha[coluna] = saida.to_python(linha[coluna]).quantize(casas)
+    return _indicadores(linhas, a_partir_de)
+
+
+def _indicadores(linhas, a_partir_de):
+    resultado = []
+    for linha in linhas:
+        mes = linha.pop("_mes")
+        inicio = date(mes // 12, mes % 12 + 1, 1)
+        if a_partir_de and inicio < a_partir_de:
+            continue
+        total = linha.pop("_total")
+        ano_anterior = linha.pop("_treze_meses") - linha["movel_12"]
+        resultado.append(
+            {
+                "label": rotulo_mes(inicio),
+                "inicio": inicio,
+                "valor": total,
+                **linha,
+                "ano_anterior": ano_anterior,
+                "variacao_ano": (
+                    (total - ano_anterior) / ano_anterior * 100 if ano_anterior else None
+                ),
+            }
+        )
+    return resultado
@@ -0,0 +1,90 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+
+from carteira.models import Recebivel
+from comercial.models import Corretor, Empreendimento, Venda
+from compras.models import Fornecedor, ItemCompra, PedidoCompra
+from core.importacao import lote_importado
+from core.particionamento import desanexando_particao, particao_anexada
+from planejamento.models import TarefaPlanejada
+
+from . import arquivamento, busca, cache, snapshots, totais
+
+MODELOS_MONITORADOS = (
+    Corretor,
+    Empreendimento,
+    Venda,
+    Recebivel,
+    Fornecedor,
+    PedidoCompra,
+    ItemCompra,
+    TarefaPlanejada,
+)
+
+
+def invalidar_cache_dashboard(sender, **kwargs):
+    # Só invalida após o commit para que nenhuma leitura concorrente grave em
+    # cache, na versão nova, dados ainda não confirmados.
+    transaction.on_commit(partial(cache.invalidar, sender._meta.label_lower))
+
+
+def conectar_sinais():
+    for modelo in MODELOS_MONITORADOS:
+        for sinal in (post_save, post_delete):
+            sinal.connect(
+                invalidar_cache_dashboard,
+                sender=modelo,
+                dispatch_uid=f"dashboards-cache-{modelo._meta.label_lower}",
+            )
+    # Importações gravam em lote, sem post_save; avisam por um sinal próprio.
+    lote_importado.connect(invalidar_cache_dashboard, dispatch_uid="dashboards-cache-importacao")
+
+    # Totais correntes, atualizados na mesma transação da gravação.
+    for sinal, receptor, modelo in (
+        (pre_save, totais.venda_pre_save, Venda),
+        (post_save, totais.venda_post_save, Venda),
+        (post_delete, totais.venda_post_delete, Venda),
+        (pre_save, totais.recebivel_pre_save, Recebivel),
+        (post_save, totais.recebivel_post_save, Recebivel),
+        (post_delete, totais.recebivel_post_delete, Recebivel),
+    ):
+        sinal.connect(
+            receptor, sender=modelo, dispatch_uid=f"dashboards-totais-{receptor.__name__}"
+        )
+    lote_importado.connect(totais.apos_importacao, dispatch_uid="dashboards-totais-importacao")
+    # Partições desanexadas entram nos totais arquivados, como o arquivamento.
+    desanexando_particao.connect(
+        arquivamento.ao_desanexar_particao, dispatch_uid="dashboards-arquivamento-desanexar"
+    )
+    particao_anexada.connect(
+        arquivamento.ao_anexar_particao, dispatch_uid="dashboards-arquivamento-anexar"
+    )
+
+    # Chaves que um registro deixou, para a atualização incremental dos fatos.
+    for modelo in snapshots.CHAVES_DOS_FATOS:
+        for sinal, receptor in (
+            (pre_save, snapshots.guardar_chave_anterior),
+            (post_save, snapshots.registrar_chave_anterior),
+            (pre_delete, snapshots.registrar_chave_excluida),
+        ):
+            sinal.connect(
+                receptor,
+                sender=modelo,
+                dispatch_uid=f"dashboards-snapshots-{receptor.__name__}-{modelo._meta.label_lower}",
+            )
+
+    lote_importado.connect(
+        snapshots.apos_importacao, dispatch_uid="dashboards-snapshots-importacao"
+    )
+
+    # Índice FTS5 da busca global (apenas fora do PostgreSQL).
+    for entidade in busca.ENTIDADES.values():
+        for sinal in (post_save, post_delete):
+            sinal.connect(
+                busca.sincronizar_instancia,
+                sender=entidade.modelo,
+                dispatch_uid=f"dashboards-busca-{entidade.modelo._meta.label_lower}",
+            )
+    lote_importado.connect(busca.apos_importacao, dispatch_uid="dashboards-busca-importacao")
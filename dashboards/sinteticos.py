@@ -0,0 +1,191 @@
+"""Geração de dados sintéticos em volume para medir o dashboard.
+
+Os registros são criados com ``bulk_create`` em lotes e marcados com o prefixo
+``SIN-`` em ``codigo_origem``; gerações sucessivas continuam a numeração, de
+modo que é possível crescer a base em etapas (10 mil, 100 mil, 1 milhão de
+recebíveis) sem recriar o que já existe. A escala é dada pelo número de
+recebíveis; vendas, corretores, empreendimentos, pedidos e tarefas são
+derivados dela em proporções próximas às das planilhas reais.
+"""
+
+import random
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from carteira.models import Recebivel
+from comercial.models import Corretor, Empreendimento, Venda
+from compras.models import Fornecedor, ItemCompra, PedidoCompra
+from core.importacao import CacheChavesNaturais
+from planejamento.models import CategoriaPlanejamento, TarefaPlanejada
+
+from . import busca, cache, secoes, totais
+
+PREFIXO = "SIN-"
+VENDAS_POR_CORRETOR = 200
+VENDAS_POR_EMPREENDIMENTO = 500
+VENDAS_POR_PEDIDO = 2
+ITENS_POR_PEDIDO = 3
+VENDAS_POR_TAREFA = 20
+CIDADES = ("São Paulo", "Campinas", "Sorocaba", "Santos", "Ribeirão Preto", "Curitiba")
+CATEGORIAS_TAREFA = ("Fundação", "Estrutura", "Alvenaria", "Instalações", "Acabamento")
+
+
+@dataclass
+class ResultadoGeracao:
+    vendas: int = 0
+    recebiveis: int = 0
+    pedidos: int = 0
+    itens: int = 0
+    tarefas: int = 0
+
+
+def _nomes(prefixo, quantidade):
+    return [f"{prefixo} Sintético {indice:04d}" for indice in range(1, quantidade + 1)]
+
+
+def _status_recebivel(sorteio, vencimento, hoje):
+    if vencimento > hoje:
+        return Recebivel.Status.ABERTO
+    valor = sorteio.random()
+    if valor < 0.80:
+        return Recebivel.Status.PAGO
+    if valor < 0.92:
+        return Recebivel.Status.ATRASADO
+    if valor < 0.95:
+        return Recebivel.Status.RENEGOCIADO
+    return Recebivel.Status.ABERTO
+
+
+def gerar(recebiveis, parcelas_por_venda=10, semente=0, lote=5000):
+    """Acrescenta ``recebiveis`` parcelas (e os registros relacionados) à base."""
+
+    hoje = timezone.localdate()
+    total_vendas = max(1, recebiveis // parcelas_por_venda)
+    inicio = Venda.objects.filter(codigo_origem__startswith=PREFIXO).count()
+    sorteio = random.Random(f"{semente}:{inicio}")
+
+    corretores = CacheChavesNaturais(Corretor)
+    nomes_corretores = _nomes("Corretor", max(5, (inicio + total_vendas) // VENDAS_POR_CORRETOR))
+    corretores.garantir({nome: {} for nome in nomes_corretores})
+    empreendimentos = CacheChavesNaturais(Empreendimento)
+    nomes_empreendimentos = _nomes(
+        "Empreendimento", max(3, (inicio + total_vendas) // VENDAS_POR_EMPREENDIMENTO)
+    )
+    empreendimentos.garantir(
+        {nome: {"cidade": sorteio.choice(CIDADES)} for nome in nomes_empreendimentos}
+    )
+    fornecedores = CacheChavesNaturais(Fornecedor)
+    nomes_fornecedores = _nomes("Fornecedor", max(5, len(nomes_empreendimentos) * 4))
+    fornecedores.garantir({nome: {} for nome in nomes_fornecedores})
+    categorias = CacheChavesNaturais(CategoriaPlanejamento)
+    categorias.garantir({nome: {} for nome in CATEGORIAS_TAREFA})
+
+    resultado = ResultadoGeracao()
+    vendas_por_lote = max(1, lote // parcelas_por_venda)
+    for deslocamento in range(0, total_vendas, vendas_por_lote):
+        numeros = range(
+            inicio + deslocamento, inicio + min(deslocamento + vendas_por_lote, total_vendas)
+        )
+        with transaction.atomic():
+            vendas = Venda.objects.bulk_create(
+                [
+                    Venda(
+                        codigo_origem=f"{PREFIXO}V{numero:08d}",
+                        corretor_id=corretores[sorteio.choice(nomes_corretores)],
+                        empreendimento_id=empreendimentos[sorteio.choice(nomes_empreendimentos)],
+                        cliente_nome=f"Cliente Sintético {numero:08d}",
+                        data_venda=hoje - timedelta(days=sorteio.randint(0, 3 * 365)),
+                        unidades_vendidas=sorteio.choice((1, 1, 1, 2)),
+                        valor_contrato=Decimal(sorteio.randint(150_000, 900_000)),
+                        status=sorteio.choices(Venda.Status.values, weights=(90, 5, 5))[0],
+                    )
+                    for numero in numeros
+                ]
+            )
+
+            parcelas = []
+            for venda in vendas:
+                valor = (venda.valor_contrato / parcelas_por_venda).quantize(Decimal("0.01"))
+                for parcela in range(1, parcelas_por_venda + 1):
+                    vencimento = venda.data_venda + timedelta(days=30 * parcela)
+                    status = _status_recebivel(sorteio, vencimento, hoje)
+                    pago = status == Recebivel.Status.PAGO
+                    parcelas.append(
+                        Recebivel(
+                            codigo_origem=f"{venda.codigo_origem}-{parcela:03d}",
+                            venda_id=venda.pk,
+                            data_vencimento=vencimento,
+                            valor=valor,
+                            data_pagamento=vencimento if pago else None,
+                            valor_pago=valor if pago else Decimal("0"),
+                            status=status,
+                        )
+                    )
+            Recebivel.objects.bulk_create(parcelas, batch_size=lote)
+
+            pedidos, itens_por_pedido = [], []
+            for numero in numeros[::VENDAS_POR_PEDIDO]:
+                itens_pedido = [
+                    ItemCompra(
+                        descricao=f"Item {indice} do pedido {numero:08d}",
+                        quantidade=sorteio.randint(1, 50),
+                        custo_unitario=Decimal(sorteio.randint(50, 5_000)),
+                    )
+                    for indice in range(1, ITENS_POR_PEDIDO + 1)
+                ]
+                pedidos.append(
+                    PedidoCompra(
+                        codigo_origem=f"{PREFIXO}P{numero:08d}",
+                        empreendimento_id=empreendimentos[sorteio.choice(nomes_empreendimentos)],
+                        fornecedor_id=fornecedores[sorteio.choice(nomes_fornecedores)],
+                        data_pedido=hoje - timedelta(days=sorteio.randint(0, 3 * 365)),
+                        categoria=sorteio.choice(PedidoCompra.CATEGORIAS)[0],
+                        valor_total=sum((item.custo_total for item in itens_pedido), Decimal("0")),
+                    )
+                )
+                itens_por_pedido.append(itens_pedido)
+            PedidoCompra.objects.bulk_create(pedidos, batch_size=lote)
+            itens = []
+            for pedido, itens_pedido in zip(pedidos, itens_por_pedido):
+                for item in itens_pedido:
+                    item.pedido_id = pedido.pk
+                    itens.append(item)
+            ItemCompra.objects.bulk_create(itens, batch_size=lote)
+
+            tarefas = []
+            for numero in numeros[::VENDAS_POR_TAREFA]:
+                data_inicio = hoje - timedelta(days=sorteio.randint(0, 3 * 365))
+                custo_planejado = Decimal(sorteio.randint(20_000, 400_000))
+                tarefas.append(
+                    TarefaPlanejada(
+                        codigo_origem=f"{PREFIXO}T{numero:08d}",
+                        empreendimento_id=empreendimentos[sorteio.choice(nomes_empreendimentos)],
+                        categoria_id=categorias[sorteio.choice(CATEGORIAS_TAREFA)],
+                        nome=f"Etapa {numero:08d}",
+                        data_inicio_prevista=data_inicio,
+                        data_fim_prevista=data_inicio + timedelta(days=60),
+                        data_fim_real=data_inicio + timedelta(days=sorteio.randint(45, 90)),
+                        custo_planejado=custo_planejado,
+                        custo_real=(custo_planejado * Decimal(sorteio.uniform(0.85, 1.2))).quantize(
+                            Decimal("0.01")
+                        ),
+                    )
+                )
+            TarefaPlanejada.objects.bulk_create(tarefas, batch_size=lote)
+
+        resultado.vendas += len(vendas)
+        resultado.recebiveis += len(parcelas)
+        resultado.pedidos += len(pedidos)
+        resultado.itens += len(itens)
+        resultado.tarefas += len(tarefas)
+
+    # Gravações em lote não disparam os sinais que mantêm os totais correntes, o
+    # índice de busca e o cache do dashboard.
+    totais.reconciliar()
+    busca.reconstruir()
+    transaction.on_commit(lambda: cache.invalidar(*secoes.todas_dependencias()))
+    return resultado
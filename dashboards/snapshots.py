@@ -0,0 +1,502 @@
+"""Tabelas de fatos pré-agregadas que alimentam o dashboard.
+
+``atualizar_snapshots`` recalcula apenas os corretores, empreendimentos e
+fornecedores cujos registros de origem mudaram desde a última marca d'água de
+``updated_at``. As funções de leitura montam as mesmas seções de
+``dashboards.kpis`` a partir dos fatos, com custo proporcional ao número de
+empreendimentos e corretores em vez do número de transações. Vendas e
+parcelas arquivadas entram nos fatos pelos totais de ``TotalArquivado``. As
+séries de vendas saem de ``KpiVendaMensal``, com uma linha por empreendimento
+e mês.
+
+Quando alguma origem muda depois da atualização, ``snapshot_atual`` refaz a
+atualização incremental na própria requisição, de modo que o dashboard
+continua lendo dos fatos em vez de recalcular tudo a partir das transações.
+
+Registros que mudam de corretor, empreendimento ou fornecedor, registros
+regravados por importações e registros excluídos deixam a chave anterior em
+``ChaveAlterada`` (ver ``registrar_chave_anterior``), pois ``updated_at`` só
+aponta a chave atual.
+Gravações em lote sem sinais (``QuerySet.update``) não são detectadas; use
+``completo=True`` para reconstruir os fatos.
+"""
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from carteira.models import Recebivel
+from comercial.models import Corretor, Empreendimento, Venda
+from compras.models import Fornecedor, PedidoCompra
+from planejamento.models import TarefaPlanejada
+
+from core import replica
+
+from . import cache, kpis, series
+from .models import (
+    ChaveAlterada,
+    KpiCorretor,
+    KpiEmpreendimento,
+    KpiFornecedor,
+    KpiSnapshotDiario,
+    KpiVendaMensal,
+    TotalArquivado,
+)
+from .totais import reconstruir_por_corretor
+
+ZERO = kpis.ZERO
+
+# Tempo máximo (s) de uma atualização disparada por requisição; enquanto ela
+# roda, as demais requisições calculam a partir das tabelas de origem.
+ESPERA_ATUALIZACAO = 300
+
+# Modelos lidos pelos fatos; alterações neles tornam o snapshot velho.
+FONTES = tuple(
+    modelo._meta.label_lower
+    for modelo in (
+        Corretor,
+        Empreendimento,
+        Venda,
+        Recebivel,
+        Fornecedor,
+        PedidoCompra,
+        TarefaPlanejada,
+    )
+)
+
+# Para cada modelo de origem: campos próprios que definem a chave e, para cada
+# consulta que leva a uma chave dos fatos, a entidade correspondente.
+CHAVES_DOS_FATOS = {
+    Venda: (
+        ("corretor_id", "empreendimento_id"),
+        {
+            "corretor_id": ChaveAlterada.Entidade.CORRETOR,
+            "empreendimento_id": ChaveAlterada.Entidade.EMPREENDIMENTO,
+        },
+    ),
+    Recebivel: (("venda_id",), {"venda__corretor_id": ChaveAlterada.Entidade.CORRETOR}),
+    PedidoCompra: (
+        ("empreendimento_id", "fornecedor_id"),
+        {
+            "empreendimento_id": ChaveAlterada.Entidade.EMPREENDIMENTO,
+            "fornecedor_id": ChaveAlterada.Entidade.FORNECEDOR,
+        },
+    ),
+    TarefaPlanejada: (
+        ("empreendimento_id",),
+        {"empreendimento_id": ChaveAlterada.Entidade.EMPREENDIMENTO},
+    ),
+}
+
+FAIXAS_SNAPSHOT = {
+    "0-30": "atraso_0_30",
+    "31-60": "atraso_31_60",
+    "61-120": "atraso_61_120",
+    "120+": "atraso_120_mais",
+}
+
+
+def _alterados(manager, marca, *campos):
+    return (
+        manager.filter(updated_at__gt=marca)
+        .order_by()
+        .values_list(*campos, flat=len(campos) == 1)
+        .distinct()
+    )
+
+
+def registrar_chaves(linhas):
+    """Registra em ``ChaveAlterada`` as chaves de ``linhas``, pares (modelo, valores)."""
+
+    registros = {
+        (entidade, linha[consulta])
+        for modelo, linha in linhas
+        for consulta, entidade in CHAVES_DOS_FATOS[modelo][1].items()
+        if linha[consulta] is not None
+    }
+    ChaveAlterada.objects.bulk_create(
+        ChaveAlterada(entidade=entidade, objeto_id=objeto_id)
+        for entidade, objeto_id in registros
+    )
+
+
+def _chaves_gravadas(modelo, pk):
+    campos, consultas = CHAVES_DOS_FATOS[modelo]
+    return modelo.objects.filter(pk=pk).values(*campos, *consultas).first()
+
+
+def guardar_chave_anterior(sender, instance, **kwargs):
+    """``pre_save``: lê as chaves gravadas antes da alteração."""
+
+    instance._chaves_dos_fatos = _chaves_gravadas(sender, instance.pk) if instance.pk else None
+
+
+def registrar_chave_anterior(sender, instance, **kwargs):
+    """``post_save``: registra as chaves anteriores se o registro mudou de chave."""
+
+    anterior = getattr(instance, "_chaves_dos_fatos", None)
+    campos, _ = CHAVES_DOS_FATOS[sender]
+    if anterior is None:
+        return
+    if any(anterior[campo] != getattr(instance, campo) for campo in campos):
+        registrar_chaves([(sender, anterior)])
+
+
+def registrar_chave_excluida(sender, instance, **kwargs):
+    """``pre_delete``: registra as chaves do registro, na transação da exclusão."""
+
+    gravado = _chaves_gravadas(sender, instance.pk)
+    if gravado is not None:
+        registrar_chaves([(sender, gravado)])
+
+
+def apos_importacao(sender, anteriores=(), **kwargs):
+    """Registra as chaves que os registros regravados por um lote importado tinham antes dele."""
+
+    if sender in CHAVES_DOS_FATOS:
+        registrar_chaves([(sender, linha) for linha in anteriores])
+
+
+def _chaves_alteradas(marca):
+    corretores = set(_alterados(Corretor.objects, marca, "id"))
+    empreendimentos = set(_alterados(Empreendimento.objects, marca, "id"))
+    fornecedores = set(_alterados(Fornecedor.objects, marca, "id"))
+    por_entidade = {
+        ChaveAlterada.Entidade.CORRETOR: corretores,
+        ChaveAlterada.Entidade.EMPREENDIMENTO: empreendimentos,
+        ChaveAlterada.Entidade.FORNECEDOR: fornecedores,
+    }
+    registradas = ChaveAlterada.objects.filter(registrada_em__gt=marca)
+    for entidade, objeto_id in registradas.values_list("entidade", "objeto_id"):
+        por_entidade[entidade].add(objeto_id)
+
+    for corretor_id, empreendimento_id in _alterados(
+        Venda.objects, marca, "corretor_id", "empreendimento_id"
+    ):
+        corretores.add(corretor_id)
+        empreendimentos.add(empreendimento_id)
+    corretores.update(_alterados(Recebivel.objects, marca, "venda__corretor_id"))
+    for empreendimento_id, fornecedor_id in _alterados(
+        PedidoCompra.objects, marca, "empreendimento_id", "fornecedor_id"
+    ):
+        empreendimentos.add(empreendimento_id)
+        fornecedores.add(fornecedor_id)
+    empreendimentos.update(_alterados(TarefaPlanejada.objects, marca, "empreendimento_id"))
+    return corretores, empreendimentos, fornecedores
+
+
+def _atualizar_kpis_empreendimento(empreendimentos=None):
+    ids = Empreendimento.objects.values_list("id", flat=True)
+    vendas = Venda.objects.order_by()
+    arquivados = TotalArquivado.objects.order_by()
+    pedidos = PedidoCompra.objects.order_by()
+    tarefas = TarefaPlanejada.objects.order_by()
+    fatos = KpiEmpreendimento.objects.all()
+    if empreendimentos is not None:
+        ids = ids.filter(id__in=empreendimentos)
+        vendas = vendas.filter(empreendimento_id__in=empreendimentos)
+        arquivados = arquivados.filter(empreendimento_id__in=empreendimentos)
+        pedidos = pedidos.filter(empreendimento_id__in=empreendimentos)
+        tarefas = tarefas.filter(empreendimento_id__in=empreendimentos)
+        fatos = fatos.filter(empreendimento_id__in=empreendimentos)
+
+    linhas = {
+        empreendimento_id: KpiEmpreendimento(empreendimento_id=empreendimento_id)
+        for empreendimento_id in ids
+    }
+    for item in vendas.values("empreendimento_id").annotate(
+        valor=Coalesce(Sum("valor_contrato"), ZERO),
+        unidades=Coalesce(Sum("unidades_vendidas"), 0),
+        contratos=Count("id"),
+    ):
+        linha = linhas[item["empreendimento_id"]]
+        linha.valor_vendas = item["valor"]
+        linha.unidades_vendidas = item["unidades"]
+        linha.total_contratos = item["contratos"]
+    for item in arquivados.values("empreendimento_id").annotate(
+        valor=Sum("valor_vendas"),
+        unidades=Sum("unidades_vendidas"),
+        contratos=Sum("total_contratos"),
+    ):
+        linha = linhas[item["empreendimento_id"]]
+        linha.valor_vendas += item["valor"]
+        linha.unidades_vendidas += item["unidades"]
+        linha.total_contratos += item["contratos"]
+    for item in pedidos.values("empreendimento_id").annotate(
+        custo=Coalesce(Sum("valor_total"), ZERO), total=Count("id")
+    ):
+        linha = linhas[item["empreendimento_id"]]
+        linha.custo_compras = item["custo"]
+        linha.total_pedidos = item["total"]
+    for item in tarefas.values("empreendimento_id").annotate(
+        planejado=Coalesce(Sum("custo_planejado"), ZERO),
+        real=Coalesce(Sum("custo_real"), ZERO),
+        total=Count("id"),
+    ):
+        linha = linhas[item["empreendimento_id"]]
+        linha.custo_planejado = item["planejado"]
+        linha.custo_real = item["real"]
+        linha.total_tarefas = item["total"]
+
+    fatos.delete()
+    KpiEmpreendimento.objects.bulk_create(linhas.values(), batch_size=500)
+
+
+def _atualizar_kpis_fornecedor(fornecedores=None):
+    pedidos = PedidoCompra.objects.order_by()
+    fatos = KpiFornecedor.objects.all()
+    if fornecedores is not None:
+        pedidos = pedidos.filter(fornecedor_id__in=fornecedores)
+        fatos = fatos.filter(fornecedor_id__in=fornecedores)
+
+    linhas = [
+        KpiFornecedor(fornecedor_id=item["fornecedor_id"], valor_compras=item["valor"])
+        for item in pedidos.values("fornecedor_id").annotate(
+            valor=Coalesce(Sum("valor_total"), ZERO)
+        )
+    ]
+    fatos.delete()
+    KpiFornecedor.objects.bulk_create(linhas, batch_size=500)
+
+
+def _atualizar_vendas_mensais(empreendimentos=None):
+    mensal = series.periodo_de("mes")
+    vendas = Venda.objects.order_by()
+    arquivados = TotalArquivado.objects.filter(total_contratos__gt=0).order_by()
+    fatos = KpiVendaMensal.objects.all()
+    if empreendimentos is not None:
+        vendas = vendas.filter(empreendimento_id__in=empreendimentos)
+        arquivados = arquivados.filter(empreendimento_id__in=empreendimentos)
+        fatos = fatos.filter(empreendimento_id__in=empreendimentos)
+
+    linhas = {}
+    for fonte, campo, valor, unidades in (
+        (vendas, "data_venda", "valor_contrato", "unidades_vendidas"),
+        (arquivados, "data", "valor_vendas", "unidades_vendidas"),
+    ):
+        chaves = series.chaves_periodo(mensal, campo)
+        for item in (
+            fonte.annotate(**chaves)
+            .values("empreendimento_id", *chaves)
+            .annotate(valor=Sum(valor), unidades=Sum(unidades))
+        ):
+            mes = series.inicio_periodo(item, mensal)
+            linha = linhas.setdefault(
+                (item["empreendimento_id"], mes),
+                KpiVendaMensal(empreendimento_id=item["empreendimento_id"], mes=mes),
+            )
+            linha.valor_vendas += item["valor"]
+            linha.unidades_vendidas += item["unidades"]
+
+    fatos.delete()
+    KpiVendaMensal.objects.bulk_create(linhas.values(), batch_size=500)
+
+
+def _atualizar_snapshot_diario(data, marca):
+    totais = KpiEmpreendimento.objects.aggregate(
+        valor_total_vendas=Coalesce(Sum("valor_vendas"), ZERO),
+        total_unidades=Coalesce(Sum("unidades_vendidas"), 0),
+        total_contratos=Coalesce(Sum("total_contratos"), 0),
+        custo_total_compras=Coalesce(Sum("custo_compras"), ZERO),
+    )
+    totais.update(
+        KpiCorretor.objects.aggregate(
+            total_carteira=Coalesce(Sum("total_carteira"), ZERO),
+            valor_recebido=Coalesce(Sum("valor_recebido"), ZERO),
+            valor_inadimplente=Coalesce(Sum("valor_inadimplente"), ZERO),
+        )
+    )
+    faixas = Recebivel.objects.em_aberto().faixas_de_atraso(data)
+    for rotulo, campo in FAIXAS_SNAPSHOT.items():
+        totais[campo] = faixas[rotulo]
+
+    snapshot, _ = KpiSnapshotDiario.objects.update_or_create(
+        data=data, defaults={"atualizado_ate": marca, **totais}
+    )
+    return snapshot
+
+
+def atualizar_snapshots(data=None, completo=False):
+    """Atualiza as tabelas de fatos e o snapshot diário de ``data`` (hoje).
+
+    Os fatos guardam os totais atuais, e as faixas de atraso são calculadas
+    para ``data``; por isso datas passadas são recusadas com ``ValueError``.
+    """
+
+    hoje = timezone.localdate()
+    data = data or hoje
+    if data < hoje:
+        raise ValueError(
+            f"O snapshot de {data:%d/%m/%Y} misturaria totais atuais com o atraso daquela data."
+        )
+    inicio = timezone.now()
+    cache.registrar_base(FONTES, inicio.timestamp())
+
+    with transaction.atomic():
+        # Atualizações simultâneas (comando e requisições) esperam umas às outras.
+        ultimo = (
+            KpiSnapshotDiario.objects.select_for_update().order_by("-atualizado_ate").first()
+        )
+        if completo or ultimo is None:
+            corretores = empreendimentos = fornecedores = None
+        else:
+            corretores, empreendimentos, fornecedores = _chaves_alteradas(
+                ultimo.atualizado_ate
+            )
+        reconstruir_por_corretor(KpiCorretor, corretores)
+        _atualizar_kpis_empreendimento(empreendimentos)
+        _atualizar_vendas_mensais(empreendimentos)
+        _atualizar_kpis_fornecedor(fornecedores)
+        snapshot = _atualizar_snapshot_diario(data, inicio)
+        ChaveAlterada.objects.filter(registrada_em__lte=inicio).delete()
+    cache.invalidar(KpiSnapshotDiario._meta.label_lower)
+    return snapshot
+
+
+def snapshot_do_dia(dependencias=FONTES):
+    """Snapshot da data corrente, se ainda refletir as ``dependencias``.
+
+    O snapshot só vale se a atualização tiver rodado hoje e depois da última
+    alteração registrada em cache (``cache.ultima_alteracao``) de cada uma das
+    dependências lidas pelos fatos (``FONTES``); do contrário os números vêm
+    das tabelas de origem.
+    """
+
+    snapshot = KpiSnapshotDiario.objects.filter(data=timezone.localdate()).first()
+    if snapshot is None:
+        return None
+    lidas = [dependencia for dependencia in dependencias if dependencia in FONTES]
+    if snapshot.atualizado_ate.timestamp() < cache.ultima_alteracao(lidas):
+        return None
+    return snapshot
+
+
+def snapshot_atual(dependencias=FONTES):
+    """Como ``snapshot_do_dia``, mas atualiza incrementalmente um snapshot velho.
+
+    Só atualiza se ``refresh_kpis`` já tiver gerado algum snapshot e nenhuma
+    outra requisição estiver atualizando; do contrário retorna ``None`` e os
+    números vêm das tabelas de origem.
+    """
+
+    snapshot = snapshot_do_dia(dependencias)
+    if snapshot is not None or not KpiSnapshotDiario.objects.exists():
+        return snapshot
+    with cache.exclusivo("atualizar_snapshots", ESPERA_ATUALIZACAO) as dono:
+        if not dono:
+            return None
+        # As chaves alteradas precisam ser lidas do primário: lidas da réplica,
+        # alterações ainda não replicadas ficariam para trás da marca d'água.
+        with replica.no_primario():
+            return atualizar_snapshots()
+
+
+def comercial_kpis(snapshot):
+    total_vendas = snapshot.valor_total_vendas
+    total_unidades = snapshot.total_unidades
+    return {
+        "valor_total_vendas": total_vendas,
+        "total_unidades": total_unidades,
+        "ticket_medio_venda": (
+            (total_vendas / snapshot.total_contratos) if snapshot.total_contratos else ZERO
+        ),
+        "ticket_medio_por_unidade": (total_vendas / total_unidades) if total_unidades else ZERO,
+        "vendas_por_corretor": list(
+            KpiCorretor.objects.filter(total_contratos__gt=0)
+            .values(
+                "corretor__nome",
+                "empreendimento__nome",
+                total_valor=F("valor_vendas"),
+                total_unidades=F("unidades_vendidas"),
+            )
+            .order_by("-valor_vendas")
+        ),
+        **evolucao_vendas(),
+    }
+
+
+def evolucao_vendas():
+    """``kpis.evolucao_vendas`` a partir das vendas mensais dos fatos."""
+
+    mensal = KpiVendaMensal.objects.all()
+    por_granularidade = series.series_em(
+        kpis.COMPARATIVOS.values(),
+        mensal,
+        "mes",
+        {
+            "valor": Coalesce(Sum("valor_vendas"), ZERO),
+            "unidades": Coalesce(Sum("unidades_vendidas"), 0),
+        },
+        {"valor": ZERO, "unidades": 0},
+    )
+    return {
+        "comparativos": {
+            periodo: por_granularidade[granularidade]
+            for periodo, granularidade in kpis.COMPARATIVOS.items()
+        },
+        "tendencias": series.indicadores_mensais([(mensal, "mes", "valor_vendas")]),
+    }
+
+
+def carteira_kpis(snapshot):
+    total_carteira = snapshot.total_carteira
+    faixas = {
+        rotulo: getattr(snapshot, campo) for rotulo, campo in FAIXAS_SNAPSHOT.items()
+    }
+    por_corretor = (
+        KpiCorretor.objects.filter(total_parcelas__gt=0)
+        .values("corretor__nome")
+        .annotate(total=Sum("total_carteira"), inadimplente=Sum("valor_inadimplente"))
+        .order_by("corretor__nome")
+    )
+    return {
+        "taxa_inadimplencia": (
+            (snapshot.valor_inadimplente / total_carteira * 100) if total_carteira else ZERO
+        ),
+        "inadimplencia_por_faixa": {chave: valor for chave, valor in faixas.items() if valor},
+        "valor_recebido": snapshot.valor_recebido,
+        "saldo_devedor": total_carteira - snapshot.valor_recebido,
+        "inadimplencia_por_corretor": kpis.inadimplencia_por_corretor(
+            (item["corretor__nome"], item["total"], item["inadimplente"])
+            for item in por_corretor
+        ),
+    }
+
+
+def compras_kpis(snapshot):
+    custo_total = snapshot.custo_total_compras
+    fornecedores = KpiFornecedor.objects.values_list("fornecedor__nome", "valor_compras")
+    return {
+        "custo_total": custo_total,
+        "custo_por_empreendimento": list(
+            KpiEmpreendimento.objects.filter(total_pedidos__gt=0)
+            .values("empreendimento__nome", total=F("custo_compras"))
+            .order_by("empreendimento__nome")
+        ),
+        "supplier_share": kpis.supplier_share(
+            fornecedores.order_by("-valor_compras"), custo_total
+        ),
+    }
+
+
+def planejamento_kpis():
+    return kpis.planejado_vs_realizado(
+        KpiEmpreendimento.objects.filter(total_tarefas__gt=0)
+        .values("empreendimento__nome", "custo_planejado", "custo_real")
+        .order_by("empreendimento__nome")
+    )
+
+
+def margem_por_empreendimento():
+    return [
+        {
+            "empreendimento": item["empreendimento__nome"],
+            "vendas": item["valor_vendas"],
+            "custos": item["custo_compras"],
+            "margem": item["valor_vendas"] - item["custo_compras"],
+        }
+        for item in KpiEmpreendimento.objects.values(
+            "empreendimento__nome", "valor_vendas", "custo_compras"
+        ).order_by("empreendimento__nome")
+    ]
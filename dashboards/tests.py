@@ -1,17 +1,50 @@
+import json
+import tempfile
+import threading
+import time
 from datetime import date, timedelta
 from decimal import Decimal
+from importlib.util import find_spec
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
 
-from django.test import TestCase
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.template.loader import render_to_string
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
-from carteira.models import Recebivel
-from comercial.models import Corretor, Empreendimento, Venda
+from dashboards import cache as dashboard_cache
+from dashboards import busca, detalhamento, fluxo_caixa, kpis, relatorio, secoes
+from dashboards.filtros import SEM_FILTROS, Filtros
+from dashboards.models import (
+    ChaveAlterada,
+    KpiCorretor,
+    KpiSnapshotDiario,
+    TotalArquivado,
+    TotalCorrente,
+)
+
+from carteira.models import Recebivel, RecebivelArquivo
+from comercial.models import Corretor, Empreendimento, Venda, VendaArquivo
 from compras.models import Fornecedor, PedidoCompra
+from core.importacao import ImportadorRecebiveis, ImportadorVendas
 from planejamento.models import CategoriaPlanejamento, TarefaPlanejada
 
 
 class DashboardViewTests(TestCase):
     def setUp(self) -> None:
+        cache.clear()
+        usuario = get_user_model().objects.create_user(username="gestor", password="senha")
+        self.client.force_login(usuario)
+
         self.corretor = Corretor.objects.create(nome="João Silva")
         self.empreendimento = Empreendimento.objects.create(
             nome="Residencial Aurora", cidade="São Paulo"
@@ -78,3 +111,1310 @@ class DashboardViewTests(TestCase):
         carteira = contexto["carteira"]
         self.assertGreater(carteira["taxa_inadimplencia"], 0)
         self.assertGreater(carteira["saldo_devedor"], 0)
+
+        self.assertEqual(carteira["inadimplencia_por_faixa"], {"31-60": Decimal("80000.00")})
+        self.assertEqual(contexto["compras"]["custo_total"], Decimal("120000.00"))
+
+    def _contar_consultas(self, **parametros) -> int:
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse("dashboards:overview"), parametros)
+        self.assertEqual(response.status_code, 200)
+        return len(consultas)
+
+    def test_dashboard_overview_query_count_is_flat(self) -> None:
+        periodo = {"data_inicio": (date.today() - timedelta(days=400)).isoformat()}
+        consultas_iniciais = self._contar_consultas()
+        consultas_com_periodo = self._contar_consultas(**periodo)
+
+        # Mais registros, corretores, empreendimentos, fornecedores e totais arquivados.
+        with self.captureOnCommitCallbacks(execute=True):
+            self._criar_vendas_adicionais()
+        cache.clear()
+
+        self.assertEqual(self._contar_consultas(), consultas_iniciais)
+        self.assertEqual(self._contar_consultas(**periodo), consultas_com_periodo)
+        orcamento = settings.INSTRUMENTACAO_ORCAMENTOS["dashboards:overview"]["consultas"]
+        self.assertLessEqual(max(consultas_iniciais, consultas_com_periodo), orcamento)
+
+    def _criar_vendas_adicionais(self) -> None:
+        for indice in range(20):
+            corretor = Corretor.objects.create(nome=f"Corretor {indice}")
+            empreendimento = Empreendimento.objects.create(
+                nome=f"Empreendimento {indice}", cidade="Campinas"
+            )
+            fornecedor = Fornecedor.objects.create(nome=f"Fornecedor {indice}")
+            TotalArquivado.objects.create(
+                corretor=corretor,
+                empreendimento=empreendimento,
+                data=date.today() - timedelta(days=15 * indice),
+                valor_vendas=Decimal("90000.00"),
+                unidades_vendidas=1,
+                total_contratos=1,
+                total_carteira=Decimal("3000.00"),
+                valor_recebido=Decimal("3000.00"),
+                total_parcelas=1,
+            )
+            venda = Venda.objects.create(
+                corretor=corretor,
+                empreendimento=empreendimento,
+                cliente_nome=f"Cliente {indice}",
+                data_venda=date.today() - timedelta(days=30 * indice),
+                valor_contrato=Decimal("250000.00"),
+            )
+            Recebivel.objects.create(
+                venda=venda,
+                data_vencimento=date.today() - timedelta(days=10 * indice),
+                valor=Decimal("10000.00"),
+                status=Recebivel.Status.ATRASADO,
+            )
+            PedidoCompra.objects.create(
+                empreendimento=empreendimento,
+                fornecedor=fornecedor,
+                data_pedido=date.today(),
+                categoria="servicos",
+                valor_total=Decimal("5000.00"),
+            )
+
+    def _secoes(self) -> dict:
+        response = self.client.get(reverse("dashboards:overview"))
+        return {
+            chave: response.context[chave]
+            for chave in ("comercial", "carteira", "compras", "estrategicos", "charts_payload")
+        }
+
+    def test_snapshot_context_matches_live_computation(self) -> None:
+        ao_vivo = self._secoes()
+        call_command("refresh_kpis", stdout=StringIO())
+
+        self.assertTrue(KpiSnapshotDiario.objects.filter(data=timezone.localdate()).exists())
+        self.assertEqual(self._secoes(), ao_vivo)
+
+    def test_stale_snapshot_is_refreshed_before_it_is_served(self) -> None:
+        call_command("refresh_kpis", stdout=StringIO())
+        KpiSnapshotDiario.objects.update(valor_total_vendas=Decimal("1"))
+        dashboard_cache.invalidar(KpiSnapshotDiario._meta.label_lower)
+        self.assertEqual(self._secoes()["comercial"]["valor_total_vendas"], Decimal("1"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Venda.objects.create(
+                corretor=self.corretor,
+                empreendimento=self.empreendimento,
+                cliente_nome="Lucas Prado",
+                data_venda=date.today(),
+                valor_contrato=Decimal("300000.00"),
+            )
+
+        comercial = self._secoes()["comercial"]
+        self.assertEqual(comercial["valor_total_vendas"], Decimal("800000.00"))
+        self.assertEqual(comercial["comparativos"]["mensal"][-1]["valor"], Decimal("800000.00"))
+        self.assertEqual(
+            KpiSnapshotDiario.objects.get(data=timezone.localdate()).valor_total_vendas,
+            Decimal("800000.00"),
+        )
+
+        # Atualizado, o snapshot volta a ser servido sem ler as vendas.
+        dashboard_cache.invalidar(KpiSnapshotDiario._meta.label_lower)
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(secoes.secao("comercial")["tendencias"], comercial["tendencias"])
+        self.assertNotIn('"comercial_venda"', " ".join(c["sql"] for c in consultas))
+
+    def test_refresh_kpis_rejects_past_dates(self) -> None:
+        ontem = (timezone.localdate() - timedelta(days=1)).isoformat()
+        with self.assertRaises(CommandError):
+            call_command("refresh_kpis", data=ontem, stdout=StringIO())
+        self.assertFalse(KpiSnapshotDiario.objects.exists())
+
+    def test_refresh_kpis_is_incremental(self) -> None:
+        call_command("refresh_kpis", stdout=StringIO())
+        outro_corretor = Corretor.objects.create(nome="Beatriz Rocha")
+        KpiCorretor.objects.filter(corretor=self.corretor).update(valor_vendas=Decimal("1"))
+
+        Venda.objects.create(
+            corretor=outro_corretor,
+            empreendimento=self.empreendimento,
+            cliente_nome="Lucas Prado",
+            data_venda=date.today(),
+            valor_contrato=Decimal("300000.00"),
+        )
+        call_command("refresh_kpis", stdout=StringIO())
+
+        # Apenas o corretor com vendas novas é recalculado.
+        self.assertEqual(
+            KpiCorretor.objects.get(corretor=self.corretor).valor_vendas, Decimal("1")
+        )
+        self.assertEqual(
+            KpiCorretor.objects.get(corretor=outro_corretor).valor_vendas,
+            Decimal("300000.00"),
+        )
+        snapshot = KpiSnapshotDiario.objects.get(data=timezone.localdate())
+        self.assertEqual(snapshot.valor_total_vendas, Decimal("800000.00"))
+
+        call_command("refresh_kpis", "--completo", stdout=StringIO())
+        self.assertEqual(
+            KpiCorretor.objects.get(corretor=self.corretor).valor_vendas,
+            Decimal("500000.00"),
+        )
+
+    def test_refresh_kpis_recomputes_keys_a_sale_moved_away_from(self) -> None:
+        call_command("refresh_kpis", stdout=StringIO())
+        outro_corretor = Corretor.objects.create(nome="Beatriz Rocha")
+        outro_empreendimento = Empreendimento.objects.create(
+            nome="Parque das Flores", cidade="Campinas"
+        )
+
+        self.venda.corretor = outro_corretor
+        self.venda.empreendimento = outro_empreendimento
+        self.venda.save()
+        call_command("refresh_kpis", stdout=StringIO())
+
+        self.assertFalse(KpiCorretor.objects.filter(corretor=self.corretor).exists())
+        self.assertEqual(
+            KpiCorretor.objects.get(
+                corretor=outro_corretor, empreendimento=outro_empreendimento
+            ).valor_vendas,
+            Decimal("500000.00"),
+        )
+        snapshot = KpiSnapshotDiario.objects.get(data=timezone.localdate())
+        self.assertEqual(snapshot.valor_total_vendas, Decimal("500000.00"))
+
+        self.venda.delete()
+        call_command("refresh_kpis", stdout=StringIO())
+
+        self.assertFalse(KpiCorretor.objects.exists())
+        snapshot.refresh_from_db()
+        self.assertEqual(snapshot.valor_total_vendas, Decimal("0.00"))
+        self.assertFalse(ChaveAlterada.objects.exists())
+
+    def test_dashboard_sections_are_cached_until_data_changes(self) -> None:
+        self._contar_consultas()
+        # Sessão, usuário e opções de empreendimento e corretor do filtro.
+        self.assertEqual(self._contar_consultas(), 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Recebivel.objects.create(
+                venda=self.venda,
+                data_vencimento=date.today() - timedelta(days=90),
+                valor=Decimal("50000.00"),
+                status=Recebivel.Status.ATRASADO,
+            )
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse("dashboards:overview"))
+
+        # Só a seção de carteira é recalculada.
+        sql = " ".join(consulta["sql"] for consulta in consultas)
+        self.assertIn("carteira_recebivel", sql)
+        self.assertNotIn("compras_pedidocompra", sql)
+        self.assertNotIn("planejamento_tarefaplanejada", sql)
+        self.assertEqual(
+            response.context["carteira"]["inadimplencia_por_faixa"]["61-120"],
+            Decimal("50000.00"),
+        )
+
+        estatisticas = dashboard_cache.estatisticas()
+        self.assertEqual(estatisticas["acertos"], 8)
+        self.assertEqual(estatisticas["falhas"], 7)
+
+    @override_settings(DASHBOARD_CACHE_ESPERA=0.1)
+    def test_waiter_that_times_out_keeps_the_owners_lock(self) -> None:
+        dependencias = [Venda._meta.label_lower]
+        versao = ".".join(
+            str(valor) for _, valor in sorted(dashboard_cache.versoes(dependencias).items())
+        )
+        trava = f"{dashboard_cache.PREFIXO}:teste:v{versao}:trava"
+        # Outro processo detém a trava e ainda está calculando.
+        cache.add(trava, True)
+
+        valor = dashboard_cache.obter_ou_calcular("teste", lambda: 42, dependencias)
+
+        self.assertEqual(valor, 42)
+        self.assertFalse(cache.add(trava, True))
+
+    def test_dashboard_filters_apply_to_every_section(self) -> None:
+        outro = Empreendimento.objects.create(nome="Parque Sul", cidade="Curitiba")
+        Venda.objects.create(
+            corretor=self.corretor,
+            empreendimento=outro,
+            cliente_nome="Joana Reis",
+            data_venda=date.today() - timedelta(days=400),
+            valor_contrato=Decimal("100000.00"),
+        )
+
+        response = self.client.get(
+            reverse("dashboards:overview"), {"empreendimento": outro.pk}
+        )
+        contexto = response.context
+        self.assertEqual(contexto["comercial"]["valor_total_vendas"], Decimal("100000.00"))
+        self.assertEqual(contexto["carteira"]["saldo_devedor"], 0)
+        self.assertEqual(contexto["compras"]["custo_total"], 0)
+        self.assertEqual(contexto["estrategicos"]["planejado_vs_realizado"], [])
+        margens = contexto["estrategicos"]["margem_por_empreendimento"]
+        self.assertEqual([item["empreendimento"] for item in margens], ["Parque Sul"])
+
+        response = self.client.get(
+            reverse("dashboards:overview"),
+            {"data_inicio": (date.today() - timedelta(days=30)).isoformat()},
+        )
+        self.assertEqual(
+            response.context["comercial"]["valor_total_vendas"], Decimal("500000.00")
+        )
+
+    def test_invalid_filters_fall_back_to_full_history(self) -> None:
+        response = self.client.get(
+            reverse("dashboards:overview"),
+            {"data_inicio": "2024-12-31", "data_fim": "2024-01-01"},
+        )
+        self.assertTrue(response.context["filtros_form"].errors)
+        self.assertEqual(
+            response.context["comercial"]["valor_total_vendas"], Decimal("500000.00")
+        )
+
+
+class DashboardAssincronoTests(TransactionTestCase):
+    # As seções rodam em threads com conexões próprias, que só enxergam dados gravados.
+
+    def setUp(self) -> None:
+        # As threads do pool sobrevivem ao teste; sem conexões persistentes, elas
+        # não seguram o banco de teste aberto quando o runner for removê-lo.
+        configuracao = mock.patch.dict(connections.settings[DEFAULT_DB_ALIAS], CONN_MAX_AGE=0)
+        configuracao.start()
+        self.addCleanup(configuracao.stop)
+        cache.clear()
+        corretor = Corretor.objects.create(nome="Paula Torres")
+        empreendimento = Empreendimento.objects.create(nome="Vila Serena", cidade="Santos")
+        venda = Venda.objects.create(
+            corretor=corretor,
+            empreendimento=empreendimento,
+            cliente_nome="Otávio Reis",
+            data_venda=date.today() - timedelta(days=60),
+            valor_contrato=Decimal("250000.00"),
+        )
+        for dias, status in ((-40, Recebivel.Status.ATRASADO), (20, Recebivel.Status.ABERTO)):
+            Recebivel.objects.create(
+                venda=venda,
+                data_vencimento=date.today() + timedelta(days=dias),
+                valor=Decimal("25000.00"),
+                status=status,
+            )
+        PedidoCompra.objects.create(
+            empreendimento=empreendimento,
+            fornecedor=Fornecedor.objects.create(nome="Serena Materiais"),
+            data_pedido=date.today(),
+            categoria="materiais",
+            valor_total=Decimal("30000.00"),
+        )
+
+    def test_async_context_matches_sync_context(self) -> None:
+        filtros = Filtros(data_inicio=date.today() - timedelta(days=365))
+        sincrono = secoes.contexto_dashboard(filtros)
+        cache.clear()
+
+        self.assertEqual(async_to_sync(secoes.acontexto_dashboard)(filtros), sincrono)
+
+    def test_sections_are_computed_concurrently(self) -> None:
+        # Só termina se comercial e carteira estiverem em andamento ao mesmo tempo.
+        barreira = threading.Barrier(2, timeout=5)
+        secao_original = secoes.secao
+
+        def secao(nome, filtros):
+            if nome in ("comercial", "carteira"):
+                barreira.wait()
+            return secao_original(nome, filtros)
+
+        with mock.patch.object(secoes, "secao", secao):
+            contexto = async_to_sync(secoes.acontexto_dashboard)()
+
+        self.assertFalse(barreira.broken)
+        self.assertEqual(contexto["carteira"]["saldo_devedor"], Decimal("50000.00"))
+
+    def test_async_view_renders_dashboard(self) -> None:
+        usuario = get_user_model().objects.create_user(username="assincrono", password="senha")
+        self.client.force_login(usuario)
+
+        response = self.client.get(reverse("dashboards:overview-async"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Vila Serena")
+        self.assertEqual(set(secoes.CALCULOS) - set(response.context.keys()), set())
+
+
+class MargemPorEmpreendimentoTests(TestCase):
+    def setUp(self) -> None:
+        corretor = Corretor.objects.create(nome="Ana Lima")
+        fornecedor = Fornecedor.objects.create(nome="Aço Brasil")
+        valores = {"Alfa": ("300000.00", "100000.00"), "Beta": ("200000.00", "250000.00")}
+        for nome, (valor_venda, valor_compra) in valores.items():
+            empreendimento = Empreendimento.objects.create(nome=nome, cidade="Santos")
+            Venda.objects.create(
+                corretor=corretor,
+                empreendimento=empreendimento,
+                cliente_nome=f"Cliente {nome}",
+                data_venda=date.today(),
+                valor_contrato=Decimal(valor_venda),
+            )
+            PedidoCompra.objects.create(
+                empreendimento=empreendimento,
+                fornecedor=fornecedor,
+                data_pedido=date.today(),
+                categoria="materiais",
+                valor_total=Decimal(valor_compra),
+            )
+        Empreendimento.objects.create(nome="Gama", cidade="Santos")
+
+    def test_margem_por_empreendimento_uses_single_query(self) -> None:
+        with self.assertNumQueries(1):
+            margens = kpis.margem_por_empreendimento()
+
+        self.assertEqual(
+            margens,
+            [
+                {
+                    "empreendimento": "Alfa",
+                    "vendas": Decimal("300000.00"),
+                    "custos": Decimal("100000.00"),
+                    "margem": Decimal("200000.00"),
+                },
+                {
+                    "empreendimento": "Beta",
+                    "vendas": Decimal("200000.00"),
+                    "custos": Decimal("250000.00"),
+                    "margem": Decimal("-50000.00"),
+                },
+                {
+                    "empreendimento": "Gama",
+                    "vendas": Decimal("0"),
+                    "custos": Decimal("0"),
+                    "margem": Decimal("0"),
+                },
+            ],
+        )
+
+    def test_margem_por_empreendimento_sorts_and_limits_in_sql(self) -> None:
+        margens = kpis.margem_por_empreendimento(ordenar_por="margem", limite=2)
+        self.assertEqual([item["empreendimento"] for item in margens], ["Beta", "Gama"])
+
+        with self.assertRaises(ValueError):
+            kpis.margem_por_empreendimento(ordenar_por="cidade")
+
+
+class SeriesTemporaisTests(TestCase):
+    def setUp(self) -> None:
+        corretor = Corretor.objects.create(nome="Ana Lima")
+        empreendimento = Empreendimento.objects.create(nome="Alfa", cidade="Santos")
+        for data_venda, valor in (
+            (date(2024, 1, 10), "100000.00"),
+            (date(2024, 1, 25), "50000.00"),
+            (date(2024, 3, 5), "200000.00"),
+            (date(2024, 7, 1), "300000.00"),
+        ):
+            Venda.objects.create(
+                corretor=corretor,
+                empreendimento=empreendimento,
+                cliente_nome="Cliente",
+                data_venda=data_venda,
+                valor_contrato=Decimal(valor),
+            )
+
+    def _resumo(self, serie) -> list:
+        return [(item["label"], item["valor"]) for item in serie]
+
+    def test_each_granularity_is_one_query_per_source_with_gaps_filled(self) -> None:
+        # Uma consulta nas vendas e outra nos totais arquivados.
+        with self.assertNumQueries(2):
+            mensal = kpis.serie_temporal("vendas", "mes")
+        self.assertEqual(
+            [item["label"] for item in mensal],
+            ["Jan/2024", "Fev/2024", "Mar/2024", "Abr/2024", "Mai/2024", "Jun/2024", "Jul/2024"],
+        )
+        self.assertEqual(mensal[0]["valor"], Decimal("150000.00"))
+        self.assertEqual((mensal[1]["valor"], mensal[1]["unidades"]), (Decimal("0"), 0))
+
+        with self.assertNumQueries(2):
+            trimestral = kpis.serie_temporal("vendas", "trimestre")
+        self.assertEqual(
+            self._resumo(trimestral),
+            [
+                ("1º Tri/2024", Decimal("350000.00")),
+                ("2º Tri/2024", Decimal("0")),
+                ("3º Tri/2024", Decimal("300000.00")),
+            ],
+        )
+        self.assertEqual(
+            self._resumo(kpis.serie_temporal("vendas", "ano")), [("2024", Decimal("650000.00"))]
+        )
+
+        semanal = kpis.serie_temporal("vendas", "semana")
+        self.assertEqual(semanal[0]["label"], "08/Jan/2024")
+        self.assertEqual(semanal[2]["label"], "22/Jan/2024")
+        self.assertEqual(len(semanal), 26)
+
+    def test_filter_period_bounds_the_filled_range(self) -> None:
+        filtros = Filtros(data_inicio=date(2023, 11, 15), data_fim=date(2024, 4, 30))
+        bimestral = kpis.serie_temporal("vendas", "bimestre", filtros)
+        self.assertEqual(
+            self._resumo(bimestral),
+            [
+                ("6º Bim/2023", Decimal("0")),
+                ("1º Bim/2024", Decimal("150000.00")),
+                ("2º Bim/2024", Decimal("200000.00")),
+            ],
+        )
+        # As três granularidades saem das mesmas duas consultas.
+        with self.assertNumQueries(2):
+            comparativos = kpis.comparativos_vendas(filtros)
+        self.assertEqual(comparativos["bimestral"], bimestral)
+        self.assertEqual(
+            [item["label"] for item in comparativos["semestral"]], ["2º Sem/2023", "1º Sem/2024"]
+        )
+        self.assertEqual(
+            [item["label"] for item in comparativos["mensal"]],
+            ["Nov/2023", "Dez/2023", "Jan/2024", "Fev/2024", "Mar/2024", "Abr/2024"],
+        )
+
+        with self.assertRaises(ValueError):
+            kpis.serie_temporal("vendas", "quinzena")
+
+
+class TendenciasVendasTests(TestCase):
+    def setUp(self) -> None:
+        corretor = Corretor.objects.create(nome="Ana Lima")
+        empreendimento = Empreendimento.objects.create(nome="Alfa", cidade="Santos")
+        for data_venda, valor in (
+            (date(2023, 1, 10), "100.00"),
+            (date(2023, 3, 5), "50.00"),
+            (date(2024, 1, 20), "150.00"),
+            (date(2024, 2, 15), "20.00"),
+            (date(2024, 4, 1), "10.00"),
+        ):
+            Venda.objects.create(
+                corretor=corretor,
+                empreendimento=empreendimento,
+                cliente_nome="Cliente",
+                data_venda=data_venda,
+                valor_contrato=Decimal(valor),
+            )
+
+    def test_windows_are_computed_in_one_query(self) -> None:
+        # Vendas e totais arquivados entram na mesma consulta com as janelas.
+        with self.assertNumQueries(1):
+            tendencias = {item["label"]: item for item in kpis.tendencias_vendas()}
+
+        self.assertEqual(
+            list(tendencias), ["Jan/2023", "Mar/2023", "Jan/2024", "Fev/2024", "Abr/2024"]
+        )
+        janeiro = tendencias["Jan/2024"]
+        self.assertEqual(janeiro["ano_anterior"], Decimal("100.00"))
+        self.assertEqual(janeiro["variacao_ano"], Decimal("50"))
+        self.assertEqual(janeiro["movel_3"], Decimal("150.00"))
+        self.assertEqual(janeiro["movel_12"], Decimal("200.00"))
+
+        fevereiro = tendencias["Fev/2024"]
+        self.assertIsNone(fevereiro["variacao_ano"])
+        self.assertEqual(fevereiro["movel_12"], Decimal("220.00"))
+        self.assertEqual(fevereiro["acumulado_ano"], Decimal("170.00"))
+
+        abril = tendencias["Abr/2024"]
+        self.assertEqual(abril["movel_3"], Decimal("30.00"))
+        self.assertEqual(abril["movel_6"], Decimal("180.00"))
+        self.assertEqual(abril["acumulado_ano"], Decimal("180.00"))
+
+    def test_archived_totals_enter_comparisons_and_windows(self) -> None:
+        for data, valor in ((date(2024, 2, 12), "5.00"), (date(2024, 3, 8), "7.00")):
+            TotalArquivado.objects.create(
+                corretor=Corretor.objects.get(),
+                empreendimento=Empreendimento.objects.get(),
+                data=data,
+                valor_vendas=Decimal(valor),
+                unidades_vendidas=1,
+                total_contratos=1,
+            )
+
+        # Uma consulta nas vendas e outra nos arquivados para as três
+        # granularidades dos comparativos, mais uma para as janelas.
+        with self.assertNumQueries(3):
+            evolucao = kpis.evolucao_vendas(Filtros(data_inicio=date(2024, 2, 10)))
+
+        tendencias = {item["label"]: item for item in evolucao["tendencias"]}
+        self.assertEqual(list(tendencias), ["Fev/2024", "Mar/2024", "Abr/2024"])
+        self.assertEqual(tendencias["Fev/2024"]["valor"], Decimal("25.00"))
+        self.assertEqual(tendencias["Mar/2024"]["valor"], Decimal("7.00"))
+        self.assertEqual(tendencias["Mar/2024"]["movel_3"], Decimal("182.00"))
+        self.assertEqual(tendencias["Abr/2024"]["acumulado_ano"], Decimal("192.00"))
+
+        mensal = {item["label"]: item["valor"] for item in evolucao["comparativos"]["mensal"]}
+        self.assertEqual(mensal["Fev/2024"], Decimal("25.00"))
+        self.assertEqual(mensal["Mar/2024"], Decimal("7.00"))
+        semestral = evolucao["comparativos"]["semestral"]
+        self.assertEqual(semestral[0]["valor"], Decimal("42.00"))
+
+    def test_start_date_keeps_earlier_months_in_the_windows(self) -> None:
+        tendencias = kpis.tendencias_vendas(Filtros(data_inicio=date(2024, 2, 10)))
+
+        self.assertEqual([item["label"] for item in tendencias], ["Fev/2024", "Abr/2024"])
+        self.assertEqual(tendencias[0]["acumulado_ano"], Decimal("170.00"))
+        self.assertEqual(tendencias[0]["movel_12"], Decimal("220.00"))
+
+        payload = json.loads(
+            kpis.charts_payload(
+                {"comparativos": {}, "tendencias": tendencias},
+                {"inadimplencia_por_corretor": []},
+                {"supplier_share": []},
+            )
+        )
+        self.assertEqual(payload["tendencias_vendas"][0]["acumulado_ano"], 170.0)
+
+
+class FluxoCaixaTests(TestCase):
+    hoje = date(2024, 6, 15)
+
+    def setUp(self) -> None:
+        empreendimento = Empreendimento.objects.create(nome="Aurora", cidade="Campinas")
+        self.inadimplente = Corretor.objects.create(nome="Ana Lima")
+        self.novato = Corretor.objects.create(nome="Bruno Reis")
+        self.adimplente = Corretor.objects.create(nome="Carla Dias")
+        vendas = {
+            corretor: Venda.objects.create(
+                corretor=corretor,
+                empreendimento=empreendimento,
+                cliente_nome="Cliente",
+                data_venda=date(2024, 1, 1),
+                valor_contrato=Decimal("100000.00"),
+            )
+            for corretor in (self.inadimplente, self.novato, self.adimplente)
+        }
+        for corretor, vencimento, valor, status in (
+            # Histórico: 25% do vencido da Ana está em aberto, nada do da Carla.
+            (self.inadimplente, date(2024, 3, 10), "750.00", Recebivel.Status.PAGO),
+            (self.inadimplente, date(2024, 4, 10), "250.00", Recebivel.Status.ATRASADO),
+            (self.adimplente, date(2024, 4, 10), "1000.00", Recebivel.Status.PAGO),
+            # Parcelas a vencer.
+            (self.inadimplente, date(2024, 6, 20), "400.00", Recebivel.Status.ABERTO),
+            (self.inadimplente, date(2024, 7, 5), "300.00", Recebivel.Status.PAGO),
+            (self.inadimplente, date(2024, 8, 10), "200.00", Recebivel.Status.ABERTO),
+            (self.novato, date(2024, 6, 30), "1000.00", Recebivel.Status.ABERTO),
+            (self.novato, date(2024, 9, 5), "500.00", Recebivel.Status.ABERTO),
+        ):
+            pago = status == Recebivel.Status.PAGO
+            Recebivel.objects.create(
+                venda=vendas[corretor],
+                data_vencimento=vencimento,
+                valor=Decimal(valor),
+                valor_pago=Decimal(valor) if pago else Decimal("0"),
+                status=status,
+            )
+
+    def test_monthly_forecast_applies_broker_haircuts_in_three_queries(self) -> None:
+        with self.assertNumQueries(3):
+            projecao = fluxo_caixa.projetar("mes", meses=3, hoje=self.hoje)
+
+        periodos = {item["label"]: item for item in projecao["periodos"]}
+        self.assertEqual(list(periodos), ["Jun/2024", "Jul/2024", "Ago/2024"])
+        # Bruno não tem histórico e recebe a taxa geral: 250 / 2000 = 12,5%.
+        self.assertEqual(periodos["Jun/2024"]["bruto"], Decimal("1400.00"))
+        self.assertEqual(periodos["Jun/2024"]["esperado"], Decimal("1175.00"))
+        self.assertEqual(periodos["Jul/2024"]["bruto"], Decimal("0"))
+        self.assertEqual(periodos["Ago/2024"]["esperado"], Decimal("150.00"))
+        self.assertEqual(periodos["Ago/2024"]["desconto"], Decimal("50.00"))
+        self.assertEqual(projecao["total_bruto"], Decimal("1600.00"))
+        self.assertEqual(projecao["total_esperado"], Decimal("1325.00"))
+        self.assertEqual(projecao["taxa_inadimplencia_geral"], Decimal("12.5"))
+
+    def test_weekly_forecast_fills_every_week_of_the_horizon(self) -> None:
+        semanas = fluxo_caixa.projetar("semana", meses=3, hoje=self.hoje)["periodos"]
+
+        self.assertEqual(semanas[0]["inicio"], date(2024, 6, 10))
+        self.assertEqual(semanas[-1]["inicio"], date(2024, 8, 26))
+        self.assertEqual(len(semanas), 12)
+        por_inicio = {item["inicio"]: item["esperado"] for item in semanas}
+        self.assertEqual(por_inicio[date(2024, 6, 17)], Decimal("300.00"))
+        self.assertEqual(por_inicio[date(2024, 6, 24)], Decimal("875.00"))
+
+    def test_several_granularities_share_the_same_three_queries(self) -> None:
+        with self.assertNumQueries(3):
+            projecoes = fluxo_caixa.projetar_em(("mes", "semana"), meses=3, hoje=self.hoje)
+
+        for granularidade in ("mes", "semana"):
+            self.assertEqual(
+                projecoes[granularidade],
+                fluxo_caixa.projetar(granularidade, meses=3, hoje=self.hoje),
+            )
+
+    def test_broker_filter_ignores_dashboard_period(self) -> None:
+        filtros = Filtros(data_fim=date(2024, 1, 31), corretor_id=self.inadimplente.pk)
+
+        projecao = fluxo_caixa.projetar("mes", filtros, meses=3, hoje=self.hoje)
+
+        self.assertEqual(projecao["total_bruto"], Decimal("600.00"))
+        self.assertEqual(projecao["total_esperado"], Decimal("450.00"))
+        self.assertEqual(projecao["taxa_inadimplencia_geral"], Decimal("25"))
+
+
+class KpiAPITests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        usuario = get_user_model().objects.create_user(username="bi", password="senha")
+        self.client.force_login(usuario)
+        venda = Venda.objects.create(
+            corretor=Corretor.objects.create(nome="Rui Costa"),
+            empreendimento=Empreendimento.objects.create(nome="Jardins", cidade="Sorocaba"),
+            cliente_nome="Clara Nunes",
+            data_venda=date.today(),
+            valor_contrato=Decimal("400000.00"),
+        )
+        self.recebivel = Recebivel.objects.create(
+            venda=venda,
+            data_vencimento=date.today() - timedelta(days=15),
+            valor=Decimal("40000.00"),
+            status=Recebivel.Status.ATRASADO,
+        )
+        self.url = reverse("dashboards:api-inadimplencia-corretor")
+
+    def test_requires_authentication(self) -> None:
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_returns_kpis_with_validators(self) -> None:
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("ETag", response)
+        self.assertIn("Last-Modified", response)
+        self.assertEqual(response.json()[0]["corretor"], "Rui Costa")
+
+    def test_conditional_request_returns_304_without_recomputing(self) -> None:
+        etag = self.client.get(self.url)["ETag"]
+        estatisticas = dashboard_cache.estatisticas()
+
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        # Nem o cache da seção é consultado.
+        self.assertEqual(dashboard_cache.estatisticas(), estatisticas)
+        sql = " ".join(consulta["sql"] for consulta in consultas)
+        self.assertNotIn("SUM(", sql.upper())
+
+    def test_etag_changes_when_data_changes(self) -> None:
+        etag = self.client.get(self.url)["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recebivel.delete()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_cash_flow_granularity_has_its_own_etag(self) -> None:
+        url = reverse("dashboards:api-fluxo-caixa")
+
+        mensal = self.client.get(url)
+        semanal = self.client.get(url, {"granularidade": "semanal"})
+
+        self.assertEqual(len(mensal.json()["periodos"]), fluxo_caixa.HORIZONTE_MESES)
+        self.assertGreater(len(semanal.json()["periodos"]), fluxo_caixa.HORIZONTE_MESES)
+        self.assertNotEqual(mensal["ETag"], semanal["ETag"])
+
+
+class ExportacaoCsvTests(TestCase):
+    def setUp(self) -> None:
+        corretor = Corretor.objects.create(nome="Davi Melo")
+        empreendimento = Empreendimento.objects.create(nome="Horizonte", cidade="Natal")
+        for indice in range(5):
+            venda = Venda.objects.create(
+                corretor=corretor,
+                empreendimento=empreendimento,
+                cliente_nome=f"Cliente {indice}",
+                data_venda=date(2024, 1, indice + 1),
+                valor_contrato=Decimal("100000.00"),
+            )
+            Recebivel.objects.create(
+                venda=venda,
+                data_vencimento=date(2024, 2, indice + 1),
+                valor=Decimal("1000.00"),
+            )
+        self.usuario = get_user_model().objects.create_superuser(
+            username="financeiro", password="senha"
+        )
+
+    def test_streams_rows_with_related_names_in_one_query(self) -> None:
+        self.client.force_login(self.usuario)
+        response = self.client.get(reverse("dashboards:exportar", args=["recebiveis"]))
+        self.assertTrue(response.streaming)
+
+        with self.assertNumQueries(1):
+            conteudo = b"".join(response.streaming_content).decode()
+
+        linhas = conteudo.splitlines()
+        self.assertEqual(len(linhas), 6)
+        self.assertTrue(linhas[0].startswith("ID;Venda;Cliente;Corretor;Empreendimento"))
+        self.assertIn(";Davi Melo;Horizonte;2024-02-01;1000.00;", linhas[1])
+
+    def test_requires_view_permission(self) -> None:
+        self.client.force_login(get_user_model().objects.create_user(username="visitante"))
+        response = self.client.get(reverse("dashboards:exportar", args=["vendas"]))
+        self.assertEqual(response.status_code, 403)
+
+    def test_invalid_filters_are_rejected_instead_of_exporting_everything(self) -> None:
+        self.client.force_login(self.usuario)
+
+        for parametros in ({"data_inicio": "2024-13-01"}, {"empreendimento": "999"}):
+            with self.subTest(parametros=parametros):
+                response = self.client.get(
+                    reverse("dashboards:exportar", args=["vendas"]), parametros
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.streaming)
+
+        detalhamento = self.client.get(
+            reverse("dashboards:detalhamento", args=["vendas"]), {"corretor": "abc"}
+        )
+        self.assertEqual(detalhamento.status_code, 400)
+        api = self.client.get(
+            reverse("dashboards:api-vendas-comparativos"), {"data_fim": "31/02/2024"}
+        )
+        self.assertEqual(api.status_code, 400)
+        self.assertIn("data_fim", api.json())
+
+    def test_export_command_applies_filters(self) -> None:
+        saida = StringIO()
+        call_command(
+            "export_dados", "vendas", "--data-inicio", "2024-01-04", stdout=saida
+        )
+        linhas = saida.getvalue().splitlines()
+        self.assertEqual(len(linhas), 3)
+        self.assertIn("Cliente 3", linhas[1])
+
+
+class DetalhamentoTests(TestCase):
+    def setUp(self) -> None:
+        corretor = Corretor.objects.create(nome="Davi Melo")
+        empreendimento = Empreendimento.objects.create(nome="Horizonte", cidade="Natal")
+        hoje = timezone.localdate()
+        # Datas repetidas exercitam o desempate por id entre páginas.
+        for indice in range(7):
+            venda = Venda.objects.create(
+                corretor=corretor,
+                empreendimento=empreendimento,
+                cliente_nome=f"Cliente {indice}",
+                data_venda=date(2024, 1, indice // 2 + 1),
+                valor_contrato=Decimal("100000.00"),
+            )
+            Recebivel.objects.create(
+                venda=venda,
+                data_vencimento=hoje - timedelta(days=10 * indice),
+                valor=Decimal("1000.00"),
+                status=Recebivel.Status.ATRASADO,
+            )
+        self.usuario = get_user_model().objects.create_superuser(
+            username="gerente", password="senha"
+        )
+
+    def test_cursor_pages_follow_default_ordering_without_gaps(self) -> None:
+        esperados = list(Venda.objects.order_by("-data_venda", "-id").values_list("id", flat=True))
+
+        vistos, cursor = [], None
+        while True:
+            with self.assertNumQueries(1):
+                pagina = detalhamento.pagina("vendas", cursor=cursor, tamanho=3)
+            vistos.extend(linha[0] for linha in pagina.linhas)
+            cursor = pagina.proximo_cursor
+            if cursor is None:
+                break
+
+        self.assertEqual(vistos, esperados)
+        self.assertEqual(pagina.linhas[-1][3:5], ["Davi Melo", "Horizonte"])
+
+    def test_receivables_drill_down_by_aging_bucket(self) -> None:
+        self.client.force_login(self.usuario)
+        response = self.client.get(
+            reverse("dashboards:detalhamento", args=["recebiveis"]), {"faixa": "31-60"}
+        )
+        self.assertEqual(response.status_code, 200)
+        status = [linha[-1] for linha in response.context["pagina"].linhas]
+        self.assertEqual(status, ["Atrasado"] * 3)
+
+        invalido = self.client.get(
+            reverse("dashboards:detalhamento", args=["recebiveis"]), {"cursor": "x"}
+        )
+        self.assertEqual(invalido.status_code, 400)
+
+    def test_requires_view_permission(self) -> None:
+        self.client.force_login(get_user_model().objects.create_user(username="visitante"))
+        response = self.client.get(reverse("dashboards:detalhamento", args=["pedidos"]))
+        self.assertEqual(response.status_code, 403)
+
+
+class BuscaGlobalTests(TestCase):
+    def setUp(self) -> None:
+        self.corretor = Corretor.objects.create(nome="Marina Costa")
+        self.empreendimento = Empreendimento.objects.create(
+            nome="Residencial Marina", cidade="Santos"
+        )
+        Fornecedor.objects.create(nome="Marinho Materiais")
+        Venda.objects.create(
+            corretor=self.corretor,
+            empreendimento=self.empreendimento,
+            cliente_nome="João Pedro Souza",
+            data_venda=date(2024, 1, 1),
+            valor_contrato=Decimal("1000.00"),
+        )
+
+    def test_returns_mixed_entities_ranked_by_relevance(self) -> None:
+        with self.assertNumQueries(1):
+            resultados = busca.buscar("marin")
+
+        self.assertEqual(
+            sorted(item["tipo"] for item in resultados),
+            ["corretor", "empreendimento", "fornecedor"],
+        )
+        relevancias = [item["relevancia"] for item in resultados]
+        self.assertEqual(relevancias, sorted(relevancias, reverse=True))
+        self.assertEqual(
+            [item["texto"] for item in busca.buscar("pedro souza")], ["João Pedro Souza"]
+        )
+        self.assertEqual(busca.buscar("   "), [])
+
+    @skipUnless(busca.usa_fts(), "Só o índice FTS5 ignora acentos e a ordem das palavras.")
+    def test_fts_ignores_accents_and_word_order(self) -> None:
+        self.assertEqual(
+            [item["texto"] for item in busca.buscar("souza joao")], ["João Pedro Souza"]
+        )
+
+    def test_index_follows_saves_and_deletes(self) -> None:
+        self.corretor.nome = "Paula Nogueira"
+        self.corretor.save()
+        # No PostgreSQL a semelhança de trigramas também traz "Marinho Materiais".
+        tipos = [item["tipo"] for item in busca.buscar("marina")]
+        self.assertIn("empreendimento", tipos)
+        self.assertNotIn("corretor", tipos)
+        self.assertEqual(busca.buscar("nogueira")[0]["id"], self.corretor.pk)
+
+        Venda.objects.all().delete()
+        self.assertEqual(busca.buscar("souza"), [])
+
+    def test_search_endpoint(self) -> None:
+        url = reverse("dashboards:api-busca")
+        self.assertEqual(self.client.get(url, {"q": "marina"}).status_code, 403)
+
+        self.client.force_login(get_user_model().objects.create_user(username="gestor"))
+        resposta = self.client.get(url, {"q": "residencial", "limite": "abc"})
+        self.assertEqual(resposta.status_code, 200)
+        [resultado] = resposta.json()
+        self.assertEqual(resultado["tipo"], "empreendimento")
+        self.assertEqual(
+            resultado["url"],
+            reverse("dashboards:detalhamento", args=["vendas"])
+            + f"?empreendimento={self.empreendimento.pk}",
+        )
+
+
+class RelatorioPdfTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        self.diretorio = Path(diretorio.name)
+        configuracao = override_settings(DASHBOARD_RELATORIOS_DIR=diretorio.name)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+        self.client.force_login(get_user_model().objects.create_user(username="diretoria"))
+        self.venda = Venda.objects.create(
+            corretor=Corretor.objects.create(nome="Lia Prado"),
+            empreendimento=Empreendimento.objects.create(nome="Mirante", cidade="Campinas"),
+            cliente_nome="Otávio Reis",
+            data_venda=date.today(),
+            valor_contrato=Decimal("300000.00"),
+        )
+
+    def test_key_follows_filters_and_data_version(self) -> None:
+        chave = relatorio.chave_relatorio(SEM_FILTROS)
+        self.assertEqual(relatorio.chave_relatorio(SEM_FILTROS), chave)
+
+        filtrada = relatorio.chave_relatorio(Filtros(corretor_id=self.venda.corretor_id))
+        self.assertNotEqual(filtrada.split("-")[0], chave.split("-")[0])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.venda.save()
+        nova = relatorio.chave_relatorio(SEM_FILTROS)
+        self.assertEqual(nova.split("-")[0], chave.split("-")[0])
+        self.assertNotEqual(nova, chave)
+
+    def test_report_template_renders_every_section(self) -> None:
+        contexto = secoes.contexto_dashboard(SEM_FILTROS)
+        html = render_to_string(
+            "dashboards/relatorio.html",
+            {**contexto, "filtros": SEM_FILTROS, "gerado_em": timezone.localtime()},
+        )
+
+        for titulo in ("Desempenho Comercial", "Saúde Financeira", "Gestão de Custos", "Margem"):
+            self.assertIn(titulo, html)
+        self.assertIn("Lia Prado", html)
+
+    def test_pending_report_returns_202_without_rendering_in_request(self) -> None:
+        # Outro processo já detém a trava de renderização deste relatório.
+        chave = relatorio.chave_relatorio(SEM_FILTROS)
+        cache.add(relatorio._chave_trava(chave), True)
+
+        response = self.client.get(reverse("dashboards:relatorio"))
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response["Retry-After"], "3")
+        self.assertNotIn(chave, relatorio._tarefas)
+
+    def test_finished_render_leaves_the_task_table_and_reports_the_error_once(self) -> None:
+        liberar = threading.Event()
+
+        def falhar(filtros, chave):
+            liberar.wait(5)
+            raise relatorio.ErroRelatorio("falhou")
+
+        chave = relatorio.chave_relatorio(SEM_FILTROS)
+        with mock.patch.object(relatorio, "renderizar", falhar):
+            self.assertEqual(relatorio.solicitar(SEM_FILTROS), (relatorio.PROCESSANDO, chave))
+            self.assertIn(chave, relatorio._tarefas)
+            with self.assertLogs("dashboards.relatorio", "ERROR"):
+                liberar.set()
+                prazo = time.monotonic() + 5
+                while chave in relatorio._tarefas and time.monotonic() < prazo:
+                    time.sleep(0.01)
+
+        self.assertNotIn(chave, relatorio._tarefas)
+        self.assertEqual(relatorio.solicitar(SEM_FILTROS), (relatorio.ERRO, chave))
+        cache.add(relatorio._chave_trava(chave), True)
+        self.assertEqual(relatorio.solicitar(SEM_FILTROS), (relatorio.PROCESSANDO, chave))
+
+    def test_ready_report_is_served_from_disk(self) -> None:
+        chave = relatorio.chave_relatorio(SEM_FILTROS)
+        relatorio.caminho(chave).write_bytes(b"%PDF-1.7 conteudo")
+
+        # Só sessão e usuário: nenhuma seção é calculada para servir o arquivo.
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("dashboards:relatorio"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertEqual(b"".join(response.streaming_content), b"%PDF-1.7 conteudo")
+
+    @skipUnless(find_spec("weasyprint"), "WeasyPrint não instalado")
+    def test_render_writes_pdf_and_discards_previous_version(self) -> None:
+        anterior = relatorio.chave_relatorio(SEM_FILTROS)
+        relatorio.caminho(anterior).write_bytes(b"%PDF antigo")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.venda.save()
+        chave = relatorio.chave_relatorio(SEM_FILTROS)
+
+        destino = relatorio.renderizar(SEM_FILTROS, chave)
+
+        self.assertTrue(destino.read_bytes().startswith(b"%PDF"))
+        self.assertFalse(relatorio.caminho(anterior).exists())
+
+
+class DadosSinteticosTests(TestCase):
+    def test_generator_builds_related_volumes_and_continues_numbering(self) -> None:
+        saida = StringIO()
+        for recebiveis in ("200", "100"):
+            call_command(
+                "gerar_dados_sinteticos",
+                "--recebiveis",
+                recebiveis,
+                "--parcelas",
+                "4",
+                stdout=saida,
+            )
+
+        self.assertEqual(Venda.objects.count(), 75)
+        self.assertEqual(Recebivel.objects.count(), 300)
+        self.assertEqual(PedidoCompra.objects.count(), 38)
+        pedido = PedidoCompra.objects.first()
+        self.assertEqual(pedido.valor_total, sum(item.custo_total for item in pedido.itens.all()))
+        self.assertFalse(
+            Recebivel.objects.filter(status=Recebivel.Status.PAGO, data_pagamento=None).exists()
+        )
+
+    def test_benchmark_reports_every_scale_and_rolls_back(self) -> None:
+        saida = StringIO()
+        call_command(
+            "benchmark_dashboard", "--escalas", "400,100", "--repeticoes", "1", stdout=saida
+        )
+
+        relatorio = json.loads(saida.getvalue())
+        self.assertEqual([escala["recebiveis"] for escala in relatorio["escalas"]], [100, 400])
+        for escala in relatorio["escalas"]:
+            self.assertEqual(escala["frio"]["status"], 200)
+            self.assertGreater(escala["frio"]["consultas"], escala["quente"]["consultas"])
+            self.assertGreater(escala["pico_memoria_kib"], 0)
+        self.assertFalse(Venda.objects.exists())
+
+
+class TotaisCorrentesTests(TestCase):
+    CAMPOS = (
+        "corretor_id",
+        "empreendimento_id",
+        "valor_vendas",
+        "unidades_vendidas",
+        "total_contratos",
+        "total_carteira",
+        "valor_recebido",
+        "valor_inadimplente",
+        "total_parcelas",
+    )
+
+    def setUp(self) -> None:
+        self.ana = Corretor.objects.create(nome="Ana Lima")
+        self.bruno = Corretor.objects.create(nome="Bruno Dias")
+        self.empreendimento = Empreendimento.objects.create(nome="Vista Mar", cidade="Santos")
+        self.venda = Venda.objects.create(
+            corretor=self.ana,
+            empreendimento=self.empreendimento,
+            cliente_nome="Caio Reis",
+            data_venda=date.today(),
+            unidades_vendidas=2,
+            valor_contrato=Decimal("200000.00"),
+        )
+        self.parcela = Recebivel.objects.create(
+            venda=self.venda,
+            data_vencimento=date.today(),
+            valor=Decimal("50000.00"),
+            valor_pago=Decimal("10000.00"),
+            status=Recebivel.Status.ATRASADO,
+        )
+
+    def _totais(self) -> list:
+        return list(
+            TotalCorrente.objects.filter(total_contratos__gt=0)
+            .values_list(*self.CAMPOS)
+            .order_by("corretor_id")
+        )
+
+    def _assert_totais_reconciliados(self) -> list:
+        incrementais = self._totais()
+        call_command("reconciliar_totais", stdout=StringIO())
+        self.assertEqual(self._totais(), incrementais)
+        return incrementais
+
+    def test_writes_update_totals_incrementally(self) -> None:
+        [linha] = self._assert_totais_reconciliados()
+        self.assertEqual(
+            linha[2:],
+            (
+                Decimal("200000.00"),
+                2,
+                1,
+                Decimal("50000.00"),
+                Decimal("10000.00"),
+                Decimal("40000.00"),
+                1,
+            ),
+        )
+
+        self.parcela.valor_pago = Decimal("50000.00")
+        self.parcela.status = Recebivel.Status.PAGO
+        self.parcela.save()
+        [linha] = self._assert_totais_reconciliados()
+        self.assertEqual(linha[6:8], (Decimal("50000.00"), Decimal("0.00")))
+
+    def test_moving_a_sale_moves_its_installments(self) -> None:
+        self.venda.corretor = self.bruno
+        self.venda.valor_contrato = Decimal("210000.00")
+        self.venda.save()
+
+        [linha] = self._assert_totais_reconciliados()
+        self.assertEqual(linha[0], self.bruno.pk)
+        self.assertEqual(linha[2], Decimal("210000.00"))
+        self.assertFalse(
+            TotalCorrente.objects.filter(corretor=self.ana)
+            .exclude(total_contratos=0, total_parcelas=0)
+            .exists()
+        )
+
+    def test_reimport_moving_a_sale_reconciles_the_previous_broker(self) -> None:
+        Venda.objects.filter(pk=self.venda.pk).update(codigo_origem="V1")
+        linha = {
+            "codigo": "V1",
+            "corretor": "Bruno Dias",
+            "empreendimento": "Vista Mar",
+            "cliente": "Caio Reis",
+            "data_venda": date.today().isoformat(),
+            "unidades": "2",
+            "valor_contrato": "200000.00",
+        }
+
+        ImportadorVendas().importar([linha])
+
+        [linha] = self._assert_totais_reconciliados()
+        self.assertEqual(linha[0], self.bruno.pk)
+        self.assertEqual(linha[5], Decimal("50000.00"))
+        self.assertFalse(
+            TotalCorrente.objects.filter(corretor=self.ana)
+            .exclude(total_contratos=0, total_parcelas=0)
+            .exists()
+        )
+        self.assertTrue(
+            ChaveAlterada.objects.filter(
+                entidade=ChaveAlterada.Entidade.CORRETOR, objeto_id=self.ana.pk
+            ).exists()
+        )
+
+    def test_reimported_batches_apply_deltas_without_aggregating_the_tables(self) -> None:
+        Venda.objects.filter(pk=self.venda.pk).update(codigo_origem="V1")
+        Recebivel.objects.filter(pk=self.parcela.pk).update(codigo_origem="R1")
+        ImportadorVendas().importar(
+            [
+                {
+                    "codigo": "V2",
+                    "corretor": "Bruno Dias",
+                    "empreendimento": "Vista Mar",
+                    "cliente": "Davi Melo",
+                    "data_venda": date.today().isoformat(),
+                    "valor_contrato": "90000.00",
+                }
+            ]
+        )
+        parcelas = [
+            {
+                "codigo": "R1",
+                "venda": "V2",
+                "data_vencimento": date.today().isoformat(),
+                "valor": "30000.00",
+                "valor_pago": "30000.00",
+                "status": "pago",
+            },
+            {
+                "codigo": "R2",
+                "venda": "V1",
+                "data_vencimento": date.today().isoformat(),
+                "valor": "20000.00",
+            },
+        ]
+
+        with CaptureQueriesContext(connection) as consultas:
+            ImportadorRecebiveis().importar(parcelas)
+
+        self.assertFalse([c["sql"] for c in consultas.captured_queries if "SUM(" in c["sql"]])
+        ana, bruno = self._assert_totais_reconciliados()
+        self.assertEqual(ana[5:], (Decimal("20000.00"), Decimal("0.00"), Decimal("20000.00"), 1))
+        self.assertEqual(
+            bruno[5:], (Decimal("30000.00"), Decimal("30000.00"), Decimal("0.00"), 1)
+        )
+
+    def test_cascade_delete_removes_sale_and_installments(self) -> None:
+        self.venda.delete()
+
+        linha = TotalCorrente.objects.get(corretor=self.ana)
+        self.assertEqual(
+            (linha.valor_vendas, linha.total_contratos, linha.total_carteira, linha.total_parcelas),
+            (Decimal("0"), 0, Decimal("0"), 0),
+        )
+
+    def test_headline_kpis_read_totals_without_scanning_transactions(self) -> None:
+        with CaptureQueriesContext(connection) as consultas:
+            comercial = kpis.comercial_kpis(Filtros(corretor_id=self.ana.pk))
+
+        self.assertEqual(comercial["valor_total_vendas"], Decimal("200000.00"))
+        self.assertEqual(comercial["ticket_medio_venda"], Decimal("200000.00"))
+        self.assertIn('FROM "dashboards_totalcorrente"', consultas.captured_queries[0]["sql"])
+
+
+class ArquivamentoTests(TestCase):
+    corte = date(2023, 1, 1)
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.ana = Corretor.objects.create(nome="Ana Lima")
+        self.bruno = Corretor.objects.create(nome="Bruno Dias")
+        self.empreendimento = Empreendimento.objects.create(nome="Vista Mar", cidade="Santos")
+
+        def venda(corretor, data_venda, valor, status=Venda.Status.ATIVA):
+            return Venda.objects.create(
+                corretor=corretor,
+                empreendimento=self.empreendimento,
+                cliente_nome=f"Cliente {corretor.nome}",
+                data_venda=data_venda,
+                unidades_vendidas=2,
+                valor_contrato=Decimal(valor),
+                status=status,
+            )
+
+        ativa = venda(self.ana, date(2022, 3, 10), "300000.00")
+        # Só na cancelada do Bruno todas as parcelas saem: é a única venda arquivada.
+        self.cancelada = venda(self.bruno, date(2022, 5, 20), "150000.00", Venda.Status.CANCELADA)
+        com_saldo = venda(self.ana, date(2022, 7, 1), "90000.00", Venda.Status.CANCELADA)
+        venda(self.bruno, date(2024, 2, 1), "80000.00", Venda.Status.CANCELADA)
+        for venda_, vencimento, valor, status in (
+            (ativa, date(2022, 4, 10), "1000.00", Recebivel.Status.PAGO),
+            (ativa, date(2022, 5, 10), "1000.00", Recebivel.Status.ATRASADO),
+            (ativa, date(2024, 5, 10), "1000.00", Recebivel.Status.PAGO),
+            (self.cancelada, date(2022, 6, 10), "500.00", Recebivel.Status.PAGO),
+            (com_saldo, date(2022, 8, 10), "700.00", Recebivel.Status.ABERTO),
+        ):
+            Recebivel.objects.create(
+                venda=venda_,
+                data_vencimento=vencimento,
+                valor=Decimal(valor),
+                valor_pago=Decimal(valor) if status == Recebivel.Status.PAGO else Decimal("0"),
+                status=status,
+            )
+
+    def _indicadores(self) -> dict:
+        periodo = Filtros(data_inicio=date(2022, 1, 1), data_fim=date(2024, 12, 31))
+        do_bruno = Filtros(data_inicio=date(2022, 5, 1), corretor_id=self.bruno.pk)
+        return {
+            "comercial": kpis.comercial_kpis(),
+            "comercial_periodo": kpis.comercial_kpis(periodo),
+            "comercial_bruno": kpis.comercial_kpis(do_bruno),
+            "carteira": kpis.carteira_kpis(),
+            "carteira_periodo": kpis.carteira_kpis(periodo),
+            "recebiveis": kpis.serie_temporal("recebiveis", "trimestre", periodo),
+            "margem": kpis.margem_por_empreendimento(filtros=periodo),
+            "fluxo_caixa": fluxo_caixa.taxas_inadimplencia(
+                Recebivel.objects, date(2024, 6, 15), TotalArquivado.objects
+            ),
+        }
+
+    def test_archiving_moves_rows_in_batches_and_keeps_kpis(self) -> None:
+        antes = self._indicadores()
+        self.assertEqual(antes["comercial_periodo"]["valor_total_vendas"], Decimal("620000.00"))
+        totais = list(TotalCorrente.objects.values_list("corretor_id", "valor_vendas"))
+
+        saida = StringIO()
+        call_command("arquivar", antes_de="2023-01-01", lote=1, verbosity=2, stdout=saida)
+
+        self.assertIn("2 recebível(is) e 1 venda(s)", saida.getvalue())
+        self.assertEqual(saida.getvalue().count("Recebíveis arquivados"), 2)
+        self.assertEqual(RecebivelArquivo.objects.count(), 2)
+        self.assertEqual(VendaArquivo.objects.get().pk, self.cancelada.pk)
+        self.assertFalse(Venda.objects.filter(pk=self.cancelada.pk).exists())
+        self.assertEqual(Recebivel.objects.count(), 3)
+        self.assertEqual(self._indicadores(), antes)
+
+        # Reconstruídos das origens, os totais somam o que foi arquivado.
+        call_command("reconciliar_totais", stdout=StringIO())
+        self.assertEqual(
+            list(TotalCorrente.objects.values_list("corretor_id", "valor_vendas")), totais
+        )
+        self.assertEqual(self._indicadores(), antes)
+
+    def test_snapshots_include_archived_totals(self) -> None:
+        call_command("refresh_kpis", completo=True, stdout=StringIO())
+        antes = KpiSnapshotDiario.objects.values(
+            "valor_total_vendas", "total_contratos", "total_carteira", "valor_recebido"
+        ).get()
+
+        call_command("arquivar", antes_de="2023-01-01", stdout=StringIO())
+        call_command("refresh_kpis", completo=True, stdout=StringIO())
+
+        self.assertEqual(
+            KpiSnapshotDiario.objects.values(
+                "valor_total_vendas", "total_contratos", "total_carteira", "valor_recebido"
+            ).get(),
+            antes,
+        )
+
+    def test_dry_run_only_counts(self) -> None:
+        saida = StringIO()
+        call_command("arquivar", antes_de="2023-01-01", simular=True, stdout=saida)
+
+        self.assertIn("Seriam arquivados 2 recebível(is) e 1 venda(s)", saida.getvalue())
+        self.assertFalse(RecebivelArquivo.objects.exists())
+        self.assertFalse(TotalArquivado.objects.exists())
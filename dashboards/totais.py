@@ -0,0 +1,366 @@
+"""Totais correntes de vendas e carteira por corretor e empreendimento.
+
+Cada ``Venda`` e cada ``Recebivel`` contribui com valores fixos para a linha
+``TotalCorrente`` do seu par (corretor, empreendimento). Os sinais comparam a
+contribuição gravada no banco antes da alteração com a nova e aplicam apenas a
+diferença, com ``F()``, na transação da própria gravação; os KPIs sem filtro
+de período passam a somar poucas linhas em vez de varrer as transações.
+
+``Venda`` e ``Recebivel`` gravam numa transação (``core.models.AtomicSaveModel``)
+em que o ``pre_save`` bloqueia a linha lida, de modo que gravações concorrentes
+do mesmo registro não descontam duas vezes a mesma contribuição.
+
+Os lotes da importação (``core.importacao``) não disparam sinais: o sinal
+``lote_importado`` traz as contribuições anteriores dos registros regravados
+e ``apos_importacao`` aplica a diferença do lote do mesmo jeito. Outras
+gravações em lote (``bulk_create``, ``QuerySet.update``) ficam para
+``reconciliar``, que reconstrói os totais a partir das tabelas de origem. Vendas e
+parcelas arquivadas (``dashboards.arquivamento``) saem dessas tabelas sem
+sinais e continuam nos totais: a reconstrução soma também ``TotalArquivado``.
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
+
+from carteira.models import Recebivel
+from comercial.models import Venda
+
+from .kpis import SALDO_EXPRESSION, ZERO
+from .models import TotalArquivado, TotalCorrente
+
+
+def _contribuicao_venda(valor_contrato, unidades_vendidas):
+    return {
+        "valor_vendas": Decimal(str(valor_contrato)),
+        "unidades_vendidas": int(unidades_vendidas),
+        "total_contratos": 1,
+    }
+
+
+def _contribuicao_recebivel(valor, valor_pago, status):
+    valor, valor_pago = Decimal(str(valor)), Decimal(str(valor_pago))
+    return {
+        "total_carteira": valor,
+        "valor_recebido": valor_pago,
+        "valor_inadimplente": ZERO if status == Recebivel.Status.PAGO else valor - valor_pago,
+        "total_parcelas": 1,
+    }
+
+
+def aplicar(chave, diferenca):
+    """Soma ``diferenca`` (campo -> valor) à linha de ``chave`` = (corretor, empreendimento)."""
+
+    valores = {campo: F(campo) + valor for campo, valor in diferenca.items() if valor}
+    if not valores:
+        return
+    corretor_id, empreendimento_id = chave
+    linha = TotalCorrente.objects.filter(
+        corretor_id=corretor_id, empreendimento_id=empreendimento_id
+    )
+    if not linha.update(**valores):
+        TotalCorrente.objects.bulk_create(
+            [TotalCorrente(corretor_id=corretor_id, empreendimento_id=empreendimento_id)],
+            ignore_conflicts=True,
+        )
+        linha.update(**valores)
+
+
+def _diferencas():
+    return defaultdict(lambda: defaultdict(int))
+
+
+def _somar(diferencas, chave, valores, sinal):
+    for campo, valor in valores.items():
+        diferencas[chave][campo] += sinal * valor
+
+
+def mover(anterior, atual):
+    """Troca a contribuição ``anterior`` pela ``atual`` (``(chave, valores)`` ou None)."""
+
+    diferencas = _diferencas()
+    for sinal, contribuicao in ((-1, anterior), (1, atual)):
+        if contribuicao is not None:
+            _somar(diferencas, *contribuicao, sinal)
+    for chave, diferenca in diferencas.items():
+        aplicar(chave, diferenca)
+
+
+def aplicar_em_lote(diferencas):
+    """``aplicar`` para várias chaves, criando numa única consulta as linhas que faltam."""
+
+    diferencas = {
+        chave: diferenca for chave, diferenca in diferencas.items() if any(diferenca.values())
+    }
+    TotalCorrente.objects.bulk_create(
+        [
+            TotalCorrente(corretor_id=corretor_id, empreendimento_id=empreendimento_id)
+            for corretor_id, empreendimento_id in diferencas
+        ],
+        ignore_conflicts=True,
+    )
+    for chave, diferenca in diferencas.items():
+        aplicar(chave, diferenca)
+
+
+def _somas_carteira():
+    return {
+        "total_carteira": Coalesce(Sum("valor"), ZERO),
+        "valor_recebido": Coalesce(Sum("valor_pago"), ZERO),
+        "valor_inadimplente": Coalesce(
+            Sum(SALDO_EXPRESSION, filter=~Q(status=Recebivel.Status.PAGO)), ZERO
+        ),
+        "total_parcelas": Count("id"),
+    }
+
+
+def _carteira_da_venda(venda_id):
+    return Recebivel.objects.filter(venda_id=venda_id).aggregate(**_somas_carteira())
+
+
+def venda_pre_save(sender, instance, **kwargs):
+    # ``Venda.save`` roda numa transação: o bloqueio impede que duas gravações
+    # concorrentes descontem a mesma contribuição anterior.
+    instance._total_anterior = (
+        Venda.objects.select_for_update()
+        .filter(pk=instance.pk)
+        .values("corretor_id", "empreendimento_id", "valor_contrato", "unidades_vendidas")
+        .first()
+        if instance.pk
+        else None
+    )
+
+
+def venda_post_save(sender, instance, created, **kwargs):
+    chave = (instance.corretor_id, instance.empreendimento_id)
+    atual = (chave, _contribuicao_venda(instance.valor_contrato, instance.unidades_vendidas))
+    gravado = getattr(instance, "_total_anterior", None)
+    if gravado is None:
+        mover(None, atual)
+        return
+
+    chave_anterior = (gravado["corretor_id"], gravado["empreendimento_id"])
+    mover(
+        (
+            chave_anterior,
+            _contribuicao_venda(gravado["valor_contrato"], gravado["unidades_vendidas"]),
+        ),
+        atual,
+    )
+    if chave_anterior != chave:
+        # As parcelas acompanham a venda para o novo corretor/empreendimento.
+        carteira = _carteira_da_venda(instance.pk)
+        mover((chave_anterior, carteira), (chave, carteira))
+
+
+def venda_post_delete(sender, instance, **kwargs):
+    # As parcelas excluídas em cascata já descontaram a carteira no próprio sinal.
+    mover(
+        (
+            (instance.corretor_id, instance.empreendimento_id),
+            _contribuicao_venda(instance.valor_contrato, instance.unidades_vendidas),
+        ),
+        None,
+    )
+
+
+def _chave_da_venda(venda_id):
+    return tuple(
+        Venda.objects.filter(pk=venda_id).values_list("corretor_id", "empreendimento_id").get()
+    )
+
+
+def recebivel_pre_save(sender, instance, **kwargs):
+    instance._total_anterior = (
+        Recebivel.objects.select_for_update(of=("self",))
+        .filter(pk=instance.pk)
+        .values(
+            "venda_id",
+            "venda__corretor_id",
+            "venda__empreendimento_id",
+            "valor",
+            "valor_pago",
+            "status",
+        )
+        .first()
+        if instance.pk
+        else None
+    )
+
+
+def recebivel_post_save(sender, instance, created, **kwargs):
+    gravado = getattr(instance, "_total_anterior", None)
+    anterior = None
+    if gravado is not None:
+        chave_anterior = (gravado["venda__corretor_id"], gravado["venda__empreendimento_id"])
+        anterior = (
+            chave_anterior,
+            _contribuicao_recebivel(gravado["valor"], gravado["valor_pago"], gravado["status"]),
+        )
+    if gravado is not None and gravado["venda_id"] == instance.venda_id:
+        chave = chave_anterior
+    else:
+        chave = _chave_da_venda(instance.venda_id)
+    mover(
+        anterior,
+        (chave, _contribuicao_recebivel(instance.valor, instance.valor_pago, instance.status)),
+    )
+
+
+def recebivel_post_delete(sender, instance, **kwargs):
+    mover(
+        (
+            _chave_da_venda(instance.venda_id),
+            _contribuicao_recebivel(instance.valor, instance.valor_pago, instance.status),
+        ),
+        None,
+    )
+
+
+def reconstruir_por_corretor(modelo, corretores=None):
+    """Recalcula as linhas (corretor, empreendimento) de ``modelo`` a partir das origens.
+
+    Usado tanto para os fatos de ``refresh_kpis`` quanto para reconciliar os
+    totais correntes; ``corretores`` limita a reconstrução a esses IDs.
+    """
+
+    vendas = Venda.objects.order_by()
+    recebiveis = Recebivel.objects.order_by()
+    arquivados = TotalArquivado.objects.order_by()
+    linhas_atuais = modelo.objects.all()
+    if corretores is not None:
+        vendas = vendas.filter(corretor_id__in=corretores)
+        recebiveis = recebiveis.filter(venda__corretor_id__in=corretores)
+        arquivados = arquivados.filter(corretor_id__in=corretores)
+        linhas_atuais = linhas_atuais.filter(corretor_id__in=corretores)
+
+    linhas = {}
+    for item in vendas.values("corretor_id", "empreendimento_id").annotate(
+        valor=Coalesce(Sum("valor_contrato"), ZERO),
+        unidades=Coalesce(Sum("unidades_vendidas"), 0),
+        contratos=Count("id"),
+    ):
+        chave = (item["corretor_id"], item["empreendimento_id"])
+        linhas[chave] = modelo(
+            corretor_id=chave[0],
+            empreendimento_id=chave[1],
+            valor_vendas=item["valor"],
+            unidades_vendidas=item["unidades"],
+            total_contratos=item["contratos"],
+        )
+
+    em_aberto = ~Q(status=Recebivel.Status.PAGO)
+    for item in recebiveis.values("venda__corretor_id", "venda__empreendimento_id").annotate(
+        total=Coalesce(Sum("valor"), ZERO),
+        recebido=Coalesce(Sum("valor_pago"), ZERO),
+        inadimplente=Coalesce(Sum(SALDO_EXPRESSION, filter=em_aberto), ZERO),
+        parcelas=Count("id"),
+    ):
+        chave = (item["venda__corretor_id"], item["venda__empreendimento_id"])
+        linha = linhas.setdefault(chave, modelo(corretor_id=chave[0], empreendimento_id=chave[1]))
+        linha.total_carteira = item["total"]
+        linha.valor_recebido = item["recebido"]
+        linha.valor_inadimplente = item["inadimplente"]
+        linha.total_parcelas = item["parcelas"]
+
+    for item in arquivados.values("corretor_id", "empreendimento_id").annotate(
+        valor=Sum("valor_vendas"),
+        unidades=Sum("unidades_vendidas"),
+        contratos=Sum("total_contratos"),
+        total=Sum("total_carteira"),
+        recebido=Sum("valor_recebido"),
+        parcelas=Sum("total_parcelas"),
+    ):
+        chave = (item["corretor_id"], item["empreendimento_id"])
+        linha = linhas.setdefault(chave, modelo(corretor_id=chave[0], empreendimento_id=chave[1]))
+        linha.valor_vendas += item["valor"]
+        linha.unidades_vendidas += item["unidades"]
+        linha.total_contratos += item["contratos"]
+        linha.total_carteira += item["total"]
+        linha.valor_recebido += item["recebido"]
+        linha.total_parcelas += item["parcelas"]
+
+    linhas_atuais.delete()
+    modelo.objects.bulk_create(linhas.values(), batch_size=500)
+    return len(linhas)
+
+
+def reconciliar(corretores=None):
+    """Reconstrói os totais correntes (de todos ou apenas dos ``corretores``)."""
+
+    with transaction.atomic():
+        return reconstruir_por_corretor(TotalCorrente, corretores)
+
+
+def _diferencas_vendas(objetos, anteriores):
+    diferencas = _diferencas()
+    gravadas = {}
+    for linha in anteriores:
+        chave = (linha["corretor_id"], linha["empreendimento_id"])
+        contribuicao = _contribuicao_venda(linha["valor_contrato"], linha["unidades_vendidas"])
+        _somar(diferencas, chave, contribuicao, -1)
+        gravadas[linha["codigo_origem"]] = (linha["id"], chave)
+
+    movidas = {}
+    for venda in objetos:
+        chave = (venda.corretor_id, venda.empreendimento_id)
+        contribuicao = _contribuicao_venda(venda.valor_contrato, venda.unidades_vendidas)
+        _somar(diferencas, chave, contribuicao, 1)
+        venda_id, chave_anterior = gravadas.get(venda.codigo_origem, (None, chave))
+        if chave_anterior != chave:
+            movidas[venda_id] = (chave_anterior, chave)
+
+    if movidas:
+        # As parcelas acompanham a venda para o novo corretor/empreendimento.
+        for carteira in (
+            Recebivel.objects.filter(venda_id__in=movidas)
+            .order_by()
+            .values("venda_id")
+            .annotate(**_somas_carteira())
+        ):
+            chave_anterior, chave = movidas[carteira.pop("venda_id")]
+            _somar(diferencas, chave_anterior, carteira, -1)
+            _somar(diferencas, chave, carteira, 1)
+    return diferencas
+
+
+def _diferencas_recebiveis(objetos, anteriores):
+    diferencas = _diferencas()
+    for linha in anteriores:
+        chave = (linha["venda__corretor_id"], linha["venda__empreendimento_id"])
+        contribuicao = _contribuicao_recebivel(linha["valor"], linha["valor_pago"], linha["status"])
+        _somar(diferencas, chave, contribuicao, -1)
+
+    vendas = {
+        venda_id: (corretor_id, empreendimento_id)
+        for venda_id, corretor_id, empreendimento_id in Venda.objects.filter(
+            pk__in={recebivel.venda_id for recebivel in objetos}
+        ).values_list("pk", "corretor_id", "empreendimento_id")
+    }
+    for recebivel in objetos:
+        contribuicao = _contribuicao_recebivel(
+            recebivel.valor, recebivel.valor_pago, recebivel.status
+        )
+        _somar(diferencas, vendas[recebivel.venda_id], contribuicao, 1)
+    return diferencas
+
+
+def apos_importacao(sender, objetos=(), anteriores=(), **kwargs):
+    """Aplica aos totais a diferença de um lote importado sem sinais de gravação.
+
+    Como nos sinais, sai a contribuição que os registros regravados tinham
+    antes do lote (``anteriores``) e entra a dos ``objetos``, com ``F()``, só
+    nas linhas (corretor, empreendimento) tocadas: o custo acompanha o lote, e
+    não o tamanho das tabelas. A reconstrução completa fica com ``reconciliar``.
+    """
+
+    if sender is Venda:
+        diferencas = _diferencas_vendas(objetos, anteriores)
+    elif sender is Recebivel:
+        diferencas = _diferencas_recebiveis(objetos, anteriores)
+    else:
+        return
+    aplicar_em_lote(diferencas)
@@ -1,9 +1,44 @@
 from django.urls import path
 
-from .views import dashboard_overview
+from . import api
+from .views import (
+    cache_status,
+    dashboard_overview,
+    dashboard_overview_async,
+    detalhamento_lista,
+    exportar_csv,
+    relatorio_pdf,
+)
 
 app_name = "dashboards"
 
 urlpatterns = [
     path("", dashboard_overview, name="overview"),
+    path("paralelo/", dashboard_overview_async, name="overview-async"),
+    path("cache/", cache_status, name="cache-status"),
+    path("exportar/<slug:tabela>.csv", exportar_csv, name="exportar"),
+    path("relatorio.pdf", relatorio_pdf, name="relatorio"),
+    path("detalhes/<slug:tabela>/", detalhamento_lista, name="detalhamento"),
+    path(
+        "api/vendas/comparativos/",
+        api.VendasComparativosAPIView.as_view(),
+        name="api-vendas-comparativos",
+    ),
+    path(
+        "api/carteira/inadimplencia-corretor/",
+        api.InadimplenciaCorretorAPIView.as_view(),
+        name="api-inadimplencia-corretor",
+    ),
+    path(
+        "api/compras/supplier-share/",
+        api.SupplierShareAPIView.as_view(),
+        name="api-supplier-share",
+    ),
+    path("api/margem/", api.MargemAPIView.as_view(), name="api-margem"),
+    path(
+        "api/carteira/fluxo-caixa/",
+        api.FluxoCaixaAPIView.as_view(),
+        name="api-fluxo-caixa",
+    ),
+    path("api/busca/", api.BuscaAPIView.as_view(), name="api-busca"),
 ]
@@ -32,6 +32,9 @@ class TarefaPlanejada(TimeStampedModel):
     data_fim_real = models.DateField(null=True, blank=True)
     custo_planejado = models.DecimalField(max_digits=12, decimal_places=2)
     custo_real = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    codigo_origem = models.CharField(
+        "Código na planilha de origem", max_length=60, unique=True, null=True, blank=True
+    )
 
     class Meta:
         verbose_name = "Tarefa Planejada"
@@ -31,6 +31,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.humanize',
+    'rest_framework',
 
     #meus apps
 
@@ -43,11 +44,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.instrumentacao.InstrumentacaoMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.replica.FixacaoPrimarioMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -78,7 +81,19 @@ WSGI_APPLICATION = 'setup.wsgi.application'
 db_name = os.getenv("DB_NAME")
 
 if db_name:
-    # Configuração para PostgreSQL quando as variáveis estão presentes
+    # Configuração para PostgreSQL quando as variáveis estão presentes.
+    # Por padrão as conexões vêm do pool do psycopg 3 (DB_POOL), que mantém
+    # entre DB_POOL_MIN_SIZE e DB_POOL_MAX_SIZE conexões por processo e espera
+    # até DB_POOL_TIMEOUT segundos por uma livre. Ele serve a WSGI e a ASGI, em
+    # que as requisições não têm thread fixa e conexões persistentes não são
+    # reaproveitadas; no teste_carga em WSGI, o p95 ficou igual ou abaixo do das
+    # conexões persistentes e em menos da metade do de uma conexão por requisição.
+    # O Django não combina o pool com conexões persistentes, então com ele
+    # CONN_MAX_AGE fica em 0. Com DB_POOL=False cada thread do servidor mantém a
+    # sua conexão por DB_CONN_MAX_AGE segundos (vazio: sem limite; 0: uma conexão
+    # por requisição), testada no início de cada requisição com
+    # DB_CONN_HEALTH_CHECKS.
+    db_pool = config("DB_POOL", default=True, cast=bool)
     DATABASES = {
         "default": {
             "ENGINE": "django.db.backends.postgresql",
@@ -87,8 +102,19 @@ if db_name:
             "PASSWORD": os.getenv("DB_PASSWORD", ""),
             "HOST": os.getenv("DB_HOST", "localhost"),
             "PORT": os.getenv("DB_PORT", "5432"),
+            "CONN_MAX_AGE": 0 if db_pool else config(
+                "DB_CONN_MAX_AGE", default="60", cast=lambda v: int(v) if v.strip() else None
+            ),
+            "CONN_HEALTH_CHECKS": config("DB_CONN_HEALTH_CHECKS", default=True, cast=bool),
+            "OPTIONS": {},
         }
     }
+    if db_pool:
+        DATABASES["default"]["OPTIONS"]["pool"] = {
+            "min_size": config("DB_POOL_MIN_SIZE", default=2, cast=int),
+            "max_size": config("DB_POOL_MAX_SIZE", default=10, cast=int),
+            "timeout": config("DB_POOL_TIMEOUT", default=10, cast=float),
+        }
 else:
     # Fallback para SQLite para uso em desenvolvimento/testes
     DATABASES = {
@@ -98,6 +124,96 @@ else:
         }
     }
 
+# Réplica de leitura opcional (core.replica): dashboard, exportações e relatório
+# leem dela. Herda a configuração do primário; DB_REPLICA_HOST, DB_REPLICA_PORT,
+# DB_REPLICA_USER e DB_REPLICA_PASSWORD sobrescrevem o que for diferente.
+db_replica_name = os.getenv("DB_REPLICA_NAME")
+
+if db_replica_name:
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "NAME": db_replica_name,
+        **{
+            chave: os.getenv(f"DB_REPLICA_{chave}")
+            for chave in ("HOST", "PORT", "USER", "PASSWORD")
+            if os.getenv(f"DB_REPLICA_{chave}")
+        },
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["core.replica.RoteadorReplica"]
+
+# Particionamento por data de vendas e recebíveis no PostgreSQL
+# (core.particionamento). Com DB_PARTICIONAR as migrações convertem as tabelas;
+# sem ele a conversão é explícita, com ``manage.py particoes particionar``.
+PARTICIONAR_TABELAS = config("DB_PARTICIONAR", default=False, cast=bool)
+# Segundos em que um cliente que gravou continua lendo do primário.
+REPLICA_FIXACAO_SEGUNDOS = config("DB_REPLICA_FIXACAO_SEGUNDOS", default=10, cast=int)
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Em produção use, por exemplo, CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+# com CACHE_LOCATION=/var/tmp/pi02-cache, ou PyMemcacheCache com CACHE_LOCATION=127.0.0.1:11211.
+
+CACHES = {
+    "default": {
+        "BACKEND": config(
+            "CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": config("CACHE_LOCATION", default="pi02"),
+    }
+}
+
+DASHBOARD_CACHE_ALIAS = config("DASHBOARD_CACHE_ALIAS", default="default")
+# Tempo de vida (s) do contexto do dashboard; a versão dos dados já invalida as entradas.
+DASHBOARD_CACHE_TIMEOUT = config("DASHBOARD_CACHE_TIMEOUT", default=3600, cast=int)
+# Tempo máximo (s) que uma requisição aguarda outra que já está recalculando o contexto.
+DASHBOARD_CACHE_ESPERA = config("DASHBOARD_CACHE_ESPERA", default=10, cast=int)
+# Threads por processo que calculam as seções do dashboard assíncrono
+# (dashboards:overview-async); cada uma mantém a própria conexão com o banco.
+DASHBOARD_SECOES_WORKERS = config("DASHBOARD_SECOES_WORKERS", default=4, cast=int)
+
+# Relatório executivo em PDF: diretório dos arquivos gerados, threads de
+# renderização por processo e validade (s) da trava que evita renderizações duplicadas.
+DASHBOARD_RELATORIOS_DIR = config("DASHBOARD_RELATORIOS_DIR", default=str(BASE_DIR / "relatorios"))
+DASHBOARD_RELATORIOS_WORKERS = config("DASHBOARD_RELATORIOS_WORKERS", default=2, cast=int)
+DASHBOARD_RELATORIOS_TIMEOUT = config("DASHBOARD_RELATORIOS_TIMEOUT", default=300, cast=int)
+
+
+# Instrumentação por requisição (core.instrumentacao): cabeçalho Server-Timing e
+# limites por rota acima dos quais a requisição é registrada com nível WARNING.
+# A linha de cada requisição sai em nível INFO e só é registrada com
+# INSTRUMENTACAO_LOG_LEVEL=INFO; por padrão o console recebe só os excessos.
+INSTRUMENTACAO_SERVER_TIMING = config("INSTRUMENTACAO_SERVER_TIMING", default=True, cast=bool)
+INSTRUMENTACAO_ORCAMENTOS = {
+    "dashboards:overview": {"consultas": 25, "sql_ms": 300, "total_ms": 1000},
+    # As consultas das seções rodam em outras threads e não entram na contagem.
+    "dashboards:overview-async": {"total_ms": 1000},
+    "admin:*_changelist": {"consultas": 15, "sql_ms": 500, "total_ms": 1500},
+}
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "core.instrumentacao": {
+            "handlers": ["console"],
+            "level": config("INSTRUMENTACAO_LOG_LEVEL", default="WARNING"),
+            "propagate": False,
+        },
+    },
+}
+
+
+REST_FRAMEWORK = {
+    "DEFAULT_PERMISSION_CLASSES": ["rest_framework.permissions.IsAuthenticated"],
+    "DEFAULT_RENDERER_CLASSES": ["rest_framework.renderers.JSONRenderer"],
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators